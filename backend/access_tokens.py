@@ -0,0 +1,104 @@
+"""Signed, expiring JWT access tokens.
+
+An access token carries everything ``get_current_user`` needs (user id,
+email, host and admin flags), so any worker holding the signing secret can
+authenticate a request without reading the user store. Verified tokens are kept in an LRU,
+so a repeated token costs one dict lookup instead of an HMAC check.
+
+Each access token names the session (``sid``) it was issued for: the digest
+of the refresh token kept by ``token_store``. Logging out or rotating the
+refresh token revokes the session, which invalidates its access tokens
+before they expire.
+"""
+
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import jwt
+
+
+class AccessTokens:
+    def __init__(self, secret, ttl_seconds=3600, algorithm="HS256", cache_size=50_000, clock=time.time):
+        self.secret = secret
+        self.ttl_seconds = ttl_seconds
+        self.algorithm = algorithm
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._verified = OrderedDict()  # token -> claims
+        self._revoked = {}  # session id -> time after which its access tokens have all expired
+        self._next_purge = 1024  # taille de _revoked qui déclenche le prochain nettoyage
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._verified)
+
+    def issue(self, user, session):
+        """Sign an access token for ``user`` bound to ``session``; returns ``(token, expires_at)``."""
+        now = int(self._clock())
+        claims = {
+            "sub": user["id"],
+            "email": user.get("email"),
+            "isHost": bool(user.get("isHost", False)),
+            "isAdmin": bool(user.get("isAdmin", False)),
+            "sid": session,
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+            "typ": "access",
+        }
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm), claims["exp"]
+
+    def verify(self, token):
+        """Return the claims of a valid, unexpired, unrevoked token, or None."""
+        now = self._clock()
+        with self._lock:
+            claims = self._verified.get(token)
+            if claims is not None:
+                self._verified.move_to_end(token)
+                self.hits += 1
+        if claims is None:
+            with self._lock:
+                self.misses += 1
+            try:
+                claims = jwt.decode(token, self.secret, algorithms=[self.algorithm], options={"require": ["exp", "sub", "sid"]})
+            except jwt.InvalidTokenError:
+                return None
+            if claims.get("typ") != "access":
+                return None
+            with self._lock:
+                self._verified[token] = claims
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+        if claims["exp"] <= now or claims["sid"] in self._revoked:
+            with self._lock:
+                self._verified.pop(token, None)
+            return None
+        return claims
+
+    def revoke_session(self, session):
+        """Reject every access token issued for ``session`` from now on."""
+        now = self._clock()
+        with self._lock:
+            self._revoked[session] = now + self.ttl_seconds
+            if len(self._revoked) >= self._next_purge:
+                # Passé ce délai, les jetons de la session ont expiré d'eux-mêmes
+                self._revoked = {sid: until for sid, until in self._revoked.items() if until > now}
+                self._next_purge = max(1024, 2 * len(self._revoked))
+
+    def stats(self):
+        return {
+            "entries": len(self._verified),
+            "maxEntries": self.cache_size,
+            "revokedSessions": len(self._revoked),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def new_secret():
+    return secrets.token_urlsafe(48)
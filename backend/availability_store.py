@@ -0,0 +1,50 @@
+"""In-memory capacity counters: seats booked per (experience, date)."""
+
+from locks import ShardedRWLock
+
+# Statuts de réservation qui occupent des places
+ACTIVE_STATUSES = frozenset({"confirmed", "pending"})
+
+
+class AvailabilityStore:
+    """Booked seat counts keyed by experience id, then by ISO date.
+
+    ``reserve`` is a check-and-increment done under the lock of its
+    ``(experience, date)`` key only, so two bookings can only contend when they
+    target the same experience on the same day (or hash to the same shard).
+    The calendar query reads one small dict per experience instead of scanning
+    bookings.
+    """
+
+    def __init__(self, shards=64):
+        self._booked = {}  # experience id -> {date: seats}
+        self._locks = ShardedRWLock(shards, name="availability")
+
+    def reserve(self, experience_id, date, seats, capacity=None):
+        """Take ``seats`` if they fit within ``capacity`` (None = unlimited); returns True on success."""
+        with self._locks.for_key((experience_id, date)).write():
+            days = self._booked.setdefault(experience_id, {})
+            booked = days.get(date, 0)
+            if capacity is not None and booked + seats > capacity:
+                return False
+            days[date] = booked + seats
+            return True
+
+    def add_many(self, seats):
+        """Add ``{(experience id, date): seats}`` in bulk, without locking: only while loading at startup."""
+        for (experience_id, date), count in seats.items():
+            days = self._booked.setdefault(experience_id, {})
+            days[date] = days.get(date, 0) + count
+
+    def release(self, experience_id, date, seats):
+        with self._locks.for_key((experience_id, date)).write():
+            days = self._booked.get(experience_id)
+            if days is not None and date in days:
+                days[date] = max(0, days[date] - seats)
+
+    def booked(self, experience_id, dates):
+        """``{date: seats}`` for those of ``dates`` that have bookings."""
+        days = self._booked.get(experience_id)
+        if not days:
+            return {}
+        return {date: days[date] for date in dates if days.get(date)}
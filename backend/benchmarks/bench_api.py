@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+End-to-end API load test: seeded data, concurrent clients, JSON report.
+
+Boots ``server.app`` in-process behind httpx's ASGI transport (no sockets),
+seeds the configured backend directly through the repository (--users,
+--experiences and --bookings, scaled by --scale), then runs each scenario for
+--seconds with --concurrency async clients and records throughput and
+p50/p95/p99 latency. Latencies include the httpx client and the ASGI stack,
+so they are comparable between commits rather than with a real network.
+A request that never awaits I/O (the memory backend) runs start to finish
+without yielding, so its latency is its service time; clients only queue
+behind each other on routes that await a thread pool or a database.
+
+The report is written to --output together with the commit, the Python
+version and the seeded volumes; --compare prints the change against an
+earlier report:
+
+    python benchmarks/bench_api.py --scale 0.1 --output before.json
+    python benchmarks/bench_api.py --scale 0.1 --output after.json --compare before.json
+
+Seeding the default volumes (100k users, 50k experiences, 1M bookings) into
+the memory backend takes about 1 GB of RAM and under a minute on one core.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("JWT_SECRET", secrets.token_urlsafe(48))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+CATEGORIES = ["Adventure", "Culture", "Food", "Wellness", "Nature"]
+CITIES = ["Marrakech", "Fès", "Merzouga", "Essaouira", "Chefchaouen", "Agadir", "Ouarzazate"]
+WORDS = ["desert", "camel", "medina", "cooking", "tagine", "surf", "hammam", "atlas", "trek", "souk", "pottery", "sunset"]
+PASSWORD = "bench-password"
+TOKENS = 1000  # sessions ouvertes pour les scénarios authentifiés
+FIRST_DAY = date(2026, 1, 1)
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def seed(users, experiences, bookings, rng, batch=10_000):
+    """Insert the dataset through the repository; returns ``(user_ids, experience_ids)``."""
+    created_at = datetime.now(timezone.utc).isoformat()
+    password = await server.password_hasher.hash(PASSWORD)
+    user_ids = []
+    hosts = max(1, users // 20)
+    for i in range(users):
+        user = {
+            "id": str(uuid.uuid4()),
+            "email": f"user{i}@bench.rihlama.com",
+            "password": password,
+            "firstName": f"User{i}",
+            "lastName": "Bench",
+            "isHost": i < hosts,
+            "createdAt": created_at,
+        }
+        await server.users_db.insert(user)
+        user_ids.append(user["id"])
+
+    experience_ids = []
+    for start in range(0, experiences, batch):
+        records = []
+        for i in range(start, min(start + batch, experiences)):
+            words = rng.sample(WORDS, 3)
+            records.append({
+                "id": str(uuid.uuid4()),
+                "title": f"{words[0].title()} {words[1]} experience {i}",
+                "description": f"A {words[2]} day in {rng.choice(CITIES)} with a local host.",
+                "category": rng.choice(CATEGORIES),
+                "location": rng.choice(CITIES),
+                "price": rng.randint(50, 2000),
+                "duration": f"{rng.randint(1, 8)} hours",
+                "groupSize": rng.randint(40, 200),
+                "highlights": words,
+                "images": [f"https://images.rihlama.com/{i}.jpg"],
+                "hostId": user_ids[rng.randrange(hosts)],
+                "createdAt": created_at,
+            })
+        await server.experiences_db.insert_many(records)
+        server.search_index.add_many(records)
+        experience_ids.extend(record["id"] for record in records)
+
+    for start in range(0, bookings, batch):
+        records = []
+        for _ in range(start, min(start + batch, bookings)):
+            booking = {
+                "id": str(uuid.uuid4()),
+                "userId": user_ids[rng.randrange(users)],
+                "experienceId": experience_ids[rng.randrange(experiences)],
+                "date": (FIRST_DAY + timedelta(days=rng.randrange(365))).isoformat(),
+                "guests": rng.randint(1, 4),
+                "status": "confirmed",
+                "createdAt": created_at,
+            }
+            await server.availability_db.reserve(booking["experienceId"], booking["date"], booking["guests"])
+            records.append(booking)
+        await server.bookings_db.insert_many(records)
+    return user_ids, experience_ids
+
+
+def scenarios(user_ids, experience_ids, tokens):
+    """``name -> factory(rng) -> (method, url, headers, json_body)``."""
+    def auth(r):
+        return {"Authorization": f"Bearer {r.choice(tokens)}"}
+
+    def experience(r):
+        return experience_ids[r.randrange(len(experience_ids))]
+
+    return {
+        "GET /health": lambda r: ("GET", "/health", None, None),
+        "GET /api/experiences": lambda r: (
+            "GET", f"/api/experiences?category={r.choice(CATEGORIES)}&limit=20", None, None),
+        "GET /api/experiences (price range)": lambda r: (
+            "GET", f"/api/experiences?location={r.choice(CITIES)}&minPrice={r.randint(50, 1000)}&maxPrice=2000&limit=20",
+            None, None),
+        "GET /api/experiences/search": lambda r: (
+            "GET", f"/api/experiences/search?q={r.choice(WORDS)}+{r.choice(WORDS)}&limit=20", None, None),
+        "GET /api/experiences/{id}/availability": lambda r: (
+            "GET", f"/api/experiences/{experience(r)}/availability?from=2026-03-01&to=2026-03-31", None, None),
+        "GET /api/users/{id}": lambda r: ("GET", f"/api/users/{user_ids[r.randrange(len(user_ids))]}", None, None),
+        "GET /api/auth/me": lambda r: ("GET", "/api/auth/me", auth(r), None),
+        "GET /api/bookings/my-bookings": lambda r: ("GET", "/api/bookings/my-bookings?limit=20", auth(r), None),
+        "POST /api/bookings": lambda r: ("POST", "/api/bookings", auth(r), {
+            "experienceId": experience(r),
+            "date": (FIRST_DAY + timedelta(days=r.randrange(365))).isoformat(),
+            "guests": 1,
+        }),
+        "POST /api/auth/login": lambda r: ("POST", "/api/auth/login", None, {
+            "email": f"user{r.randrange(len(user_ids))}@bench.rihlama.com", "password": PASSWORD,
+        }),
+    }
+
+
+async def run_scenario(client, factory, seconds, concurrency, seed_value):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n):
+        nonlocal errors
+        r = random.Random(seed_value * 1000 + n)
+        while time.perf_counter() < deadline:
+            method, url, headers, body = factory(r)
+            start = time.perf_counter()
+            response = await client.request(method, url, headers=headers, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            # Laisse passer les autres clients : une requête sans I/O ne rend jamais la main d'elle-même
+            await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+    }
+
+
+async def main_async(args):
+    rng = random.Random(args.seed)
+    volumes = {
+        "users": max(TOKENS, int(args.users * args.scale)),
+        "experiences": max(100, int(args.experiences * args.scale)),
+        "bookings": int(args.bookings * args.scale),
+    }
+    await server.app.router.startup()
+    try:
+        start = time.perf_counter()
+        user_ids, experience_ids = await seed(volumes["users"], volumes["experiences"], volumes["bookings"], rng)
+        seed_seconds = time.perf_counter() - start
+        print(f"seeded {volumes} in {seed_seconds:.1f}s", file=sys.stderr)
+        tokens = []
+        for user_id in rng.sample(user_ids, TOKENS):
+            tokens.append((await server.issue_tokens(await server.users_db.get(user_id)))["accessToken"])
+
+        results = {}
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="https://rihlama.com") as client:
+            for n, (name, factory) in enumerate(scenarios(user_ids, experience_ids, tokens).items()):
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                results[name] = await run_scenario(client, factory, args.seconds, args.concurrency, args.seed + n)
+                print(f"{name:<40} {results[name]['rps']:>9.1f} req/s  p50 {results[name]['p50_ms']:>8.2f}ms  "
+                      f"p95 {results[name]['p95_ms']:>8.2f}ms  p99 {results[name]['p99_ms']:>8.2f}ms  "
+                      f"errors {results[name]['errors']}", file=sys.stderr)
+    finally:
+        await server.app.router.shutdown()
+    return {
+        "commit": git_commit(),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "backend": server.repository.name,
+        "seed": args.seed,
+        "volumes": volumes,
+        "seedSeconds": round(seed_seconds, 1),
+        "seconds": args.seconds,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('volumes')})")
+    print(f"{'scenario':<40} {'req/s':>9} {'p50':>9} {'p99':>9}")
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+
+        def change(key):
+            if not before.get(key) or result.get(key) is None:
+                return "n/a"
+            return f"{(result[key] - before[key]) / before[key] * 100:+.1f}%"
+        print(f"{name:<40} {change('rps'):>9} {change('p50_ms'):>9} {change('p99_ms'):>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--experiences", type=int, default=50_000)
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every seeded volume (e.g. 0.01 for a smoke run)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="run only scenarios whose name contains one of these")
+    parser.add_argument("--output", default="bench_api.json")
+    parser.add_argument("--compare", help="earlier report to diff against")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n")
+    print(f"report written to {args.output}", file=sys.stderr)
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Lock contention benchmark for the in-memory stores.
+
+Runs a read-heavy mix (catalogue pages, "my bookings" pages) alongside
+booking writes from a growing number of client threads, once with every
+operation serialized behind a single global lock (the old ``db_lock``
+model) and once with the per-collection / sharded reader-writer locks.
+
+    python benchmarks/bench_contention.py --seconds 2 --clients 1 2 4 8 16
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from booking_store import BookingStore  # noqa: E402
+from experience_store import ExperienceStore  # noqa: E402
+
+CATEGORIES = ["Adventure", "Culture", "Food", "Wellness"]
+CITIES = ["Marrakech", "Fès", "Merzouga", "Essaouira", "Chefchaouen"]
+
+
+def seed(experiences, users, rng):
+    experiences_db = ExperienceStore()
+    bookings_db = BookingStore()
+    exp_ids = []
+    for i in range(experiences):
+        exp_id = str(uuid.uuid4())
+        exp_ids.append(exp_id)
+        experiences_db.insert({
+            "id": exp_id,
+            "title": f"Experience {i}",
+            "category": rng.choice(CATEGORIES),
+            "location": rng.choice(CITIES),
+            "price": rng.randint(50, 2000),
+            "groupSize": rng.randint(1, 20),
+        })
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    for _ in range(users * 5):
+        bookings_db.insert(make_booking(rng, user_ids, exp_ids))
+    return experiences_db, bookings_db, exp_ids, user_ids
+
+
+def make_booking(rng, user_ids, exp_ids):
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": rng.choice(user_ids),
+        "experienceId": rng.choice(exp_ids),
+        "date": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "status": "confirmed",
+    }
+
+
+def run(clients, seconds, write_ratio, global_lock, stores):
+    experiences_db, bookings_db, exp_ids, user_ids = stores
+    guard = threading.Lock() if global_lock else nullcontext()
+    stop = threading.Event()
+    counts = [0] * clients
+    read_latencies = [[] for _ in range(clients)]
+
+    def client(n):
+        rng = random.Random(n)
+        ops = 0
+        latencies = read_latencies[n]
+        while not stop.is_set():
+            if rng.random() < write_ratio:
+                booking = make_booking(rng, user_ids, exp_ids)
+                with guard:
+                    bookings_db.insert(booking)
+            else:
+                t0 = time.perf_counter()
+                with guard:
+                    if rng.random() < 0.5:
+                        experiences_db.query(category=rng.choice(CATEGORIES), sort_by="price", limit=20)
+                    else:
+                        bookings_db.for_user(rng.choice(user_ids), limit=20)
+                latencies.append(time.perf_counter() - t0)
+            ops += 1
+        counts[n] = ops
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies = sorted(l for per_client in read_latencies for l in per_client)
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6 if latencies else 0.0
+    return sum(counts) / seconds, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--experiences", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=20_000)
+    args = parser.parse_args()
+
+    stores = seed(args.experiences, args.users, random.Random(7))
+    print(f"{'clients':>7} | {'global lock ops/s':>17} {'read p99':>10} | {'sharded RW ops/s':>16} {'read p99':>10}")
+    for clients in args.clients:
+        global_ops, global_p99 = run(clients, args.seconds, args.write_ratio, True, stores)
+        sharded_ops, sharded_p99 = run(clients, args.seconds, args.write_ratio, False, stores)
+        print(
+            f"{clients:>7} | {global_ops:>17,.0f} {global_p99:>8.0f}us | "
+            f"{sharded_ops:>16,.0f} {sharded_p99:>8.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
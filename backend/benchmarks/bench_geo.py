@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Spatial index benchmark: k-nearest and radius queries over N experiences.
+
+Points are clustered around Moroccan cities (plus a uniform share elsewhere
+on the globe); queries are issued near those cities. Reports the insert rate
+and p50/p95/p99 per query kind, against a linear scan of every point.
+
+    python benchmarks/bench_geo.py --experiences 100000 --queries 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from geo_index import GeoIndex, haversine_km  # noqa: E402
+
+CITIES = [(31.63, -7.99), (34.03, -5.00), (35.17, -5.27), (31.09, -4.01), (31.51, -9.77), (30.92, -6.89), (30.43, -9.60)]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def point(rng):
+    if rng.random() < 0.1:
+        return rng.uniform(-80, 80), rng.uniform(-180, 180)
+    lat, lng = rng.choice(CITIES)
+    return lat + rng.gauss(0, 0.3), lng + rng.gauss(0, 0.3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--experiences", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--cell-degrees", type=float, default=0.05)
+    parser.add_argument("--baseline-queries", type=int, default=20, help="linear-scan queries (slow)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    experiences = []
+    for i in range(args.experiences):
+        lat, lng = point(rng)
+        experiences.append({"id": f"exp-{i}", "coordinates": {"lat": lat, "lng": lng}})
+    index = GeoIndex(cell_degrees=args.cell_degrees)
+    start = time.perf_counter()
+    for experience in experiences:
+        index.add(experience)
+    insert_seconds = time.perf_counter() - start
+    print(f"{len(index)} points, {args.experiences / insert_seconds:,.0f} inserts/s (one by one)")
+
+    def origin():
+        lat, lng = rng.choice(CITIES)
+        return lat + rng.gauss(0, 0.5), lng + rng.gauss(0, 0.5)
+
+    kinds = {
+        "knn k=20": lambda lat, lng: index.nearby(lat, lng, limit=20),
+        "radius 5 km": lambda lat, lng: index.nearby(lat, lng, radius_km=5, limit=20),
+        "radius 50 km": lambda lat, lng: index.nearby(lat, lng, radius_km=50, limit=20),
+        "radius 500 km": lambda lat, lng: index.nearby(lat, lng, radius_km=500, limit=20),
+    }
+    print(f"{'query':<16} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, query in kinds.items():
+        latencies = []
+        for _ in range(args.queries):
+            lat, lng = origin()
+            t0 = time.perf_counter()
+            query(lat, lng)
+            latencies.append(time.perf_counter() - t0)
+        print(f"{name:<16} " + " ".join(f"{percentile(latencies, q) * 1e3:>7.3f}ms" for q in (0.5, 0.95, 0.99)))
+
+    points = [(e["id"], e["coordinates"]["lat"], e["coordinates"]["lng"]) for e in experiences]
+    latencies = []
+    for _ in range(args.baseline_queries):
+        lat, lng = origin()
+        t0 = time.perf_counter()
+        sorted((haversine_km(lat, lng, a, b), i) for i, a, b in points)[:20]
+        latencies.append(time.perf_counter() - t0)
+    print(f"{'linear scan':<16} {percentile(latencies, 0.5) * 1e3:>7.3f}ms (p50 over {args.baseline_queries} queries)")
+
+
+if __name__ == "__main__":
+    main()
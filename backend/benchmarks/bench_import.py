@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Batch import throughput: POST /api/experiences/batch vs one POST per item.
+
+Drives the real ASGI app in-process (no network), so the numbers measure
+request parsing, validation, storage writes and index updates only. Use
+STORAGE_BACKEND / SQLITE_PATH to benchmark a persistent backend.
+
+    python benchmarks/bench_import.py --items 20000 --batch 5000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+CATEGORIES = ["Adventure", "Culture", "Food", "Wellness"]
+CITIES = ["Marrakech", "Fès", "Merzouga", "Essaouira", "Chefchaouen"]
+WORDS = ["desert", "camel", "tajine", "medina", "souk", "hammam", "atlas", "surf", "berber", "pottery"]
+
+
+def make_experience(rng, i):
+    return {
+        "title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}",
+        "description": " ".join(rng.choices(WORDS, k=20)),
+        "category": rng.choice(CATEGORIES),
+        "location": rng.choice(CITIES),
+        "price": rng.randint(50, 2000),
+        "duration": "3h",
+        "groupSize": rng.randint(1, 20),
+        "highlights": rng.sample(WORDS, 3),
+        "images": [f"https://img.rihlama.com/{uuid.uuid4()}.jpg"],
+    }
+
+
+def host_headers(client):
+    response = client.post("/api/auth/register", json={
+        "email": f"bench-{uuid.uuid4()}@rihlama.com", "password": "bench",
+        "firstName": "Bench", "lastName": "Host", "isHost": True,
+    })
+    return {"Authorization": "Bearer " + response.json()["data"]["tokens"]["accessToken"]}
+
+
+def run_single(client, headers, items):
+    start = time.perf_counter()
+    for item in items:
+        assert client.post("/api/experiences", json=item, headers=headers).status_code == 201
+    return time.perf_counter() - start
+
+
+def run_batches(client, headers, items, batch, ndjson):
+    start = time.perf_counter()
+    for offset in range(0, len(items), batch):
+        chunk = items[offset:offset + batch]
+        if ndjson:
+            body = "\n".join(json.dumps(item) for item in chunk).encode()
+            kwargs = {"content": body, "headers": {**headers, "Content-Type": "application/x-ndjson"}}
+        else:
+            kwargs = {"json": chunk, "headers": headers}
+        response = client.post("/api/experiences/batch", **kwargs)
+        assert response.json()["data"]["created"] == len(chunk)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    parser.add_argument("--single", type=int, default=2_000, help="items posted one by one (baseline)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with TestClient(server.app, base_url="https://rihlama.com") as client:
+        headers = host_headers(client)
+        single = run_single(client, headers, [make_experience(rng, i) for i in range(args.single)])
+        print(f"{'single POST':>14}: {args.single / single:>9.0f} items/s")
+        for ndjson in (False, True):
+            items = [make_experience(rng, i) for i in range(args.items)]
+            elapsed = run_batches(client, headers, items, args.batch, ndjson)
+            label = "batch NDJSON" if ndjson else "batch array"
+            print(f"{label:>14}: {args.items / elapsed:>9.0f} items/s  ({args.batch} per request)")
+
+
+if __name__ == "__main__":
+    main()
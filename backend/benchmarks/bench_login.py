@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Login throughput with hashed passwords, and event-loop latency under login load.
+
+Registers a few users, then fires concurrent POST /api/auth/login requests
+at the in-process ASGI app for each KDF cost in --rounds, while a probe
+measures GET /health latency on the same loop (from when each probe was due,
+so time spent waiting for a blocked loop counts). "inline" runs the KDF on
+the event loop (the naive approach) for comparison with the thread pool.
+
+    python benchmarks/bench_login.py --rounds 29000 100000 --seconds 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from passwords import PasswordHasher  # noqa: E402
+
+USERS = 20
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+async def run(rounds, inline, seconds, concurrency, workers):
+    server.password_hasher = hasher = PasswordHasher(rounds=rounds, workers=workers)
+    if inline:
+        async def on_loop(fn, *args):
+            return fn(*args)
+        hasher._run = on_loop
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="https://rihlama.com") as client:
+        credentials = []
+        for _ in range(USERS):
+            email = f"bench-{uuid.uuid4()}@rihlama.com"
+            await client.post("/api/auth/register", json={
+                "email": email, "password": "correct horse", "firstName": "B", "lastName": "L",
+            })
+            credentials.append({"email": email, "password": "correct horse"})
+
+        deadline = time.perf_counter() + seconds
+        logins = 0
+        probes = []
+
+        async def login_worker(i):
+            nonlocal logins
+            while time.perf_counter() < deadline:
+                response = await client.post("/api/auth/login", json=credentials[i % USERS])
+                assert response.status_code == 200, response.text
+                logins += 1
+
+        async def probe():
+            # Délai mesuré depuis l'instant où la sonde devait partir : inclut l'attente de la boucle
+            while time.perf_counter() < deadline:
+                due = time.perf_counter() + 0.01
+                await asyncio.sleep(0.01)
+                await client.get("/health")
+                probes.append(time.perf_counter() - due)
+
+        start = time.perf_counter()
+        await asyncio.gather(probe(), *(login_worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    hasher.close()
+    return logins / elapsed, statistics.median(probes), percentile(probes, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[29_000, 100_000])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="hashing threads (default: CPU count)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"{cores} core(s), {args.concurrency} concurrent clients")
+    print(f"{'rounds':>8} {'mode':>7} | {'logins/s':>9} {'per core':>9} | {'/health p50':>11} {'p99':>9}")
+    for rounds in args.rounds:
+        for inline in (True, False):
+            rate, p50, p99 = asyncio.run(run(rounds, inline, args.seconds, args.concurrency, args.workers))
+            mode = "inline" if inline else "pool"
+            print(f"{rounds:>8} {mode:>7} | {rate:>9.1f} {rate / cores:>9.1f} | {p50 * 1000:>9.2f}ms {p99 * 1000:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Memory per record: compact stores vs the previous dict-per-document layout.
+
+Builds --users users, --experiences experiences and --bookings bookings the
+way the API does (each document parsed from its own JSON body, so no id
+string is shared by accident) and loads them into:
+
+* ``dict``: the layout the stores used before the compact records: every
+  document a dict kept by id, plus the same secondary indexes they kept
+  (email index and ``(seq, id)`` order list for users; id/seq maps and
+  category, location and price indexes for experiences; ``(date, seq, id)``
+  tuples per user and per experience for bookings);
+* ``compact``: ``UserStore``, ``ExperienceStore`` and ``BookingStore``.
+
+Memory is what ``tracemalloc`` sees still allocated once the input documents
+are dropped, divided by the number of records.
+
+    python benchmarks/bench_memory.py --bookings 1000000
+"""
+
+import argparse
+import bisect
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from booking_store import BookingStore  # noqa: E402
+from experience_store import ExperienceStore, normalize_key, to_number  # noqa: E402
+from responses import dumps, loads  # noqa: E402
+from user_store import UserStore, normalize_email  # noqa: E402
+
+CATEGORIES = ["Adventure", "Culture", "Food", "Wellness"]
+CITIES = ["Marrakech", "Fès", "Merzouga", "Essaouira", "Chefchaouen"]
+STATUSES = ["confirmed", "confirmed", "confirmed", "pending", "cancelled"]
+FIRST_DAY = date(2026, 1, 1)
+
+
+def parsed(doc):
+    # Comme un corps de requête : chaque document a ses propres chaînes
+    return loads(dumps(doc))
+
+
+def make_users(rng, count, started):
+    for i in range(count):
+        yield parsed({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "firstName": f"First{i}", "lastName": f"Last{i}", "email": f"user{i}@bench.rihlama.com",
+            "password": "$pbkdf2-sha256$29000$" + "x" * 64,
+            "phoneNumber": "+2126%08d" % i, "dateOfBirth": "1990-05-15", "isHost": i % 20 == 0,
+            "createdAt": (started + timedelta(seconds=i)).isoformat(),
+        })
+
+
+def make_experiences(rng, count, host_ids, started):
+    for i in range(count):
+        yield parsed({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "title": f"Experience {i}", "description": "A bench experience in the medina. " * 4,
+            "category": rng.choice(CATEGORIES), "location": rng.choice(CITIES),
+            "price": rng.randint(50, 2000), "duration": "3h", "groupSize": rng.randint(1, 20),
+            "highlights": ["tea", "souk"], "images": [f"https://img.rihlama.com/{i}.jpg"],
+            "hostId": rng.choice(host_ids), "createdAt": (started + timedelta(seconds=i)).isoformat(),
+        })
+
+
+def make_bookings(rng, count, user_ids, experience_ids, started):
+    for i in range(count):
+        yield parsed({
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "userId": rng.choice(user_ids), "experienceId": rng.choice(experience_ids),
+            "date": (FIRST_DAY + timedelta(days=rng.randrange(365))).isoformat(),
+            "guests": rng.randint(1, 4), "status": rng.choice(STATUSES),
+            "createdAt": (started + timedelta(microseconds=rng.getrandbits(40))).isoformat(),
+        })
+
+
+# --- Disposition précédente : un dict par document et les mêmes index ---
+
+def dict_users(users):
+    by_id, by_email, order = {}, {}, []
+    for seq, user in enumerate(users):
+        by_id[user["id"]] = user
+        by_email[normalize_email(user["email"])] = user["id"]
+        order.append((seq, user["id"]))
+    return by_id, by_email, order
+
+
+def dict_experiences(experiences):
+    by_id, by_seq, seq_of, order, by_category, by_location, by_price = {}, {}, {}, [], {}, {}, []
+    for seq, experience in enumerate(experiences):
+        by_id[experience["id"]] = experience
+        by_seq[seq] = experience["id"]
+        seq_of[experience["id"]] = seq
+        order.append(seq)
+        by_category.setdefault(normalize_key(experience.get("category")), []).append(seq)
+        by_location.setdefault(normalize_key(experience.get("location")), []).append(seq)
+        price = to_number(experience.get("price"))
+        if price is not None:
+            by_price.append((price, seq))
+    by_price.sort()
+    return by_id, by_seq, seq_of, order, by_category, by_location, by_price
+
+
+def dict_bookings(bookings):
+    by_id, keys, order, by_user, by_experience = {}, {}, [], {}, {}
+    for seq, booking in enumerate(bookings):
+        by_id[booking["id"]] = booking
+        order.append((seq, booking["id"]))
+        key = (str(booking.get("date") or ""), seq, booking["id"])
+        keys[booking["id"]] = key
+        bisect.insort(by_user.setdefault(booking["userId"], []), key)
+        bisect.insort(by_experience.setdefault(booking["experienceId"], []), key)
+    return by_id, keys, order, by_user, by_experience
+
+
+def compact_users(users):
+    store = UserStore()
+    for user in users:
+        store.insert(user)
+    return store
+
+
+def compact_experiences(experiences):
+    store = ExperienceStore()
+    store.insert_many(list(experiences))
+    return store
+
+
+def compact_bookings(bookings):
+    store = BookingStore()
+    for booking in bookings:
+        store.insert(booking)
+    return store
+
+
+LAYOUTS = {
+    "dict": {"users": dict_users, "experiences": dict_experiences, "bookings": dict_bookings},
+    "compact": {"users": compact_users, "experiences": compact_experiences, "bookings": compact_bookings},
+}
+
+
+def measure(build, documents):
+    """Bytes still allocated by ``build(documents)`` once only its result is kept, and the seconds it took."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    kept = build(documents())
+    seconds = time.perf_counter() - started
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    del kept
+    return used, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--experiences", type=int, default=10_000)
+    parser.add_argument("--bookings", type=int, default=500_000)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    started = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    ids = random.Random(1)
+    user_ids = [str(uuid.UUID(int=ids.getrandbits(128), version=4)) for _ in range(args.users)]
+    host_ids = user_ids[::20] or user_ids
+    experience_ids = [str(uuid.UUID(int=ids.getrandbits(128), version=4)) for _ in range(args.experiences)]
+    collections = {
+        "users": (args.users, lambda: make_users(random.Random(2), args.users, started)),
+        "experiences": (args.experiences, lambda: make_experiences(random.Random(3), args.experiences, host_ids, started)),
+        "bookings": (args.bookings, lambda: make_bookings(
+            random.Random(4), args.bookings, user_ids, experience_ids, started,
+        )),
+    }
+
+    tracemalloc.start()
+    rows = []
+    for name, (count, documents) in collections.items():
+        if not count:
+            continue
+        row = {"collection": name, "records": count}
+        for layout, builders in LAYOUTS.items():
+            used, seconds = measure(builders[name], documents)
+            row[f"{layout}_bytes_per_record"] = round(used / count)
+            row[f"{layout}_load_seconds"] = round(seconds, 2)
+        row["ratio"] = round(row["dict_bytes_per_record"] / row["compact_bytes_per_record"], 2)
+        rows.append(row)
+    tracemalloc.stop()
+
+    columns = ["collection", "records", "dict_bytes_per_record", "compact_bytes_per_record", "ratio",
+               "dict_load_seconds", "compact_load_seconds"]
+    print(" ".join(f"{c:>24}" for c in columns))
+    for row in rows:
+        print(" ".join(f"{str(row[c]):>24}" for c in columns))
+    if args.output:
+        Path(args.output).write_text(json.dumps({"results": rows}, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Messaging fan-out benchmark: concurrent WebSocket connections and messages/s.
+
+Opens --connections WebSocket connections to ``/api/messages/ws`` directly
+through the ASGI app (no sockets), spread over --users users, and creates
+--conversations random two-party conversations between them. Then, for each
+transport, --senders clients send messages as fast as their acknowledgements
+come back for --seconds:
+
+* ``ws``: ``send`` frames over the sender's own WebSocket;
+* ``rest``: ``POST /api/messages`` through httpx's ASGI transport.
+
+Every message is appended to the conversation log and pushed to all the
+connections of both participants. The report gives messages/s, deliveries/s,
+the send latency (until the acknowledgement) and the delivery latency (until
+a recipient's connection is handed the frame), as p50/p95/p99.
+
+--slow makes a fraction of the connections take --slow-delay-ms per frame,
+to show the bounded queues at work: those connections are closed with 1013
+once they fall --queue-size events behind, and the others are not slowed.
+
+    python benchmarks/bench_messaging.py --connections 2000 --senders 50 --seconds 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("JWT_SECRET", secrets.token_urlsafe(48))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+class Connection:
+    """One WebSocket client driven through ``server.app`` as an ASGI scope."""
+
+    def __init__(self, user_id, token, delay, stats):
+        self.user_id = user_id
+        self.token = token
+        self.delay = delay
+        self.stats = stats
+        self.inbox = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.acks = {}  # ref -> future
+        self.close_code = None
+        self.task = None
+
+    async def open(self, app):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "wss", "http_version": "1.1",
+            "path": "/api/messages/ws", "raw_path": b"/api/messages/ws", "query_string": b"",
+            "root_path": "", "server": ("rihlama.com", 443), "subprotocols": [],
+            "headers": [(b"host", b"rihlama.com"), (b"authorization", f"Bearer {self.token}".encode())],
+        }
+        self.task = asyncio.create_task(app(scope, self.inbox.get, self.send))
+        await self.inbox.put({"type": "websocket.connect"})
+        await self.accepted.wait()
+
+    async def send(self, message):
+        kind = message["type"]
+        if kind == "websocket.accept":
+            self.accepted.set()
+        elif kind == "websocket.close":
+            self.close_code = message.get("code", 1000)
+            self.accepted.set()
+        elif kind == "websocket.send":
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            now = time.perf_counter()
+            event = json.loads(message["text"])
+            if event["type"] == "message":
+                self.stats["deliveries"] += 1
+                self.stats["delivery"].append(now - float(event["message"]["text"]))
+            elif event["type"] == "sent":
+                self.acks.pop(event["ref"]).set_result(now)
+
+    async def send_frame(self, frame):
+        future = asyncio.get_running_loop().create_future()
+        self.acks[frame["ref"]] = future
+        await self.inbox.put({"type": "websocket.receive", "text": json.dumps(frame)})
+        return await future
+
+    async def close(self):
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def sender_ws(connection, conversations, deadline, stats, rng):
+    ref = 0
+    while time.perf_counter() < deadline and connection.close_code is None:
+        ref += 1
+        start = time.perf_counter()
+        frame = {"type": "send", "ref": ref, "conversationId": rng.choice(conversations), "text": repr(start)}
+        await connection.send_frame(frame)
+        stats["send"].append(time.perf_counter() - start)
+        stats["messages"] += 1
+
+
+async def sender_rest(client, token, conversations, deadline, stats, rng):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        body = {"conversationId": rng.choice(conversations), "text": repr(start)}
+        response = await client.post("/api/messages", headers=headers, json=body)
+        if response.status_code != 201:
+            raise SystemExit(f"POST /api/messages returned {response.status_code}: {response.text}")
+        stats["send"].append(time.perf_counter() - start)
+        stats["messages"] += 1
+        # Sans socket, la requête ne rend jamais la main : on laisse les connexions envoyer leurs files
+        await asyncio.sleep(0)
+
+
+def new_stats():
+    return {"messages": 0, "deliveries": 0, "send": [], "delivery": []}
+
+
+def summarize(name, stats, seconds):
+    row = {
+        "transport": name,
+        "messages": stats["messages"],
+        "messages_per_s": round(stats["messages"] / seconds, 1),
+        "deliveries_per_s": round(stats["deliveries"] / seconds, 1),
+    }
+    for kind in ("send", "delivery"):
+        for q in (0.5, 0.95, 0.99):
+            value = percentile(stats[kind], q)
+            row[f"{kind}_p{int(q * 100)}_ms"] = round(value * 1000, 3) if value is not None else None
+    return row
+
+
+async def run(args):
+    import httpx
+    import server
+    from message_store import new_conversation
+
+    rng = random.Random(11)
+    await server.app.router.startup()
+    try:
+        created_at = datetime.now(timezone.utc).isoformat()
+        users = []
+        for i in range(args.users):
+            user = {"id": str(uuid.uuid4()), "email": f"chat{i}@bench.rihlama.com", "firstName": f"User{i}",
+                    "lastName": "Bench", "isHost": i % 10 == 0, "createdAt": created_at}
+            await server.users_db.insert(user)
+            users.append((user["id"], (await server.issue_tokens(user))["accessToken"]))
+
+        by_user = {user_id: [] for user_id, _ in users}
+        for _ in range(args.conversations):
+            (a, _), (b, _) = rng.sample(users, 2)
+            conversation = await server.messages_db.open_conversation(
+                new_conversation(str(uuid.uuid4()), [a, b], None, created_at)
+            )
+            for user_id in (a, b):
+                by_user[user_id].append(conversation["id"])
+
+        stats = new_stats()
+        connections = []
+        started = time.perf_counter()
+        for i in range(args.connections):
+            user_id, token = users[i % len(users)]
+            delay = args.slow_delay_ms / 1000 if rng.random() < args.slow else 0
+            connection = Connection(user_id, token, delay, stats)
+            await connection.open(server.app)
+            connections.append(connection)
+        print(f"{len(connections)} connections for {args.users} users opened in "
+              f"{time.perf_counter() - started:.2f}s; {args.conversations} conversations")
+
+        senders = [c for c in connections if by_user[c.user_id] and not c.delay][:args.senders]
+        report = []
+        for transport in args.transports:
+            stats.update(new_stats())
+            deadline = time.perf_counter() + args.seconds
+            if transport == "ws":
+                jobs = [sender_ws(c, by_user[c.user_id], deadline, stats, random.Random(i)) for i, c in enumerate(senders)]
+                await asyncio.gather(*jobs)
+            else:
+                transport_ = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport_, base_url="https://rihlama.com") as client:
+                    jobs = [
+                        sender_rest(client, c.token, by_user[c.user_id], deadline, stats, random.Random(i))
+                        for i, c in enumerate(senders)
+                    ]
+                    await asyncio.gather(*jobs)
+            await asyncio.sleep(0.2)  # laisser les files se vider
+            report.append(summarize(transport, stats, args.seconds))
+
+        hub = server.message_hub.stats()
+        slow = sum(1 for c in connections if c.delay)
+        closed = sum(1 for c in connections if c.close_code == 1013)
+        for connection in connections:
+            if connection.close_code is None:
+                await connection.close()
+    finally:
+        await server.app.router.shutdown()
+
+    columns = ["transport", "messages_per_s", "deliveries_per_s", "send_p50_ms", "send_p99_ms",
+               "delivery_p50_ms", "delivery_p95_ms", "delivery_p99_ms"]
+    print(" ".join(f"{c:>16}" for c in columns))
+    for row in report:
+        print(" ".join(f"{str(row[c]):>16}" for c in columns))
+    print(f"hub: {hub}")
+    print(f"slow connections: {slow}, closed for falling behind (1013): {closed}")
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "connections": args.connections, "users": args.users, "conversations": args.conversations,
+            "senders": len(senders), "seconds": args.seconds, "queue_size": args.queue_size,
+            "storage": server.repository.name, "results": report, "hub": hub,
+            "slow_connections": slow, "overflow_closes": closed,
+        }, indent=2) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--senders", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--transports", nargs="+", choices=["ws", "rest"], default=["ws", "rest"])
+    parser.add_argument("--queue-size", type=int, default=256, help="WS_QUEUE_SIZE for the run")
+    parser.add_argument("--slow", type=float, default=0.0, help="fraction of slow connections")
+    parser.add_argument("--slow-delay-ms", type=float, default=50)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+    os.environ["WS_QUEUE_SIZE"] = str(args.queue_size)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
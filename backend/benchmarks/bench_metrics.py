@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Per-request cost of MetricsMiddleware, and of a /metrics scrape.
+
+Drives a minimal ASGI app directly (no HTTP client, no routing) with and
+without the middleware in front of it, so the difference is the time the
+middleware itself adds to each request. Also times an instrumented RWLock
+against a plain one, and renders a scrape with --routes route series.
+
+    python benchmarks/bench_metrics.py --requests 200000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from locks import RWLock  # noqa: E402
+from metrics import Metrics, MetricsMiddleware  # noqa: E402
+
+
+class Route:
+    path = "/api/experiences/{experience_id}"
+
+
+ROUTE = Route()
+START = {"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]}
+BODY = {"type": "http.response.body", "body": b'{"success":true,"data":{}}'}
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    await send(START)
+    await send(BODY)
+
+
+async def drive(app, requests):
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    headers = [(b"host", b"rihlama.com"), (b"content-length", b"0"), (b"authorization", b"Bearer x")]
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "GET", "path": "/api/experiences/1", "headers": headers}, receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def time_lock(lock, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        with lock.read():
+            pass
+        with lock.write():
+            pass
+    return (time.perf_counter() - start) / rounds / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--routes", type=int, default=50)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    bare = asyncio.run(drive(endpoint, args.requests))
+    wrapped = asyncio.run(drive(MetricsMiddleware(endpoint, metrics), args.requests))
+    print(f"request without middleware : {bare * 1e6:7.2f} µs")
+    print(f"request with middleware    : {wrapped * 1e6:7.2f} µs")
+    print(f"middleware overhead        : {(wrapped - bare) * 1e6:7.2f} µs/request")
+
+    plain = time_lock(RWLock(), args.requests)
+    named = time_lock(RWLock("bench"), args.requests)
+    print(f"lock acquire+release       : {plain * 1e6:7.2f} µs plain, {named * 1e6:.2f} µs instrumented")
+
+    for i in range(args.routes):
+        metrics.record("GET", f"/api/route/{i}", 200, 0.003, 0, 512)
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"scrape render ({len(metrics.routes)} routes)  : {(time.perf_counter() - start) * 1000:7.2f} ms, {len(text)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Durable memory backend: write-ahead log throughput and startup recovery time.
+
+Works on ``DurableMemoryRepository`` directly (no HTTP), in a fresh data
+directory:
+
+1. load --users users, --experiences experiences and --bookings bookings
+   (bulk, as ``insert_many`` batches), then take a snapshot;
+2. write --tail more bookings one record at a time from --clients
+   concurrent writers, as ``create_booking`` does: this part measures the
+   group commit (records per fsync) and stays in the log as its tail;
+3. close, then time ``connect()`` on a new repository: load the snapshot,
+   replay the tail, rebuild the availability counters.
+
+    python benchmarks/bench_recovery.py --bookings 1000000 --tail 100000
+    python benchmarks/bench_recovery.py --sync none --commit-delay-ms 2
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from durable_repository import DurableMemoryRepository  # noqa: E402
+
+CITIES = ["Marrakech", "Fès", "Merzouga", "Essaouira", "Chefchaouen"]
+FIRST_DAY = date(2026, 1, 1)
+
+
+def make_user(i, created_at):
+    return {
+        "id": str(uuid.uuid4()), "email": f"user{i}@bench.rihlama.com", "password": "$pbkdf2-sha256$29000$" + "x" * 64,
+        "firstName": f"User{i}", "lastName": "Bench", "isHost": i % 20 == 0, "createdAt": created_at,
+    }
+
+
+def make_experience(rng, i, host_id, created_at):
+    return {
+        "id": str(uuid.uuid4()), "title": f"Experience {i}", "description": "Bench experience " * 5,
+        "category": "Culture", "location": rng.choice(CITIES), "price": rng.randint(50, 2000), "duration": "3h",
+        "groupSize": 20, "highlights": [], "images": [], "hostId": host_id, "createdAt": created_at,
+    }
+
+
+def make_booking(rng, users, experiences, created_at):
+    return {
+        "id": str(uuid.uuid4()), "userId": rng.choice(users)["id"], "experienceId": rng.choice(experiences)["id"],
+        "date": (FIRST_DAY + timedelta(days=rng.randrange(365))).isoformat(), "guests": rng.randint(1, 4),
+        "status": "confirmed", "createdAt": created_at,
+    }
+
+
+def open_repository(args, directory):
+    return DurableMemoryRepository(
+        directory, sync=args.sync == "fsync", commit_delay=args.commit_delay_ms / 1000, snapshot_interval=0,
+    )
+
+
+async def write_tail(repository, args, users, experiences, created_at):
+    latencies = []
+    per_client = args.tail // args.clients
+
+    async def client(seed):
+        rng = random.Random(seed)
+        for _ in range(per_client):
+            start = time.perf_counter()
+            await repository.bookings.insert(make_booking(rng, users, experiences, created_at))
+            latencies.append(time.perf_counter() - start)
+
+    commits = repository.log.commits
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    commits = repository.log.commits - commits
+    return {
+        "records": len(latencies),
+        "records_per_s": round(len(latencies) / elapsed),
+        "commits": commits,
+        "records_per_commit": round(len(latencies) / max(1, commits), 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+    }
+
+
+async def run(args, directory):
+    rng = random.Random(7)
+    created_at = datetime.now(timezone.utc).isoformat()
+    repository = open_repository(args, directory)
+    await repository.connect()
+
+    started = time.perf_counter()
+    users = [make_user(i, created_at) for i in range(args.users)]
+    # Pas d'insertion groupée pour les utilisateurs : directement dans le store, le snapshot les persiste
+    for user in users:
+        repository.users.store.insert(user)
+    hosts = [u for u in users if u["isHost"]] or users
+    experiences = [make_experience(rng, i, rng.choice(hosts)["id"], created_at) for i in range(args.experiences)]
+    await repository.experiences.insert_many(experiences)
+    for start in range(0, args.bookings, 10_000):
+        count = min(10_000, args.bookings - start)
+        await repository.bookings.insert_many([make_booking(rng, users, experiences, created_at) for _ in range(count)])
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await repository.snapshot()
+    snapshot_seconds = time.perf_counter() - started
+
+    tail = await write_tail(repository, args, users, experiences, created_at)
+    await repository.close()
+
+    files = {path.name: path.stat().st_size for path in sorted(Path(directory).iterdir()) if path.name != "LOCK"}
+    records = args.users + args.experiences + args.bookings + tail["records"]
+
+    recovered = open_repository(args, directory)
+    started = time.perf_counter()
+    await recovered.connect()
+    recovery_seconds = time.perf_counter() - started
+    sizes = await recovered.sizes()
+    await recovered.close()
+    assert sizes["bookings"] == args.bookings + tail["records"], sizes
+
+    return {
+        "sync": args.sync, "commit_delay_ms": args.commit_delay_ms, "clients": args.clients,
+        "records": records,
+        "load_seconds": round(load_seconds, 2),
+        "snapshot_seconds": round(snapshot_seconds, 2),
+        "tail_writes": tail,
+        "files_bytes": files,
+        "recovery_seconds": round(recovery_seconds, 2),
+        "recovered_records_per_s": round(records / recovery_seconds),
+        "recovered": sizes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--experiences", type=int, default=10_000)
+    parser.add_argument("--bookings", type=int, default=1_000_000)
+    parser.add_argument("--tail", type=int, default=100_000, help="bookings written one by one after the snapshot")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent writers for the tail")
+    parser.add_argument("--sync", choices=["fsync", "none"], default="fsync")
+    parser.add_argument("--commit-delay-ms", type=float, default=0)
+    parser.add_argument("--data-dir", help="directory to use (default: a temporary one, deleted afterwards)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    directory = args.data_dir or tempfile.mkdtemp(prefix="rihla-wal-")
+    try:
+        report = asyncio.run(run(args, directory))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
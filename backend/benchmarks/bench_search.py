@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Search latency benchmark: indexes N synthetic experiences and reports
+p50/p95/p99 for a mix of full-word, multi-word and prefix queries.
+
+    python benchmarks/bench_search.py --experiences 100000
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from search_index import SearchIndex  # noqa: E402
+
+CITIES = ["Marrakech", "Fès", "Chefchaouen", "Merzouga", "Essaouira", "Ouarzazate", "Tanger", "Agadir", "Rabat", "Meknès"]
+CATEGORIES = ["Adventure", "Culture", "Food", "Wellness", "Nature", "Photography"]
+WORDS = (
+    "desert dunes camel tagine couscous riad souk medina hammam atlas mountains berber village "
+    "sunset sahara oasis pottery calligraphy spices market henna argan surf kasbah tea mint "
+    "guided tour cooking class trek hike night stars camp music gnawa rooftop terrace garden"
+).split()
+# Vocabulaire de remplissage : les descriptions réelles suivent une loi de Zipf
+FILLER = [f"w{i}" for i in range(20_000)]
+FILLER_WEIGHTS = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(FILLER))))
+QUERIES = ["tagine", "fes cooking", "merzouga desert camel", "chef", "sah", "hammam marrakech", "berber vil", "gnawa music essaouira", "zzz"]
+
+
+def make_experience(rng):
+    city = rng.choice(CITIES)
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} in {city}",
+        "description": " ".join(rng.choices(WORDS, k=4) + rng.choices(FILLER, cum_weights=FILLER_WEIGHTS, k=36)),
+        "highlights": [" ".join(rng.choice(WORDS) for _ in range(3)) for _ in range(4)],
+        "location": city,
+        "category": rng.choice(CATEGORIES),
+    }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--experiences", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    index = SearchIndex()
+    started = time.perf_counter()
+    for _ in range(args.experiences):
+        index.add(make_experience(rng))
+    print(f"indexed {args.experiences} experiences in {time.perf_counter() - started:.2f}s")
+
+    for query in QUERIES:
+        # Première requête : construit les listes d'impact des termes (coût à froid)
+        t0 = time.perf_counter()
+        index.search(query, limit=20)
+        cold = (time.perf_counter() - t0) * 1000
+        samples = []
+        for _ in range(args.rounds):
+            t0 = time.perf_counter()
+            ids, total = index.search(query, limit=20)
+            samples.append((time.perf_counter() - t0) * 1000)
+        print(
+            f"{query!r:28} hits={total:>7} cold={cold:7.2f}ms p50={percentile(samples, 50):7.2f}ms "
+            f"p95={percentile(samples, 95):7.2f}ms p99={percentile(samples, 99):7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Cold-start time of the API, with budgets that fail the run when exceeded.
+
+Each run starts a fresh interpreter that imports ``server``, runs the startup
+hook and serves one ``GET /health`` through the ASGI app (no sockets). The
+medians of --runs runs are compared with the budgets; the process exits
+with status 1 if any budget is exceeded, or if a module that should load
+lazily (password hashing, the profiler, heavy data libraries) was imported
+before the first request.
+
+    python benchmarks/bench_startup.py --runs 5 --import-budget-ms 800
+"""
+
+import argparse
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+# Modules qui ne doivent pas être chargés avant la première requête
+LAZY_MODULES = ["passlib", "profiler", "sqlite_repository", "mongo_repository", "pandas", "numpy", "boto3"]
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+
+async def first_request():
+    await server.app.router.startup()
+    ready = time.perf_counter()
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "https", "path": "/health", "raw_path": b"/health", "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"rihlama.com")], "server": ("rihlama.com", 443),
+    }
+    await server.app(scope, receive, send)
+    served = time.perf_counter()
+    loaded = [name for name in LAZY_MODULES if name in sys.modules]
+    await server.app.router.shutdown()
+    return ready, served, status[0], loaded
+
+ready, served, status, loaded = asyncio.run(first_request())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - imported) * 1000,
+    "first_request_ms": (served - started) * 1000,
+    "status": status,
+    "modules": len(sys.modules),
+    "lazy_loaded": loaded,
+}))
+"""
+
+
+def run_once(env):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", f"LAZY_MODULES = {LAZY_MODULES!r}\n{CHILD}"],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True,
+    )
+    measures = json.loads(result.stdout.strip().splitlines()[-1])
+    measures["process_ms"] = (time.perf_counter() - start) * 1000
+    return measures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 800)))
+    parser.add_argument("--first-request-budget-ms", type=float,
+                        default=float(os.environ.get("STARTUP_FIRST_REQUEST_BUDGET_MS", 1000)))
+    parser.add_argument("--output", help="write the medians as JSON")
+    args = parser.parse_args()
+
+    env = dict(os.environ, STORAGE_BACKEND="memory", PROFILE_ENABLED="0")
+    env.setdefault("JWT_SECRET", secrets.token_urlsafe(48))
+    runs = [run_once(env) for _ in range(args.runs)]
+    medians = {
+        key: round(statistics.median(run[key] for run in runs), 1)
+        for key in ("import_ms", "startup_ms", "first_request_ms", "process_ms", "modules")
+    }
+    lazy_loaded = sorted({name for run in runs for name in run["lazy_loaded"]})
+
+    print(f"{args.runs} runs, medians:")
+    for key, value in medians.items():
+        print(f"  {key:<18} {value:>8}")
+    failures = []
+    if medians["import_ms"] > args.import_budget_ms:
+        failures.append(f"import took {medians['import_ms']} ms (budget {args.import_budget_ms} ms)")
+    if medians["first_request_ms"] > args.first_request_budget_ms:
+        failures.append(f"first request after {medians['first_request_ms']} ms (budget {args.first_request_budget_ms} ms)")
+    if lazy_loaded:
+        failures.append(f"loaded before the first request: {', '.join(lazy_loaded)}")
+    if any(run["status"] != 200 for run in runs):
+        failures.append("GET /health did not return 200")
+    if args.output:
+        Path(args.output).write_text(json.dumps({**medians, "lazy_loaded": lazy_loaded, "failures": failures}, indent=2) + "\n")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Multi-worker scaling benchmark.
+
+Starts ``uvicorn server:app --workers N`` on the shared SQLite backend for each
+N, seeds a catalogue and a user over HTTP, then drives the read-heavy
+``GET /api/experiences`` and ``GET /api/auth/me`` paths from several load
+processes and reports requests/sec. Every request is checked for a 200, so a
+token issued by one worker but rejected by another shows up as an error.
+
+    python benchmarks/bench_workers.py --workers 1 2 4 --seconds 10
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+# Le serveur force HTTPS et filtre les hôtes : on se présente comme derrière le proxy
+HEADERS = {"Host": "rihlama.com", "X-Forwarded-Proto": "https"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, port, db_path):
+    env = dict(os.environ, STORAGE_BACKEND="sqlite", SQLITE_PATH=db_path, WEB_CONCURRENCY=str(workers))
+    # Tous les workers doivent signer les jetons d'accès avec la même clé
+    env.setdefault("JWT_SECRET", secrets.token_urlsafe(32))
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "server:app",
+            "--port", str(port), "--workers", str(workers),
+            "--proxy-headers", "--forwarded-allow-ips", "*", "--log-level", "warning",
+        ],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", headers=HEADERS).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def seed(base, experiences):
+    with httpx.Client(base_url=base, headers=HEADERS) as client:
+        def register(email, is_host):
+            response = client.post("/api/auth/register", json={
+                "firstName": "Bench", "lastName": "User", "email": email, "password": "pw", "isHost": is_host,
+            })
+            response.raise_for_status()
+            return response.json()["data"]["tokens"]["accessToken"]
+
+        suffix = os.urandom(4).hex()
+        host_token = register(f"host-{suffix}@bench.ma", True)
+        for i in range(experiences):
+            client.post("/api/experiences", headers={"Authorization": f"Bearer {host_token}"}, json={
+                "title": f"Experience {i}", "description": "Bench", "category": "Culture",
+                "location": "Marrakech", "price": 100 + i, "duration": "2h", "groupSize": 8,
+                "highlights": ["souk"], "images": ["a.jpg"],
+            }).raise_for_status()
+        return register(f"user-{suffix}@bench.ma", False)
+
+
+async def drive(base, token, seconds, clients):
+    counts = {"/api/experiences?limit=20": 0, "/api/auth/me": 0}
+    errors = 0
+    auth = {**HEADERS, "Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, limits=limits) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def loop(n):
+            nonlocal errors
+            paths = list(counts)
+            i = n
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                response = await client.get(path, headers=auth)
+                if response.status_code == 200:
+                    counts[path] += 1
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(loop(n) for n in range(clients)))
+    return counts, errors
+
+
+def load_process(args):
+    return asyncio.run(drive(*args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--load-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--clients", type=int, default=32, help="concurrent connections per load process")
+    parser.add_argument("--experiences", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} load_processes={args.load_processes} clients/process={args.clients}")
+    print(f"{'workers':>7} | {'experiences req/s':>17} | {'auth/me req/s':>13} | {'total req/s':>11} | {'errors':>6}")
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            port = free_port()
+            server = start_server(workers, port, str(Path(tmp) / "bench.db"))
+            try:
+                base = f"http://127.0.0.1:{port}"
+                token = seed(base, args.experiences)
+                jobs = [(base, token, args.seconds, args.clients)] * args.load_processes
+                with multiprocessing.Pool(args.load_processes) as pool:
+                    results = pool.map(load_process, jobs)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        experiences = sum(r[0]["/api/experiences?limit=20"] for r in results) / args.seconds
+        me = sum(r[0]["/api/auth/me"] for r in results) / args.seconds
+        errors = sum(r[1] for r in results)
+        print(f"{workers:>7} | {experiences:>17,.0f} | {me:>13,.0f} | {experiences + me:>11,.0f} | {errors:>6}")
+
+
+if __name__ == "__main__":
+    main()
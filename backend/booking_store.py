@@ -0,0 +1,390 @@
+"""In-memory booking table: array-backed columns plus per-user and per-experience indexes."""
+
+import bisect
+import functools
+import threading
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from itertools import chain
+
+from locks import ShardedRWLock
+from records import Ids
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+FIELDS = frozenset({"id", "userId", "experienceId", "date", "guests", "status", "createdAt"})
+NO_GUESTS = -1
+NO_TIME = -(1 << 63)
+ROW_BITS = 32
+ROW_MASK = (1 << ROW_BITS) - 1
+MAX_INT32 = (1 << 31) - 1
+CACHED_ROWS = 4096
+
+
+def uuid_key(value):
+    """The 128-bit integer of a canonical (lowercase, hyphenated) UUID string, else None."""
+    if type(value) is not str or len(value) != 36 or not value[8] == value[13] == value[18] == value[23] == "-":
+        return None
+    digits = value.replace("-", "")
+    if len(digits) != 32 or not (digits.isascii() and digits.isalnum()) or digits != digits.lower():
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+def uuid_text(key):
+    digits = f"{key:032x}"
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+
+def day_number(value):
+    """Ordinal of an ISO date string (0 for none); raises ValueError if it is not one."""
+    if not value:
+        return 0
+    if type(value) is not str:
+        raise ValueError(value)
+    return date.fromisoformat(value).toordinal()
+
+
+def utc_micros(value):
+    """Microseconds since the epoch of an ISO UTC timestamp as the API writes it, else None."""
+    if type(value) is not str:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if moment.utcoffset() != timedelta(0) or moment.isoformat() != value:
+        return None
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class BookingStore:
+    """Bookings as a table of columns, one row per booking, in insertion order.
+
+    A booking as the API builds it (UUID id, ISO date, integer guest count,
+    string status, UTC ``createdAt``) is stored as machine integers in
+    ``array`` columns: the id as two 64-bit halves, the user and experience
+    as surrogate keys into ``Ids`` tables (each id string is kept once), the
+    date as a day ordinal, the status as a small code and ``createdAt`` in
+    microseconds. Anything that does not fit keeps its original dict in
+    ``_documents`` (its row still feeds the indexes). Bookings are never
+    modified, so a row is immutable once written.
+
+    Reads rebuild the dict; the last ``cached_rows`` rows read by id or by
+    owner keep theirs in an LRU cache, so the bookings a user just made or
+    keeps paging through are not decoded again. Every read hands out a copy.
+
+    Each secondary index is, per owner, a sorted ``array('q')`` of
+    ``day << 32 | row``: date order, ties broken by insertion order, which is
+    the order of the ``(date, seq, booking_id)`` keys handed out as cursors
+    (``seq`` is the row). Listing one user's bookings costs O(log k + page)
+    where k is that user's own booking count. Index arrays are guarded by
+    sharded reader-writer locks keyed by owner, so listing one user's
+    bookings only ever waits on writes for users that hash to the same shard.
+    """
+
+    def __init__(self, cached_rows=CACHED_ROWS):
+        self._rows = {}  # UUID int (or the id itself, for other ids) -> row
+        self._count = 0  # rows visible to readers
+        self._id_high = array("Q")
+        self._id_low = array("Q")
+        self._user = array("i")
+        self._experience = array("i")
+        self._day = array("i")
+        self._guests = array("i")
+        self._status = array("B")  # 0: pas de statut, sinon clé dans _statuses + 1
+        self._created = array("q")
+        self._documents = {}  # row -> dict, for the bookings that do not fit the columns
+        self._users = Ids()
+        self._experiences = Ids()
+        self._statuses = Ids()
+        self._dates = {0: ""}  # day ordinal -> ISO date
+        self._by_user = []  # user key -> array of index keys
+        self._by_experience = []
+        self._generation = 0  # bumped by discard: a row number can then be reused
+        self._cached = functools.lru_cache(maxsize=cached_rows)(self._cached_document)
+        self._lock = threading.Lock()
+        self._user_locks = ShardedRWLock(name="bookings_by_user")
+        self._experience_locks = ShardedRWLock(name="bookings_by_experience")
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, booking_id):
+        return self._row(booking_id) is not None
+
+    def values(self):
+        return [self._document(row) for row in range(self._count)]
+
+    def snapshot(self):
+        """The bookings as of now, as dicts built lazily (safe to consume from another thread)."""
+        return map(self._document, range(self._count))
+
+    def get(self, booking_id):
+        row = self._row(booking_id)
+        return dict(self._cached(row, self._generation)) if row is not None else None
+
+    def insert(self, booking):
+        with self._lock:
+            row, user, experience, day = self._append(booking)
+        key = day << ROW_BITS | row
+        with self._user_locks.for_key(user).write():
+            bisect.insort(self._by_user[user], key)
+        with self._experience_locks.for_key(experience).write():
+            bisect.insort(self._by_experience[experience], key)
+        return booking
+
+    def insert_many(self, bookings):
+        """Insert a batch, taking each touched owner's shard lock once."""
+        by_user = {}
+        by_experience = {}
+        with self._lock:
+            for booking in bookings:
+                row, user, experience, day = self._append(booking)
+                key = day << ROW_BITS | row
+                by_user.setdefault(user, []).append(key)
+                by_experience.setdefault(experience, []).append(key)
+        self._index_many(self._by_user, self._user_locks, by_user)
+        self._index_many(self._by_experience, self._experience_locks, by_experience)
+        return bookings
+
+    @staticmethod
+    def _index_many(index, locks, by_owner):
+        for owner, keys in by_owner.items():
+            with locks.for_key(owner).write():
+                index[owner] = array("q", sorted(chain(index[owner], keys)))
+
+    def discard(self, bookings):
+        """Remove the most recently inserted ``bookings`` (rolls back ``insert``/``insert_many``).
+
+        Rows are positions, so only the last rows can go; the write-ahead log
+        rolls writes back newest first, which is always the case there.
+        """
+        with self._lock:
+            rows = sorted({row for row in map(self._row, (b["id"] for b in bookings)) if row is not None})
+            if rows != list(range(self._count - len(rows), self._count)):
+                raise ValueError("Only the last bookings inserted can be discarded")
+            if not rows:
+                return
+            # Les index d'abord : un lecteur ne doit pas trouver une ligne déjà retirée
+            for row in reversed(rows):
+                key = self._day[row] << ROW_BITS | row
+                self._unindex(self._by_user, self._user_locks, self._user[row], key)
+                self._unindex(self._by_experience, self._experience_locks, self._experience[row], key)
+            start = rows[0]
+            self._count = start
+            for row in rows:
+                document = self._documents.pop(row, None)
+                if document is None:
+                    del self._rows[self._id_high[row] << 64 | self._id_low[row]]
+                else:
+                    key = uuid_key(document["id"])
+                    del self._rows[document["id"] if key is None else key]
+            for column in (self._id_high, self._id_low, self._user, self._experience, self._day, self._guests,
+                           self._status, self._created):
+                del column[start:]
+            self._generation += 1
+            self._cached.cache_clear()
+
+    @staticmethod
+    def _unindex(index, locks, owner, key):
+        with locks.for_key(owner).write():
+            keys = index[owner]
+            del keys[bisect.bisect_left(keys, key)]
+
+    def _append(self, booking):
+        """Write ``booking`` as a new row (under ``_lock``); returns ``(row, user, experience, day)``."""
+        row = self._count
+        user = self._users.key(booking["userId"])
+        experience = self._experiences.key(booking["experienceId"])
+        if user == len(self._by_user):
+            self._by_user.append(array("q"))
+        if experience == len(self._by_experience):
+            self._by_experience.append(array("q"))
+        columns = self._columns(booking)
+        if columns is None:
+            # Réservation hors du format habituel : on garde son dict tel quel
+            self._documents[row] = booking
+            try:
+                day = day_number(booking.get("date"))
+            except ValueError:
+                day = 0
+            if day:
+                self._dates.setdefault(day, date.fromordinal(day).isoformat())
+            key = uuid_key(booking["id"])
+            if key is None:
+                key = booking["id"]
+            high, low, guests, status, created = 0, 0, NO_GUESTS, 0, NO_TIME
+        else:
+            key, day, guests, status, created = columns
+            high, low = key >> 64, key & 0xFFFFFFFFFFFFFFFF
+        self._id_high.append(high)
+        self._id_low.append(low)
+        self._user.append(user)
+        self._experience.append(experience)
+        self._day.append(day)
+        self._guests.append(guests)
+        self._status.append(status)
+        self._created.append(created)
+        self._rows[key] = row
+        self._count = row + 1
+        return row, user, experience, day
+
+    def _columns(self, booking):
+        """``(id key, day, guests, status, created)`` if ``booking`` fits the columns, else None."""
+        if not FIELDS.issuperset(booking):
+            return None
+        key = uuid_key(booking["id"])
+        if key is None:
+            return None
+        day_text = booking.get("date")
+        try:
+            day = day_number(day_text)
+        except ValueError:
+            return None
+        if day and date.fromordinal(day).isoformat() != day_text or not day and "date" in booking:
+            return None
+        guests = NO_GUESTS
+        if "guests" in booking:
+            guests = booking["guests"]
+            if type(guests) is not int or not 0 <= guests <= MAX_INT32:
+                return None
+        status = 0
+        if "status" in booking:
+            if type(booking["status"]) is not str:
+                return None
+            code = self._statuses.find(booking["status"])
+            if code is None:
+                if len(self._statuses) >= 255:
+                    return None
+                code = self._statuses.key(booking["status"])
+            status = code + 1
+        created = NO_TIME
+        if "createdAt" in booking:
+            created = utc_micros(booking["createdAt"])
+            if created is None:
+                return None
+        if day:
+            self._dates.setdefault(day, day_text)
+        return key, day, guests, status, created
+
+    def _row(self, booking_id):
+        key = uuid_key(booking_id)
+        try:
+            return self._rows.get(booking_id if key is None else key)
+        except TypeError:
+            return None
+
+    def _cached_document(self, row, generation):
+        return self._document(row)
+
+    def _document(self, row):
+        """A new dict of the booking in ``row``."""
+        document = self._documents.get(row)
+        if document is not None:
+            return dict(document)
+        booking = {
+            "id": uuid_text(self._id_high[row] << 64 | self._id_low[row]),
+            "userId": self._users.id(self._user[row]),
+            "experienceId": self._experiences.id(self._experience[row]),
+        }
+        day = self._day[row]
+        if day:
+            booking["date"] = self._dates[day]
+        guests = self._guests[row]
+        if guests != NO_GUESTS:
+            booking["guests"] = guests
+        status = self._status[row]
+        if status:
+            booking["status"] = self._statuses.id(status - 1)
+        created = self._created[row]
+        if created != NO_TIME:
+            booking["createdAt"] = (EPOCH + timedelta(microseconds=created)).isoformat()
+        return booking
+
+    def _key(self, packed):
+        """The ``(date, seq, booking_id)`` cursor key of an index entry."""
+        row = packed & ROW_MASK
+        document = self._documents.get(row)
+        booking_id = document["id"] if document is not None else uuid_text(self._id_high[row] << 64 | self._id_low[row])
+        return (self._dates.get(packed >> ROW_BITS, ""), row, booking_id)
+
+    def in_order(self, after=None, limit=1000):
+        """One page of bookings in insertion order, as ``(bookings, next_key)``."""
+        count = self._count
+        start = 0 if after is None else max(0, after[0] + 1)
+        bookings = [self._document(row) for row in range(start, min(count, start + limit))]
+        has_more = start + limit < count
+        return bookings, ((start + len(bookings) - 1,) if bookings and has_more else None)
+
+    def count_for_user(self, user_id):
+        user = self._users.find(user_id)
+        return len(self._by_user[user]) if user is not None else 0
+
+    def seats_by_day(self, statuses):
+        """``{(experience id, date): guests}`` over the bookings whose status is in ``statuses``.
+
+        Reads the columns directly, without building the bookings' dicts.
+        """
+        codes = {self._statuses.find(status) for status in statuses} - {None}
+        codes = {code + 1 for code in codes}
+        seats = {}
+        for row in range(self._count):
+            document = self._documents.get(row)
+            if document is not None:
+                if document.get("status", "confirmed") not in statuses or not document.get("date"):
+                    continue
+                key = (document["experienceId"], document["date"])
+                guests = document.get("guests") or 1
+            else:
+                status = self._status[row]
+                day = self._day[row]
+                if status and status not in codes or not day:
+                    continue
+                if not status and "confirmed" not in statuses:
+                    continue
+                key = (self._experiences.id(self._experience[row]), self._dates[day])
+                guests = self._guests[row]
+                guests = guests if guests > 0 else 1
+            seats[key] = seats.get(key, 0) + guests
+        return seats
+
+    def for_user(self, user_id, after=None, limit=20, descending=False):
+        """Return ``(bookings, next_key)`` for one page of a user's bookings.
+
+        ``after`` is the ``next_key`` returned by the previous page; ``next_key``
+        is None once the last page has been returned.
+        """
+        return self._page(self._by_user, self._user_locks, self._users.find(user_id), after, limit, descending)
+
+    def for_experience(self, experience_id, after=None, limit=20, descending=False):
+        owner = self._experiences.find(experience_id)
+        return self._page(self._by_experience, self._experience_locks, owner, after, limit, descending)
+
+    def _page(self, index, locks, owner, after, limit, descending):
+        if owner is None or owner >= len(index):
+            return [], None
+        if after is not None:
+            try:
+                # Clé du curseur (date, seq, id) -> entrée d'index jour << 32 | ligne
+                after = day_number(after[0]) << ROW_BITS | int(after[1])
+            except (ValueError, TypeError, IndexError):
+                return [], None
+        with locks.for_key(owner).read():
+            keys = index[owner]
+            if not keys:
+                return [], None
+            if descending:
+                end = len(keys) if after is None else bisect.bisect_left(keys, after)
+                page = keys[max(0, end - limit):end][::-1]
+                has_more = end - limit > 0
+            else:
+                start = 0 if after is None else bisect.bisect_right(keys, after)
+                page = keys[start:start + limit]
+                has_more = start + limit < len(keys)
+        generation = self._generation
+        bookings = [dict(self._cached(packed & ROW_MASK, generation)) for packed in page]
+        next_key = self._key(page[-1]) if page and has_more else None
+        return bookings, next_key
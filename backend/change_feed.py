@@ -0,0 +1,67 @@
+"""Cross-process cache invalidation for multi-worker deployments.
+
+Every worker polls the shared backend's change log and dispatches new entries
+to the handlers registered per collection, which refresh the worker's own
+in-process state (search index, token cache). Entries written by the worker
+itself come back too, so handlers must be idempotent.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed:
+    def __init__(self, repository, interval=0.05, batch=1000):
+        self.repository = repository
+        self.interval = interval
+        self.batch = batch
+        self.last_seq = 0
+        self._handlers = {}
+        self._task = None
+
+    def subscribe(self, collection, handler):
+        """Register ``async handler(keys)`` for changes to ``collection``."""
+        self._handlers.setdefault(collection, []).append(handler)
+
+    async def start(self, from_seq=None):
+        self.last_seq = await self.repository.last_change() if from_seq is None else from_seq
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def poll(self):
+        """Apply every pending change; returns how many entries were processed."""
+        processed = 0
+        while True:
+            changes = await self.repository.changes_since(self.last_seq, self.batch)
+            if not changes:
+                return processed
+            by_collection = {}
+            for _, collection, key in changes:
+                by_collection.setdefault(collection, []).append(key)
+            for collection, keys in by_collection.items():
+                for handler in self._handlers.get(collection, ()):
+                    await handler(keys)
+            self.last_seq = changes[-1][0]
+            processed += len(changes)
+            if len(changes) < self.batch:
+                return processed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("change feed poll failed")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,349 @@
+"""In-memory backend made durable with a write-ahead log and periodic snapshots.
+
+Reads and writes still go to the dict stores of ``MemoryRepository``; every
+write is then appended to the log (``wal.WriteAheadLog``) and the handler
+only returns once it is on disk. If the log cannot write it, the change is
+rolled back in memory and the handler fails, so nothing that a restart would
+lose stays visible. The log is group-committed, so a burst of requests shares
+one fsync. Every ``snapshot_interval`` seconds with new
+writes, the whole state is dumped to a compressed snapshot in a thread and
+the segments it covers are deleted, which keeps recovery time bounded:
+load the newest snapshot, then replay the log written since.
+
+Only one process may open a data directory (it is locked); like the plain
+memory backend this is for single-node deployments. Refresh tokens and the
+idempotency cache are not persisted: users sign in again after a restart.
+Availability counters are not logged either; they are rebuilt from the
+active bookings on recovery.
+"""
+
+import asyncio
+import gc
+import logging
+import time
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+import wal
+from availability_store import ACTIVE_STATUSES
+from message_store import new_conversation
+from repository import (
+    MemoryAvailabilityRepository,
+    MemoryBookingRepository,
+    MemoryExperienceRepository,
+    MemoryMessageRepository,
+    MemoryRepository,
+    MemoryReviewRepository,
+    MemoryUserRepository,
+    Repository,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou de répertoire
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_BATCH = 1000  # documents par enregistrement insert dans un snapshot
+REPLAY_BATCH = 1_000_000  # documents fusionnés en un seul insert_many au rejeu
+BULK_OPS = frozenset({"experiences.insert", "bookings.insert"})
+
+
+class DurableUserRepository(MemoryUserRepository):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    async def insert(self, user):
+        user = self.store.insert(user)
+        await self.log.append("users.insert", user, undo=partial(self.store.discard, user["id"]))
+        return user
+
+    async def update(self, user_id, changes):
+        before = self.store.get(user_id)
+        updated = self.store.update(user_id, changes)
+        if updated is not None:
+            await self.log.append("users.update", user_id, changes, undo=partial(self.store.restore, before))
+        return updated
+
+
+class DurableExperienceRepository(MemoryExperienceRepository):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    async def insert(self, experience):
+        experience = self.store.insert(experience)
+        await self.log.append("experiences.insert", [experience], undo=partial(self.store.discard, [experience]))
+        return experience
+
+    async def insert_many(self, experiences):
+        experiences = self.store.insert_many(experiences)
+        if experiences:
+            await self.log.append("experiences.insert", experiences, undo=partial(self.store.discard, experiences))
+        return experiences
+
+
+class DurableBookingRepository(MemoryBookingRepository):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    async def insert(self, booking):
+        booking = self.store.insert(booking)
+        await self.log.append("bookings.insert", [booking], undo=partial(self.store.discard, [booking]))
+        return booking
+
+    async def insert_many(self, bookings):
+        bookings = self.store.insert_many(bookings)
+        if bookings:
+            await self.log.append("bookings.insert", bookings, undo=partial(self.store.discard, bookings))
+        return bookings
+
+
+class DurableReviewRepository(MemoryReviewRepository):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    async def insert(self, review):
+        review = self.store.insert(review)
+        await self.log.append("reviews.insert", review, undo=partial(self.store.delete, review["id"]))
+        return review
+
+    async def update(self, review_id, changes):
+        before = self.store.get(review_id)
+        updated = self.store.update(review_id, changes)
+        if updated is not None:
+            await self.log.append("reviews.update", review_id, changes, undo=partial(self.store.restore, before))
+        return updated
+
+    async def delete(self, review_id):
+        key = self.store.key_of(review_id)
+        deleted = self.store.delete(review_id)
+        if deleted is not None:
+            await self.log.append("reviews.delete", review_id, undo=partial(self.store.restore, deleted, key))
+        return deleted
+
+
+class DurableMessageRepository(MemoryMessageRepository):
+    def __init__(self, log):
+        super().__init__()
+        self.log = log
+
+    async def open_conversation(self, conversation):
+        stored = self.store.open_conversation(conversation)
+        if stored is conversation:
+            undo = partial(self.store.discard_conversation, conversation["id"])
+            await self.log.append("conversations.open", conversation, undo=undo)
+        return stored
+
+    async def append(self, conversation_id, message):
+        before = self.store.get_conversation(conversation_id)
+        appended = self.store.append(conversation_id, message)
+        if appended is not None:
+            undo = partial(self.store.discard_message, appended[0], before)
+            await self.log.append("messages.append", conversation_id, message, undo=undo)
+        return appended
+
+    async def mark_read(self, conversation_id, user_id, seq):
+        before = self.store.get_conversation(conversation_id)
+        conversation = self.store.mark_read(conversation_id, user_id, seq)
+        if conversation is not before:
+            undo = partial(self.store.restore_conversation, before)
+            await self.log.append("messages.read", conversation_id, user_id, seq, undo=undo)
+        return conversation
+
+
+class DurableMemoryRepository(MemoryRepository):
+    """``MemoryRepository`` whose writes survive a restart (``MEMORY_DATA_DIR``)."""
+
+    def __init__(self, directory, sync=True, commit_delay=0.0, snapshot_interval=300):
+        self.directory = Path(directory)
+        self.snapshot_interval = snapshot_interval
+        self.log = wal.WriteAheadLog(self.directory, sync=sync, commit_delay=commit_delay)
+        Repository.__init__(
+            self,
+            DurableUserRepository(self.log),
+            DurableExperienceRepository(self.log),
+            DurableBookingRepository(self.log),
+            availability=MemoryAvailabilityRepository(),
+            reviews=DurableReviewRepository(self.log),
+            messages=DurableMessageRepository(self.log),
+        )
+        self._lock_file = None
+        self._snapshot_task = None
+        self._snapshot_lock = asyncio.Lock()
+        self._snapshot_appended = 0  # log.appended au dernier snapshot
+        self._apply = {
+            "users.insert": self.users.store.insert,
+            "users.update": self.users.store.update,
+            "experiences.insert": self.experiences.store.insert_many,
+            "bookings.insert": self.bookings.store.insert_many,
+            "reviews.insert": self.reviews.store.insert,
+            "reviews.update": self.reviews.store.update,
+            "reviews.delete": self.reviews.store.delete,
+            "conversations.open": self.messages.store.open_conversation,
+            "messages.append": self.messages.store.append,
+            "messages.read": self.messages.store.mark_read,
+        }
+
+    async def connect(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_directory()
+        started = time.perf_counter()
+        # Sans cela, le ramasse-miettes cyclique reparcourt les documents déjà chargés à chaque collecte
+        gc.disable()
+        try:
+            snapshot, replayed, segment = self.recover()
+            self._reserve_seats()
+        finally:
+            gc.enable()
+        # Les documents récupérés vivent jusqu'à l'arrêt : les collectes suivantes les ignorent
+        gc.freeze()
+        self.log.open(segment)
+        logger.info(
+            "Recovered %s from %s (snapshot %s, %d log records) in %.2fs",
+            ", ".join(f"{count} {name}" for name, count in (await self.sizes()).items()),
+            self.directory, snapshot, replayed, time.perf_counter() - started,
+        )
+        if self.snapshot_interval:
+            self._snapshot_task = asyncio.create_task(self._snapshot_periodically())
+
+    async def close(self):
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        await self.log.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def recover(self):
+        """Load the newest snapshot and replay the log after it.
+
+        Returns ``(snapshot number or None, log records replayed, segment to
+        write next)``. Writing always resumes in a new segment, so a torn
+        record at the end of the last one stays the last line of its file.
+        """
+        numbers = wal.snapshots(self.directory)
+        snapshot = numbers[-1] if numbers else None
+        if snapshot is not None:
+            self._replay(wal.read_snapshot(wal.snapshot_path(self.directory, snapshot)))
+        existing = [n for n in wal.segments(self.directory) if snapshot is None or n >= snapshot]
+        replayed = self._replay(
+            record for number in existing for record in wal.read_segment(wal.segment_path(self.directory, number))
+        )
+        return snapshot, replayed, max(existing + [snapshot or 0]) + 1
+
+    async def snapshot(self):
+        """Write a snapshot of the current state, then drop the files it makes obsolete.
+
+        The state is captured on the event loop, between two writes: the
+        stores replace records instead of mutating them (bookings are never
+        modified), so holding the current ones is enough and building the
+        documents and encoding them runs in a thread. It is only written once
+        the records before it are on disk: if they fail, they are rolled back
+        and the snapshot is abandoned.
+        """
+        async with self._snapshot_lock:
+            number = self.log.rotate()
+            self._snapshot_appended = self.log.appended
+            state = (
+                self.users.store.snapshot(),
+                self.experiences.store.snapshot(),
+                self.bookings.store.snapshot(),
+                self.reviews.store.values(),
+                self.messages.store.snapshot(),
+            )
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            # Le segment précédent doit être écrit avant le snapshot qui le remplace
+            await self.log.flush()
+            count = await loop.run_in_executor(
+                None, wal.write_snapshot, self.directory, number, snapshot_records(*state), self.log.sync
+            )
+            await loop.run_in_executor(None, wal.prune, self.directory, number)
+            logger.info("Snapshot %d: %d records in %.2fs", number, count, time.perf_counter() - started)
+            return number
+
+    async def _snapshot_periodically(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            if self.log.appended > self._snapshot_appended:
+                try:
+                    await self.snapshot()
+                except Exception:
+                    logger.exception("Snapshot failed; the write-ahead log is kept")
+
+    def _replay(self, records):
+        """Apply ``records`` in order; returns how many there were.
+
+        Consecutive bulk inserts into the same collection (one per booking in
+        the log) are merged into a single ``insert_many``, which sorts each
+        touched index once instead of once per record.
+        """
+        count = 0
+        bulk_op, bulk = None, []
+        for record in records:
+            count += 1
+            op, *args = record
+            if op in BULK_OPS:
+                if op != bulk_op or len(bulk) >= REPLAY_BATCH:
+                    if bulk:
+                        self._apply[bulk_op](bulk)
+                    bulk_op, bulk = op, []
+                bulk.extend(args[0])
+                continue
+            if bulk:
+                self._apply[bulk_op](bulk)
+                bulk_op, bulk = None, []
+            apply = self._apply.get(op)
+            if apply is None:
+                raise ValueError(f"Unknown write-ahead log record: {op!r}")
+            apply(*args)
+        if bulk:
+            self._apply[bulk_op](bulk)
+        return count
+
+    def _reserve_seats(self):
+        self.availability.store.add_many(self.bookings.store.seats_by_day(ACTIVE_STATUSES))
+
+    def _lock_directory(self):
+        if fcntl is None:
+            return
+        self._lock_file = open(self.directory / "LOCK", "a")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            self._lock_file = None
+            raise RuntimeError(f"{self.directory} is already used by another process") from None
+
+
+def snapshot_records(users, experiences, bookings, reviews, conversations):
+    """The records that rebuild the captured state, in an order recovery can replay."""
+    for user in users:
+        yield ("users.insert", user)
+    for docs, op in ((experiences, "experiences.insert"), (bookings, "bookings.insert")):
+        while batch := list(islice(docs, SNAPSHOT_BATCH)):
+            yield (op, batch)
+    for review in reviews:
+        yield ("reviews.insert", review)
+    # Rejoués dans l'ordre d'activité, les messages redonnent le même ordre de conversations
+    for conversation, log in conversations:
+        participants = conversation["participants"]
+        yield ("conversations.open", new_conversation(
+            conversation["id"], participants, conversation["experienceId"], conversation["createdAt"]
+        ))
+        for message in log:
+            yield ("messages.append", conversation["id"], message)
+        for user_id, seq in conversation["readSeq"].items():
+            if seq:
+                yield ("messages.read", conversation["id"], user_id, seq)
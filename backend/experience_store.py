@@ -0,0 +1,269 @@
+"""In-memory experience store with filter and sort indexes for listing pages."""
+
+import bisect
+import itertools
+
+from locks import RWLock
+from records import ExperienceRecord
+
+
+def normalize_key(value):
+    """Hash-index key for category/location: case- and whitespace-insensitive."""
+    return " ".join(str(value).split()).casefold() if value is not None else None
+
+
+def to_number(value):
+    """Best-effort numeric coercion (the frontend posts prices as strings)."""
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ExperienceStore:
+    """Experiences keyed by id, with the indexes behind ``GET /experiences``.
+
+    Every experience gets an insertion sequence number. ``_order`` and the
+    per-category / per-location lists hold those numbers in ascending order,
+    ``_by_price`` holds sorted ``(price, seq)`` pairs and ``_by_group_size``
+    sorted ``(capacity, seq)`` pairs. A query scans the smallest candidate set
+    among those its filters allow, whatever the sort key: a list already in the
+    sort order is walked from the cursor until the page is full, any other set
+    is sorted first. ``scanned`` counts the candidates checked against the filters.
+
+    Experiences are kept as ``ExperienceRecord``s and handed out as dicts.
+    """
+
+    def __init__(self):
+        self._by_id = {}  # experience id -> ExperienceRecord
+        self._by_seq = {}  # seq -> experience id
+        self._seq_of = {}  # experience id -> seq
+        self._order = []
+        self._by_category = {}
+        self._by_location = {}
+        self._by_price = []
+        self._by_group_size = []
+        self._seq = itertools.count()
+        self.queries = 0
+        self.scanned = 0
+        self._lock = RWLock("experiences")
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, experience_id):
+        return experience_id in self._by_id
+
+    def values(self):
+        return [record.to_dict() for record in list(self._by_id.values())]
+
+    def snapshot(self):
+        """The experiences as of now, as dicts built lazily (safe to consume from another thread)."""
+        return map(ExperienceRecord.to_dict, list(self._by_id.values()))
+
+    def get(self, experience_id):
+        record = self._by_id.get(experience_id)
+        return record.to_dict() if record is not None else None
+
+    def stats(self):
+        return {"experiences": len(self._by_id), "queries": self.queries, "scanned": self.scanned}
+
+    def insert(self, experience):
+        with self._lock.write():
+            price, capacity = self._index(experience)
+            if price is not None:
+                bisect.insort(self._by_price, price)
+            if capacity is not None:
+                bisect.insort(self._by_group_size, capacity)
+        return experience
+
+    def insert_many(self, experiences):
+        """Insert a batch under one write lock, merging the range indexes with a single sort each."""
+        with self._lock.write():
+            keys = [self._index(experience) for experience in experiences]
+            self._by_price.extend(price for price, _ in keys if price is not None)
+            self._by_price.sort()
+            self._by_group_size.extend(capacity for _, capacity in keys if capacity is not None)
+            self._by_group_size.sort()
+        return experiences
+
+    def discard(self, experiences):
+        """Remove the most recently inserted ``experiences`` (rolls back ``insert``/``insert_many``)."""
+        with self._lock.write():
+            for experience in experiences:
+                seq = self._seq_of.pop(experience["id"], None)
+                if seq is None:
+                    continue
+                record = self._by_id.pop(experience["id"])
+                del self._by_seq[seq]
+                self._remove(self._order, seq)
+                self._remove(self._by_category[normalize_key(record.get("category"))], seq)
+                self._remove(self._by_location[normalize_key(record.get("location"))], seq)
+                price = to_number(record.get("price"))
+                if price is not None:
+                    self._remove(self._by_price, (price, seq))
+                capacity = to_number(record.get("groupSize"))
+                if capacity is not None:
+                    self._remove(self._by_group_size, (capacity, seq))
+
+    @staticmethod
+    def _remove(keys, key):
+        del keys[bisect.bisect_left(keys, key)]
+
+    def _index(self, experience):
+        """Add ``experience`` to the id and seq indexes; returns its ``(price, seq)`` and ``(capacity, seq)`` keys.
+
+        Either key is None when the field is missing or not a number.
+        """
+        seq = next(self._seq)
+        record = ExperienceRecord.from_dict(experience)
+        exp_id = record.id
+        self._by_id[exp_id] = record
+        self._by_seq[seq] = exp_id
+        self._seq_of[exp_id] = seq
+        self._order.append(seq)
+        self._by_category.setdefault(normalize_key(record.get("category")), []).append(seq)
+        self._by_location.setdefault(normalize_key(record.get("location")), []).append(seq)
+        price = to_number(record.get("price"))
+        capacity = to_number(record.get("groupSize"))
+        return (price, seq) if price is not None else None, (capacity, seq) if capacity is not None else None
+
+    def in_order(self, after=None, limit=1000):
+        """One page of experiences in insertion order, as ``(experiences, next_key)``."""
+        with self._lock.read():
+            start = 0 if after is None else bisect.bisect_right(self._order, after[0])
+            seqs = self._order[start:start + limit]
+            records = [self._by_id[self._by_seq[seq]] for seq in seqs]
+            has_more = start + limit < len(self._order)
+        return [record.to_dict() for record in records], ((seqs[-1],) if seqs and has_more else None)
+
+    def query(
+        self,
+        category=None,
+        location=None,
+        min_price=None,
+        max_price=None,
+        group_size=None,
+        sort_by="createdAt",
+        descending=True,
+        after=None,
+        limit=20,
+    ):
+        """Return ``(experiences, next_key)`` for one filtered, sorted page.
+
+        ``group_size`` keeps experiences that can host at least that many guests.
+        ``after`` is the ``next_key`` of the previous page.
+        """
+        category_key = normalize_key(category) if category else None
+        location_key = normalize_key(location) if location else None
+
+        def matches(exp):
+            if category_key is not None and normalize_key(exp.get("category")) != category_key:
+                return False
+            if location_key is not None and normalize_key(exp.get("location")) != location_key:
+                return False
+            if min_price is not None or max_price is not None:
+                price = to_number(exp.get("price"))
+                if price is None:
+                    return False
+                if min_price is not None and price < min_price:
+                    return False
+                if max_price is not None and price > max_price:
+                    return False
+            if group_size is not None:
+                capacity = to_number(exp.get("groupSize"))
+                if capacity is None or capacity < group_size:
+                    return False
+            return True
+
+        with self._lock.read():
+            candidates = self._candidates(
+                category_key, location_key, min_price, max_price, group_size, sort_by, descending, after
+            )
+            page = []
+            next_key = last_key = None
+            scanned = 0
+            for key, seq in candidates:
+                scanned += 1
+                exp = self._by_id[self._by_seq[seq]]
+                if not matches(exp):
+                    continue
+                if len(page) == limit:
+                    next_key = last_key
+                    break
+                page.append(exp)
+                last_key = key
+        self.queries += 1
+        self.scanned += scanned
+        return [record.to_dict() for record in page], next_key
+
+    @staticmethod
+    def _range(keys, low, high):
+        """``(start, stop)`` of the ``(value, seq)`` pairs in ``keys`` with ``low <= value <= high``."""
+        start = 0 if low is None else bisect.bisect_left(keys, (low, -1))
+        stop = len(keys) if high is None else bisect.bisect_right(keys, (high, float("inf")))
+        return start, max(start, stop)
+
+    def _candidates(self, category_key, location_key, min_price, max_price, group_size, sort_by, descending, after):
+        """``(key, seq)`` pairs in page order, drawn from the smallest candidate set the filters allow."""
+        by_price = sort_by == "price"
+        # (taille, ordre de préférence, liste triée par seq ou tranche d'un index de plage)
+        sets = [(len(self._order), 1, self._order)]
+        if category_key is not None:
+            seqs = self._by_category.get(category_key, [])
+            sets.append((len(seqs), 1, seqs))
+        if location_key is not None:
+            seqs = self._by_location.get(location_key, [])
+            sets.append((len(seqs), 1, seqs))
+        # Sans filtre de prix, les expériences sans prix restent visibles : l'index des prix ne suffit pas
+        price_range = None
+        if by_price or min_price is not None or max_price is not None:
+            price_range = self._range(self._by_price, min_price, max_price)
+            sets.append((price_range[1] - price_range[0], 0 if by_price else 2, None))
+        if group_size is not None:
+            start, stop = self._range(self._by_group_size, group_size, None)
+            sets.append((stop - start, 2, self._by_group_size[start:stop]))
+        _, _, chosen = min(sets, key=lambda candidate: candidate[:2])
+        if chosen is None:
+            if by_price:
+                return self._scan_price(*price_range, descending, after)
+            start, stop = price_range
+            chosen = self._by_price[start:stop]
+        if chosen and isinstance(chosen[0], tuple):
+            chosen = sorted(seq for _, seq in chosen)
+        if by_price:
+            return self._sort_by_price(chosen, min_price, max_price, descending, after)
+        return self._scan_seq(chosen, descending, after)
+
+    def _sort_by_price(self, seqs, min_price, max_price, descending, after):
+        """Price-ordered ``(price, seq)`` keys of ``seqs``, sorted here rather than read from the price index."""
+        keys = []
+        for seq in seqs:
+            price = to_number(self._by_id[self._by_seq[seq]].get("price"))
+            if price is not None:
+                keys.append((price, seq))
+        keys.sort()
+        low, high = self._range(keys, min_price, max_price)
+        return ((key, key[1]) for key in self._walk(keys, low, high, descending, after and tuple(after)))
+
+    def _scan_seq(self, seqs, descending, after):
+        return (((seq,), seq) for seq in self._walk(seqs, 0, len(seqs), descending, after and after[0]))
+
+    def _scan_price(self, low, high, descending, after):
+        return ((key, key[1]) for key in self._walk(self._by_price, low, high, descending, after and tuple(after)))
+
+    @staticmethod
+    def _walk(keys, low, high, descending, after):
+        """``keys[low:high]`` from just past the cursor ``after``, forwards or backwards."""
+        if descending:
+            if after is not None:
+                high = min(high, bisect.bisect_left(keys, after))
+            for i in range(high - 1, low - 1, -1):
+                yield keys[i]
+        else:
+            if after is not None:
+                low = max(low, bisect.bisect_right(keys, after))
+            for i in range(low, high):
+                yield keys[i]
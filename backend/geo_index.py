@@ -0,0 +1,151 @@
+"""In-process spatial index over experience coordinates (uniform lat/lng grid)."""
+
+import heapq
+import math
+
+from locks import RWLock
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def parse_coordinates(value):
+    """``(lat, lng)`` from an experience's ``coordinates`` ({"lat", "lng"}); raises ValueError."""
+    if not isinstance(value, dict):
+        raise ValueError("coordinates must be an object with lat and lng")
+    lat, lng = value.get("lat"), value.get("lng")
+    for name, number, bound in (("lat", lat, 90), ("lng", lng, 180)):
+        if isinstance(number, bool) or not isinstance(number, (int, float)) or not -bound <= number <= bound:
+            raise ValueError(f"coordinates.{name} must be a number between -{bound} and {bound}")
+    return float(lat), float(lng)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """Experience ids bucketed into ``cell_degrees`` x ``cell_degrees`` cells.
+
+    A query measures the points of rings of cells around the origin, widened
+    until the k-th best distance (or the radius) is closer than any unvisited
+    cell, so its cost follows the density around the origin rather than the
+    size of the index. Inserts touch one cell, so the index is maintained
+    incrementally alongside the stores.
+    """
+
+    def __init__(self, cell_degrees=0.05):
+        self.cell_degrees = cell_degrees
+        self._columns = round(360 / cell_degrees)  # cellules par tour de longitude
+        self._rows = round(180 / cell_degrees)
+        self._cells = {}  # (row, column) -> [(lat, lng, experience id)]
+        self._points = {}  # experience id -> (lat, lng)
+        self._lock = RWLock("geo_index")
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, experience_id):
+        return experience_id in self._points
+
+    def _cell(self, lat, lng):
+        row = min(self._rows - 1, int((lat + 90) / self.cell_degrees))
+        column = int((lng + 180) / self.cell_degrees) % self._columns
+        return row, column
+
+    def add(self, experience):
+        """Index an experience that has coordinates; re-adding an id is a no-op."""
+        self.add_many([experience])
+
+    def add_many(self, experiences):
+        points = []
+        for experience in experiences:
+            if experience.get("coordinates") is None:
+                continue
+            try:
+                points.append((experience["id"], parse_coordinates(experience["coordinates"])))
+            except ValueError:
+                continue
+        if not points:
+            return
+        with self._lock.write():
+            for experience_id, (lat, lng) in points:
+                if experience_id in self._points:
+                    continue
+                self._points[experience_id] = (lat, lng)
+                self._cells.setdefault(self._cell(lat, lng), []).append((lat, lng, experience_id))
+
+    def nearby(self, lat, lng, radius_km=None, limit=20):
+        """Up to ``limit`` ``(experience id, distance km)`` pairs, nearest first.
+
+        With ``radius_km`` only points within that distance are returned;
+        without it this is a plain k-nearest query.
+        """
+        if limit <= 0:
+            return []
+        radius = math.inf if radius_km is None else radius_km
+        best = []  # tas max de taille limit : (-distance, id)
+        with self._lock.read():
+            row, column = self._cell(lat, lng)
+            max_ring = max(self._rows, self._columns // 2)
+            ring = 0
+            examined = 0
+            while ring <= max_ring:
+                cells = self._ring(row, column, ring)
+                examined += len(cells)
+                # Plus de cellules examinées que de cellules occupées : on termine par un parcours de celles-ci
+                if examined > len(self._cells):
+                    self._scan_remaining(lat, lng, radius, limit, best, row, column, ring)
+                    break
+                for cell in cells:
+                    points = self._cells.get(cell)
+                    if points is not None:
+                        self._push(lat, lng, points, radius, limit, best)
+                clearance = self._ring_clearance(lat, ring)
+                if clearance >= radius or (len(best) == limit and -best[0][0] <= clearance):
+                    break
+                ring += 1
+        return [(experience_id, -negative) for negative, experience_id in sorted(best, reverse=True)]
+
+    def _ring_clearance(self, lat, ring):
+        """Lower bound on the distance from the origin to any cell outside ``ring``.
+
+        Such a point is at least ``ring`` cells away in latitude or in
+        longitude; longitude cells narrow towards the poles, so the bound uses
+        the highest latitude those cells can reach.
+        """
+        span = ring * self.cell_degrees
+        return span * KM_PER_DEGREE * math.cos(math.radians(min(90.0, abs(lat) + span)))
+
+    def _scan_remaining(self, lat, lng, radius, limit, best, row, column, ring):
+        for (cell_row, cell_column), points in self._cells.items():
+            if max(abs(cell_row - row), self._column_gap(cell_column, column)) >= ring:
+                self._push(lat, lng, points, radius, limit, best)
+
+    def _column_gap(self, a, b):
+        gap = abs(a - b) % self._columns
+        return min(gap, self._columns - gap)
+
+    @staticmethod
+    def _push(lat, lng, points, radius, limit, best):
+        for point_lat, point_lng, experience_id in points:
+            distance = haversine_km(lat, lng, point_lat, point_lng)
+            if distance > radius:
+                continue
+            if len(best) < limit:
+                heapq.heappush(best, (-distance, experience_id))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, experience_id))
+
+    def _ring(self, row, column, ring):
+        """Cells at Chebyshev distance ``ring`` from ``(row, column)``, wrapping in longitude."""
+        if ring == 0:
+            return [(row, column)]
+        cells = set()
+        for r in range(max(0, row - ring), min(self._rows - 1, row + ring) + 1):
+            edge = r in (row - ring, row + ring)
+            for c in (range(column - ring, column + ring + 1) if edge else (column - ring, column + ring)):
+                cells.add((r, c % self._columns))
+        return cells
@@ -0,0 +1,108 @@
+"""Stored responses for retried POSTs carrying an ``Idempotency-Key`` header.
+
+A client that lost the response to ``POST /bookings`` retries with the same
+key; the API then replays the bytes it sent the first time instead of running
+the handler (and creating a second booking) again.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Résultats de IdempotencyCache.start
+IN_FLIGHT = "in_flight"
+MISMATCH = "mismatch"
+
+
+class IdempotencyCache:
+    """LRU of ``key -> (expires_at, fingerprint, status_code, body)`` with a TTL.
+
+    Memory is bounded both by entry count and by the total size of the stored
+    bodies; the least recently used entries are evicted first. A key is
+    claimed by ``start`` while its first request runs, so a concurrent retry
+    is told to back off rather than running the handler twice. Claims are
+    kept apart from the stored responses and are never evicted: there is one
+    per request in progress, and dropping one would let its retry run again.
+    """
+
+    def __init__(self, ttl_seconds=24 * 3600, max_entries=10_000, max_bytes=16 * 1024 * 1024, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._claims = {}  # key -> (expires_at, fingerprint) des requêtes en cours
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries) + len(self._claims)
+
+    def start(self, key, fingerprint):
+        """Claim ``key`` for a new request.
+
+        Returns None when the caller should run the handler (and later call
+        ``finish`` or ``abandon``), ``(status_code, body)`` to replay a stored
+        response, ``IN_FLIGHT`` if the first request is still running, or
+        ``MISMATCH`` if the key was used for a different request body.
+        """
+        now = self._clock()
+        with self._lock:
+            claim = self._claims.get(key)
+            if claim is not None:
+                if claim[0] > now:
+                    return IN_FLIGHT if claim[1] == fingerprint else MISMATCH
+                del self._claims[key]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                self._claims[key] = (now + self.ttl_seconds, fingerprint)
+                return None
+            _, stored_fingerprint, status_code, body = entry
+            if stored_fingerprint != fingerprint:
+                return MISMATCH
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return status_code, body
+
+    def finish(self, key, fingerprint, status_code, body):
+        with self._lock:
+            self._claims.pop(key, None)
+            self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl_seconds, fingerprint, status_code, body)
+            self._bytes += len(body)
+            self._evict()
+
+    def abandon(self, key):
+        """Release the claim of a request that failed, so a retry runs it again."""
+        with self._lock:
+            self._claims.pop(key, None)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "inFlight": len(self._claims),
+            "bytes": self._bytes,
+            "maxEntries": self.max_entries,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[3])
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= len(entry[3])
+            self.evictions += 1
@@ -0,0 +1,145 @@
+"""Reader-writer locks used by the in-memory stores.
+
+Each collection owns its own lock, so a booking write never blocks a catalogue
+read, and readers of the same collection never block each other.
+
+Locks created with a ``name`` also record how long callers waited for them
+and how long writers held them, aggregated per name in ``LOCK_STATS`` (all
+shards of a ``ShardedRWLock`` share one entry). Unnamed locks skip the clock
+calls entirely.
+"""
+
+import threading
+import zlib
+from time import perf_counter
+
+
+class LockStats:
+    """Acquisition counts and cumulative wait/hold times for the locks sharing a name."""
+
+    __slots__ = ("reads", "read_wait", "writes", "write_wait", "write_hold", "max_wait")
+
+    def __init__(self):
+        self.reads = 0
+        self.read_wait = 0.0
+        self.writes = 0
+        self.write_wait = 0.0
+        self.write_hold = 0.0
+        self.max_wait = 0.0
+
+
+LOCK_STATS = {}  # name -> LockStats
+
+
+def lock_stats(name):
+    return LOCK_STATS.setdefault(name, LockStats())
+
+
+class RWLock:
+    """Writer-preferring reader-writer lock.
+
+    ``with lock.read():`` may be held by many threads at once; ``with
+    lock.write():`` is exclusive. Once a writer is waiting, new readers queue
+    behind it so a steady stream of reads cannot starve writes.
+    """
+
+    def __init__(self, name=None):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._read_guard = _ReadGuard(self)
+        self._write_guard = _WriteGuard(self)
+        self._stats = lock_stats(name) if name else None
+        self._write_started = 0.0
+
+    def read(self):
+        return self._read_guard
+
+    def write(self):
+        return self._write_guard
+
+    def acquire_read(self):
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        if stats is not None:
+            waited = perf_counter() - start
+            stats.reads += 1
+            stats.read_wait += waited
+            if waited > stats.max_wait:
+                stats.max_wait = waited
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        stats = self._stats
+        start = perf_counter() if stats is not None else 0.0
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        if stats is not None:
+            now = perf_counter()
+            waited = now - start
+            stats.writes += 1
+            stats.write_wait += waited
+            if waited > stats.max_wait:
+                stats.max_wait = waited
+            self._write_started = now
+
+    def release_write(self):
+        if self._stats is not None:
+            self._stats.write_hold += perf_counter() - self._write_started
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class _ReadGuard:
+    __slots__ = ("_lock",)
+
+    def __init__(self, lock):
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire_read()
+
+    def __exit__(self, *exc):
+        self._lock.release_read()
+
+
+class _WriteGuard:
+    __slots__ = ("_lock",)
+
+    def __init__(self, lock):
+        self._lock = lock
+
+    def __enter__(self):
+        self._lock.acquire_write()
+
+    def __exit__(self, *exc):
+        self._lock.release_write()
+
+
+class ShardedRWLock:
+    """A fixed set of RWLocks picked by key, so unrelated keys never contend."""
+
+    def __init__(self, shards=64, name=None):
+        self._locks = [RWLock(name) for _ in range(shards)]
+
+    def __len__(self):
+        return len(self._locks)
+
+    def for_key(self, key):
+        # crc32 plutôt que hash() : stable d'un processus à l'autre
+        return self._locks[zlib.crc32(str(key).encode()) % len(self._locks)]
@@ -0,0 +1,134 @@
+"""In-process pub/sub fan-out of messaging events to WebSocket connections.
+
+Each connection owns a bounded ``asyncio.Queue`` of encoded events. Publishing
+never waits on a connection: an event is encoded once and put on every
+recipient's queue with ``put_nowait``. A connection whose queue is full is
+too slow to keep up; its pending events are dropped and it is told to close
+(1013, "try again later"). Messages are persisted before they are published,
+so the client reconnects and catches up from its last cursor instead of
+holding up everybody else.
+
+All methods run on the event loop thread.
+"""
+
+import asyncio
+from collections import OrderedDict
+
+from responses import dumps
+
+# Fermeture d'une connexion : (code WebSocket, raison)
+OVERFLOW = (1013, "Too many pending events: reconnect and read from your last cursor")
+SESSION_ENDED = (1008, "Session revoked")
+TOKEN_EXPIRED = (1008, "Access token expired")
+GOING_AWAY = (1001, "Server shutting down")
+
+
+class Subscription:
+    __slots__ = ("user_id", "session", "queue", "closing")
+
+    def __init__(self, user_id, session, queue_size):
+        self.user_id = user_id
+        self.session = session
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.closing = None
+
+    def close(self, reason):
+        """Replace the pending events by ``reason``, which the connection handles by closing."""
+        if self.closing is not None:
+            return
+        self.closing = reason
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(reason)
+
+
+class MessageHub:
+    def __init__(self, queue_size=256, recent=10_000):
+        self.queue_size = queue_size
+        self.recent = recent
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self._connections = 0
+        self._subscriptions = {}  # user id -> {Subscription}
+        self._sessions = {}  # session -> {Subscription}
+        self._recent = OrderedDict()  # clés des derniers événements publiés
+
+    def __len__(self):
+        return self._connections
+
+    def connect(self, user_id, session=None):
+        subscription = Subscription(user_id, session, self.queue_size)
+        self._connections += 1
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        if session is not None:
+            self._sessions.setdefault(session, set()).add(subscription)
+        return subscription
+
+    def disconnect(self, subscription):
+        if subscription not in self._subscriptions.get(subscription.user_id, ()):
+            return
+        self._connections -= 1
+        for index, key in ((self._subscriptions, subscription.user_id), (self._sessions, subscription.session)):
+            subscriptions = index.get(key)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del index[key]
+
+    def publish(self, user_ids, event, key=None):
+        """Queue ``event`` for every connection of ``user_ids``; returns how many connections got it.
+
+        An event published again with the same ``key`` (the change feed
+        replays this worker's own writes) is skipped.
+        """
+        if key is not None:
+            if key in self._recent:
+                return 0
+            self._recent[key] = None
+            if len(self._recent) > self.recent:
+                self._recent.popitem(last=False)
+        self.published += 1
+        payload = None
+        delivered = 0
+        for user_id in user_ids:
+            for subscription in self._subscriptions.get(user_id, ()):
+                if subscription.closing is not None:
+                    continue
+                if payload is None:
+                    payload = dumps(event).decode()
+                try:
+                    subscription.queue.put_nowait(payload)
+                    delivered += 1
+                except asyncio.QueueFull:
+                    self.overflows += 1
+                    subscription.close(OVERFLOW)
+        self.delivered += delivered
+        return delivered
+
+    def close_session(self, session):
+        """Close the connections opened with an access token of ``session`` (logout, refresh)."""
+        for subscription in self._sessions.get(session, ()):
+            subscription.close(SESSION_ENDED)
+
+    def seen(self, key):
+        """True if an event with ``key`` was published recently."""
+        return key in self._recent
+
+    def close_all(self, reason=GOING_AWAY):
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close(reason)
+
+    def queued(self):
+        return sum(s.queue.qsize() for subscriptions in self._subscriptions.values() for s in subscriptions)
+
+    def stats(self):
+        return {
+            "connections": len(self),
+            "users": len(self._subscriptions),
+            "queued": self.queued(),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
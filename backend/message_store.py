@@ -0,0 +1,180 @@
+"""In-memory conversations with an append-only message log each."""
+
+import itertools
+
+from locks import RWLock
+
+
+def conversation_key(participants, experience_id=None):
+    """One conversation per pair of users (and experience), whoever writes first."""
+    first, second = sorted(participants)
+    return f"{first}|{second}|{experience_id or ''}"
+
+
+def new_conversation(conversation_id, participants, experience_id, created_at):
+    return {
+        "id": conversation_id,
+        "participants": list(participants),
+        "experienceId": experience_id,
+        "createdAt": created_at,
+        "activity": 0,  # séquence globale du dernier message : ordre des conversations
+        "messageCount": 0,
+        "lastMessage": None,
+        "readSeq": {user_id: 0 for user_id in participants},
+        "unread": {user_id: 0 for user_id in participants},
+    }
+
+
+def after_append(conversation, message, activity):
+    """Copy of ``conversation`` once ``message`` has been appended to it."""
+    return {
+        **conversation,
+        "activity": activity,
+        "messageCount": message["seq"],
+        "lastMessage": message,
+        "unread": {
+            user_id: count + (user_id != message["senderId"])
+            for user_id, count in conversation["unread"].items()
+        },
+    }
+
+
+class MessageStore:
+    """Conversations keyed by id, each with a list of its messages.
+
+    A message's ``seq`` is its 1-based position in its conversation's list,
+    so a cursor read is one slice: O(page) whatever the length of the log.
+    Messages are never edited; read receipts only move the reader's
+    ``readSeq`` in the conversation.
+    """
+
+    def __init__(self):
+        self._conversations = {}
+        self._by_key = {}  # conversation_key -> conversation id
+        self._members = {}  # user id -> {conversation id}
+        self._logs = {}  # conversation id -> [message]
+        self._messages = {}  # message id -> (conversation id, seq)
+        self._activity = itertools.count(1)
+        self._lock = RWLock("messages")
+
+    def __len__(self):
+        return len(self._messages)
+
+    def conversation_count(self):
+        return len(self._conversations)
+
+    def open_conversation(self, conversation):
+        """Store ``conversation`` unless its participants already have one; returns the stored one."""
+        key = conversation_key(conversation["participants"], conversation.get("experienceId"))
+        with self._lock.write():
+            existing = self._by_key.get(key)
+            if existing is not None:
+                return self._conversations[existing]
+            self._conversations[conversation["id"]] = conversation
+            self._by_key[key] = conversation["id"]
+            self._logs[conversation["id"]] = []
+            for user_id in conversation["participants"]:
+                self._members.setdefault(user_id, set()).add(conversation["id"])
+        return conversation
+
+    def get_conversation(self, conversation_id):
+        return self._conversations.get(conversation_id)
+
+    def conversations_for(self, user_id, after=None, limit=20):
+        """Most recently active first, as ``(conversations, next_key)`` with keys ``(activity, id)``."""
+        with self._lock.read():
+            conversations = [self._conversations[i] for i in self._members.get(user_id, ())]
+        keyed = sorted(((c["activity"], c["id"]), c) for c in conversations)
+        keyed.reverse()
+        if after is not None:
+            keyed = [item for item in keyed if item[0] < tuple(after)]
+        page = keyed[:limit]
+        next_key = page[-1][0] if len(keyed) > limit else None
+        return [conversation for _, conversation in page], next_key
+
+    def append(self, conversation_id, message):
+        """Number and store ``message``; returns ``(message, conversation)``, or None without the conversation."""
+        with self._lock.write():
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                return None
+            log = self._logs[conversation_id]
+            message = {**message, "conversationId": conversation_id, "seq": len(log) + 1}
+            log.append(message)
+            self._messages[message["id"]] = (conversation_id, message["seq"])
+            conversation = after_append(conversation, message, next(self._activity))
+            self._conversations[conversation_id] = conversation
+        return message, conversation
+
+    def get_message(self, message_id):
+        location = self._messages.get(message_id)
+        if location is None:
+            return None
+        conversation_id, seq = location
+        return self._logs[conversation_id][seq - 1]
+
+    def messages(self, conversation_id, after=None, limit=50, descending=True):
+        """One page of a conversation's log, as ``(messages, next_key)`` with keys ``(seq,)``."""
+        with self._lock.read():
+            log = self._logs.get(conversation_id, [])
+            if descending:
+                end = len(log) if after is None else max(0, min(len(log), after[0] - 1))
+                page = log[max(0, end - limit):end][::-1]
+                has_more = end - limit > 0
+            else:
+                start = 0 if after is None else max(0, after[0])
+                page = log[start:start + limit]
+                has_more = start + limit < len(log)
+        return page, ((page[-1]["seq"],) if page and has_more else None)
+
+    def snapshot(self):
+        """Every conversation with a copy of its log, least recently active first."""
+        with self._lock.read():
+            items = [(c, list(self._logs[c["id"]])) for c in self._conversations.values()]
+        items.sort(key=lambda item: item[0]["activity"])
+        return items
+
+    def mark_read(self, conversation_id, user_id, seq):
+        """Move ``user_id``'s read marker up to ``seq``; returns the conversation (None if missing)."""
+        with self._lock.write():
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None or user_id not in conversation["readSeq"]:
+                return conversation
+            if seq <= conversation["readSeq"][user_id]:
+                return conversation
+            seq = min(seq, conversation["messageCount"])
+            # Reste à lire : messages des autres participants après le nouveau marqueur
+            unread = sum(1 for message in self._logs[conversation_id][seq:] if message["senderId"] != user_id)
+            conversation = {
+                **conversation,
+                "readSeq": {**conversation["readSeq"], user_id: seq},
+                "unread": {**conversation["unread"], user_id: unread},
+            }
+            self._conversations[conversation_id] = conversation
+        return conversation
+
+    def discard_conversation(self, conversation_id):
+        """Remove a conversation opened without messages (rolls back ``open_conversation``)."""
+        with self._lock.write():
+            conversation = self._conversations.pop(conversation_id, None)
+            if conversation is None:
+                return
+            del self._by_key[conversation_key(conversation["participants"], conversation.get("experienceId"))]
+            del self._logs[conversation_id]
+            for user_id in conversation["participants"]:
+                self._members[user_id].discard(conversation_id)
+
+    def discard_message(self, message, conversation):
+        """Remove the last ``message`` of its conversation and put back ``conversation`` as it was before."""
+        with self._lock.write():
+            log = self._logs.get(message["conversationId"])
+            if log and log[-1]["id"] == message["id"]:
+                log.pop()
+                del self._messages[message["id"]]
+                self._conversations[conversation["id"]] = conversation
+
+    def restore_conversation(self, conversation):
+        """Put ``conversation`` back as it was before ``mark_read`` (rolls it back)."""
+        with self._lock.write():
+            if conversation["id"] in self._conversations:
+                self._conversations[conversation["id"]] = conversation
@@ -0,0 +1,172 @@
+"""Request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` is a plain ASGI middleware (no ``BaseHTTPMiddleware``
+task or body buffering): per request it takes two clock readings, bumps an
+in-flight gauge and adds the request and response sizes to fixed-bucket
+histograms keyed by ``(method, route template)``. The route template comes
+from ``scope["route"]``, which the router fills in once a route matches, so
+``/api/users/{user_id}`` is one series however many ids are requested.
+Requests that match no route share the ``unmatched`` label, which keeps the
+label set bounded.
+
+Everything is read back by ``render`` when ``/metrics`` is scraped; gauges that
+are cheap to compute on demand (collection sizes, cache sizes, lock totals)
+are passed in by the caller at that point rather than tracked per request.
+"""
+
+from bisect import bisect_left
+from time import perf_counter
+
+from locks import LOCK_STATS
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier compartiment : +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        cumulative += self.counts[-1]
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "request_bytes", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.request_bytes = Histogram(SIZE_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.statuses = {}  # status code -> count
+
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.routes = {}  # (method, route template) -> RouteMetrics
+
+    def record(self, method, route, status, seconds, request_bytes, response_bytes):
+        key = (method, route)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteMetrics()
+        stats.latency.observe(seconds)
+        stats.request_bytes.observe(request_bytes)
+        stats.response_bytes.observe(response_bytes)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def render(self, gauges=()):
+        """Prometheus text exposition; ``gauges`` is an iterable of ``(name, help, {labels: value})``."""
+        out = [
+            "# HELP rihla_http_requests_in_flight Requests currently being served.",
+            "# TYPE rihla_http_requests_in_flight gauge",
+            f"rihla_http_requests_in_flight {self.in_flight}",
+        ]
+        routes = sorted(self.routes.items())
+        out += [
+            "# HELP rihla_http_requests_total Completed requests by route and status.",
+            "# TYPE rihla_http_requests_total counter",
+        ]
+        for (method, route), stats in routes:
+            for status, count in sorted(stats.statuses.items()):
+                out.append(f'rihla_http_requests_total{{{labels(method=method, route=route, status=status)}}} {count}')
+        for name, attribute, help_text in (
+            ("rihla_http_request_duration_seconds", "latency", "Request latency by route."),
+            ("rihla_http_request_size_bytes", "request_bytes", "Request body size (Content-Length) by route."),
+            ("rihla_http_response_size_bytes", "response_bytes", "Response body size by route."),
+        ):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for (method, route), stats in routes:
+                out.extend(getattr(stats, attribute).lines(name, labels(method=method, route=route)))
+        out.extend(lock_lines())
+        for name, help_text, values in gauges:
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for label_text, value in values.items():
+                out.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        out.append("")
+        return "\n".join(out)
+
+
+def lock_lines():
+    stats = sorted(LOCK_STATS.items())
+    for name, help_text, kind, series in (
+        ("rihla_lock_acquisitions_total", "Lock acquisitions by lock and mode.", "counter",
+         lambda s: (("read", s.reads), ("write", s.writes))),
+        ("rihla_lock_wait_seconds_total", "Time spent waiting to acquire a lock.", "counter",
+         lambda s: (("read", s.read_wait), ("write", s.write_wait))),
+        ("rihla_lock_hold_seconds_total", "Time the write side of a lock was held.", "counter",
+         lambda s: (("write", s.write_hold),)),
+        ("rihla_lock_wait_seconds_max", "Longest single wait for a lock since start.", "gauge",
+         lambda s: ((None, s.max_wait),)),
+    ):
+        yield f"# HELP {name} {help_text}"
+        yield f"# TYPE {name} {kind}"
+        for lock, lock_stats in stats:
+            for mode, value in series(lock_stats):
+                label_text = labels(lock=lock, mode=mode) if mode else labels(lock=lock)
+                yield f"{name}{{{label_text}}} {value}"
+
+
+def labels(**values):
+    """Label string for a series, e.g. ``labels(collection="users")``."""
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in values.items())
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metrics = self.metrics
+        response = [500, 0]  # statut, octets envoyés
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.body":
+                response[1] += len(message.get("body", b""))
+            elif message["type"] == "http.response.start":
+                response[0] = message["status"]
+            await send(message)
+
+        metrics.in_flight += 1
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = perf_counter() - start
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            request_bytes = 0
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    request_bytes = int(value) if value.isdigit() else 0
+                    break
+            metrics.record(
+                scope["method"], route.path if route is not None else "unmatched",
+                response[0], elapsed, request_bytes, response[1],
+            )
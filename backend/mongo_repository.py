@@ -0,0 +1,542 @@
+"""Async MongoDB backend built on Motor.
+
+Documents are stored with ``_id`` set to the API id, plus a few underscore
+fields (normalized keys, numeric price, sequence numbers) that back the
+indexes created in ``MongoRepository.connect``. Those fields are stripped
+before a document leaves the repository.
+"""
+
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from experience_store import normalize_key, to_number
+from message_store import conversation_key
+from availability_store import ACTIVE_STATUSES
+from repository import (
+    AvailabilityRepository,
+    BookingRepository,
+    DuplicateEmailError,
+    DuplicateReviewError,
+    ExperienceRepository,
+    MessageRepository,
+    Repository,
+    ReviewRepository,
+    TokenRepository,
+    UserRepository,
+)
+from user_store import normalize_email
+
+INTERNAL_FIELDS = ("_id", "_emailKey", "_seq", "_categoryKey", "_locationKey", "_price", "_groupSize", "_date", "_pairKey")
+
+
+def _clean(doc):
+    if doc is None:
+        return None
+    for field in INTERNAL_FIELDS:
+        doc.pop(field, None)
+    return doc
+
+
+async def _next_seq(db, name, count=1):
+    """Reserve ``count`` sequence numbers; returns the last one."""
+    counter = await db.counters.find_one_and_update(
+        {"_id": name}, {"$inc": {"seq": count}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return counter["seq"]
+
+
+async def _record_change(db, collection, key):
+    await _record_changes(db, collection, [key])
+
+
+async def _record_changes(db, collection, keys):
+    if not keys:
+        return
+    first = await _next_seq(db, "changes", len(keys)) - len(keys) + 1
+    now = datetime.now(timezone.utc)
+    await db.changes.insert_many([
+        {"_id": first + i, "collection": collection, "key": key, "at": now} for i, key in enumerate(keys)
+    ])
+
+
+def _after(fields, values, descending):
+    """Keyset pagination filter: documents strictly after ``values`` in ``fields`` order."""
+    op = "$lt" if descending else "$gt"
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {f: v for f, v in zip(fields[:i], values[:i])}
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+
+async def _export_page(collection, after, since, limit):
+    clauses = []
+    if after is not None:
+        clauses.append({"_seq": {"$gt": after[0]}})
+    if since is not None:
+        clauses.append({"createdAt": {"$gte": since}})
+    cursor = (
+        collection.find({"$and": clauses} if clauses else {})
+        .sort("_seq", ASCENDING)
+        .limit(limit + 1)
+    )
+    docs = await cursor.to_list(length=limit + 1)
+    page = docs[:limit]
+    next_key = (page[-1]["_seq"],) if len(docs) > limit else None
+    return [_clean(doc) for doc in page], next_key
+
+
+class MongoUserRepository(UserRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.users
+
+    async def insert(self, user):
+        doc = {
+            **user,
+            "_id": user["id"],
+            "_seq": await _next_seq(self.db, "users"),
+            "_emailKey": normalize_email(user["email"]),
+        }
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            raise DuplicateEmailError(user["email"])
+        return user
+
+    async def get(self, user_id):
+        return _clean(await self.collection.find_one({"_id": user_id}))
+
+    async def get_by_email(self, email):
+        return _clean(await self.collection.find_one({"_emailKey": normalize_email(email)}))
+
+    async def update(self, user_id, changes):
+        changes = {k: v for k, v in changes.items() if k != "id"}
+        update = dict(changes)
+        if "email" in changes:
+            update["_emailKey"] = normalize_email(changes["email"])
+        try:
+            doc = await self.collection.find_one_and_update(
+                {"_id": user_id}, {"$set": update}, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            raise DuplicateEmailError(changes.get("email"))
+        if doc is not None:
+            await _record_change(self.db, "users", user_id)
+        return _clean(doc)
+
+    async def scan(self):
+        async for doc in self.collection.find({}):
+            yield _clean(doc)
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        return await _export_page(self.collection, after, since, limit)
+
+
+class MongoExperienceRepository(ExperienceRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.experiences
+
+    @staticmethod
+    def _doc(experience, seq):
+        return {
+            **experience,
+            "_id": experience["id"],
+            "_seq": seq,
+            "_categoryKey": normalize_key(experience.get("category")),
+            "_locationKey": normalize_key(experience.get("location")),
+            "_price": to_number(experience.get("price")),
+            "_groupSize": to_number(experience.get("groupSize")),
+        }
+
+    async def insert(self, experience):
+        await self.collection.insert_one(self._doc(experience, await _next_seq(self.db, "experiences")))
+        await _record_change(self.db, "experiences", experience["id"])
+        return experience
+
+    async def insert_many(self, experiences):
+        if not experiences:
+            return experiences
+        first = await _next_seq(self.db, "experiences", len(experiences)) - len(experiences) + 1
+        await self.collection.insert_many([self._doc(exp, first + i) for i, exp in enumerate(experiences)])
+        await _record_changes(self.db, "experiences", [exp["id"] for exp in experiences])
+        return experiences
+
+    async def get(self, experience_id):
+        return _clean(await self.collection.find_one({"_id": experience_id}))
+
+    async def get_many(self, experience_ids):
+        found = {}
+        async for doc in self.collection.find({"_id": {"$in": list(experience_ids)}}):
+            found[doc["id"]] = _clean(doc)
+        return [found[i] for i in experience_ids if i in found]
+
+    async def query(self, category=None, location=None, min_price=None, max_price=None,
+                    group_size=None, sort_by="createdAt", descending=True, after=None, limit=20):
+        clauses = []
+        if category:
+            clauses.append({"_categoryKey": normalize_key(category)})
+        if location:
+            clauses.append({"_locationKey": normalize_key(location)})
+        price = {}
+        if min_price is not None:
+            price["$gte"] = min_price
+        if max_price is not None:
+            price["$lte"] = max_price
+        if sort_by == "price":
+            price["$ne"] = None
+        if price:
+            clauses.append({"_price": price})
+        if group_size is not None:
+            clauses.append({"_groupSize": {"$gte": group_size}})
+        fields = ["_price", "_seq"] if sort_by == "price" else ["_seq"]
+        if after is not None:
+            clauses.append(_after(fields, list(after), descending))
+        direction = DESCENDING if descending else ASCENDING
+        cursor = (
+            self.collection.find({"$and": clauses} if clauses else {})
+            .sort([(field, direction) for field in fields])
+            .limit(limit + 1)
+        )
+        docs = await cursor.to_list(length=limit + 1)
+        page = docs[:limit]
+        next_key = tuple(page[-1][f] for f in fields) if len(docs) > limit else None
+        return [_clean(doc) for doc in page], next_key
+
+    async def scan(self):
+        async for doc in self.collection.find({}).sort("_seq", ASCENDING):
+            yield _clean(doc)
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        return await _export_page(self.collection, after, since, limit)
+
+
+class MongoBookingRepository(BookingRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.bookings
+
+    @staticmethod
+    def _doc(booking, seq):
+        return {**booking, "_id": booking["id"], "_seq": seq, "_date": str(booking.get("date") or "")}
+
+    async def insert(self, booking):
+        await self.collection.insert_one(self._doc(booking, await _next_seq(self.db, "bookings")))
+        return booking
+
+    async def insert_many(self, bookings):
+        if not bookings:
+            return bookings
+        first = await _next_seq(self.db, "bookings", len(bookings)) - len(bookings) + 1
+        await self.collection.insert_many([self._doc(booking, first + i) for i, booking in enumerate(bookings)])
+        return bookings
+
+    async def get(self, booking_id):
+        return _clean(await self.collection.find_one({"_id": booking_id}))
+
+    async def for_user(self, user_id, after=None, limit=20, descending=False):
+        return await self._page("userId", user_id, after, limit, descending)
+
+    async def for_experience(self, experience_id, after=None, limit=20, descending=False):
+        return await self._page("experienceId", experience_id, after, limit, descending)
+
+    async def _page(self, field, owner, after, limit, descending):
+        query = {field: owner}
+        if after is not None:
+            query = {"$and": [query, _after(["_date", "_seq"], list(after[:2]), descending)]}
+        direction = DESCENDING if descending else ASCENDING
+        cursor = self.collection.find(query).sort([("_date", direction), ("_seq", direction)]).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        page = docs[:limit]
+        next_key = (page[-1]["_date"], page[-1]["_seq"], page[-1]["_id"]) if len(docs) > limit else None
+        return [_clean(doc) for doc in page], next_key
+
+    async def scan(self):
+        async for doc in self.collection.find({}).sort("_seq", ASCENDING):
+            yield _clean(doc)
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        return await _export_page(self.collection, after, since, limit)
+
+
+class MongoReviewRepository(ReviewRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.reviews
+
+    async def insert(self, review):
+        doc = {**review, "_id": review["id"], "_seq": await _next_seq(self.db, "reviews")}
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            raise DuplicateReviewError(review["experienceId"])
+        await _record_change(self.db, "reviews", review["id"])
+        return review
+
+    async def get(self, review_id):
+        return _clean(await self.collection.find_one({"_id": review_id}))
+
+    async def update(self, review_id, changes):
+        # Auteur et expérience ne changent pas : l'index unique reste valide
+        changes = {k: v for k, v in changes.items() if k not in ("id", "userId", "experienceId")}
+        doc = await self.collection.find_one_and_update(
+            {"_id": review_id}, {"$set": changes}, return_document=ReturnDocument.AFTER
+        )
+        if doc is not None:
+            await _record_change(self.db, "reviews", review_id)
+        return _clean(doc)
+
+    async def delete(self, review_id):
+        doc = await self.collection.find_one_and_delete({"_id": review_id})
+        if doc is not None:
+            await _record_change(self.db, "reviews", review_id)
+        return _clean(doc)
+
+    async def for_experience(self, experience_id, after=None, limit=20, descending=True):
+        query = {"experienceId": experience_id}
+        if after is not None:
+            query["_seq"] = {"$lt" if descending else "$gt": after[0]}
+        direction = DESCENDING if descending else ASCENDING
+        cursor = self.collection.find(query).sort("_seq", direction).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        page = docs[:limit]
+        next_key = (page[-1]["_seq"], page[-1]["_id"]) if len(docs) > limit else None
+        return [_clean(doc) for doc in page], next_key
+
+    async def scan(self):
+        async for doc in self.collection.find({}).sort("_seq", ASCENDING):
+            yield _clean(doc)
+
+
+class MongoMessageRepository(MessageRepository):
+    def __init__(self, db):
+        self.db = db
+        self.conversations = db.conversations
+        self.collection = db.messages
+
+    async def open_conversation(self, conversation):
+        key = conversation_key(conversation["participants"], conversation.get("experienceId"))
+        try:
+            doc = await self.conversations.find_one_and_update(
+                {"_pairKey": key},
+                {"$setOnInsert": {**conversation, "_id": conversation["id"]}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Deux premiers messages simultanés : l'autre insertion a gagné
+            doc = await self.conversations.find_one({"_pairKey": key})
+        return _clean(doc)
+
+    async def get_conversation(self, conversation_id):
+        return _clean(await self.conversations.find_one({"_id": conversation_id}))
+
+    async def conversations_for(self, user_id, after=None, limit=20):
+        query = {"participants": user_id}
+        if after is not None:
+            query = {"$and": [query, _after(["activity", "_id"], list(after[:2]), True)]}
+        cursor = self.conversations.find(query).sort([("activity", DESCENDING), ("_id", DESCENDING)]).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        page = docs[:limit]
+        next_key = (page[-1]["activity"], page[-1]["_id"]) if len(docs) > limit else None
+        return [_clean(doc) for doc in page], next_key
+
+    async def append(self, conversation_id, message):
+        activity = await _next_seq(self.db, "messages")
+        conversation = await self.conversations.find_one({"_id": conversation_id}, {"participants": 1})
+        if conversation is None:
+            return None
+        # Numéro attribué atomiquement par $inc ; les compteurs non lus des autres participants suivent
+        increments = {"messageCount": 1}
+        increments.update({
+            f"unread.{user_id}": 1 for user_id in conversation["participants"] if user_id != message["senderId"]
+        })
+        conversation = await self.conversations.find_one_and_update(
+            {"_id": conversation_id},
+            {"$inc": increments, "$max": {"activity": activity}},
+            return_document=ReturnDocument.AFTER,
+        )
+        stored = {**message, "conversationId": conversation_id, "seq": conversation["messageCount"]}
+        await self.collection.insert_one({**stored, "_id": stored["id"], "_seq": activity})
+        await self.conversations.update_one(
+            {"_id": conversation_id, "$or": [{"lastMessage": None}, {"lastMessage.seq": {"$lt": stored["seq"]}}]},
+            {"$set": {"lastMessage": stored}},
+        )
+        await _record_change(self.db, "messages", stored["id"])
+        return stored, {**_clean(conversation), "lastMessage": stored}
+
+    async def get_message(self, message_id):
+        return _clean(await self.collection.find_one({"_id": message_id}))
+
+    async def messages(self, conversation_id, after=None, limit=50, descending=True):
+        query = {"conversationId": conversation_id}
+        if after is not None:
+            query["seq"] = {"$lt" if descending else "$gt": after[0]}
+        direction = DESCENDING if descending else ASCENDING
+        cursor = self.collection.find(query).sort("seq", direction).limit(limit + 1)
+        docs = await cursor.to_list(length=limit + 1)
+        page = docs[:limit]
+        next_key = (page[-1]["seq"],) if len(docs) > limit else None
+        return [_clean(doc) for doc in page], next_key
+
+    async def mark_read(self, conversation_id, user_id, seq):
+        conversation = await self.get_conversation(conversation_id)
+        if conversation is None or seq <= conversation["readSeq"].get(user_id, seq):
+            return conversation
+        seq = min(seq, conversation["messageCount"])
+        unread = await self.collection.count_documents(
+            {"conversationId": conversation_id, "seq": {"$gt": seq}, "senderId": {"$ne": user_id}}
+        )
+        doc = await self.conversations.find_one_and_update(
+            {"_id": conversation_id, f"readSeq.{user_id}": {"$lt": seq}},
+            {"$set": {f"readSeq.{user_id}": seq, f"unread.{user_id}": unread}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            return await self.get_conversation(conversation_id)
+        await _record_change(self.db, "conversations", conversation_id)
+        return _clean(doc)
+
+
+class MongoAvailabilityRepository(AvailabilityRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.availability
+
+    async def reserve(self, experience_id, date, seats, capacity=None):
+        if capacity is not None and seats > capacity:
+            return False
+        query = {"_id": f"{experience_id}|{date}"}
+        if capacity is not None:
+            query["booked"] = {"$lte": capacity - seats}
+        try:
+            # Jour complet : le filtre ne correspond pas et l'upsert heurte l'_id existant
+            await self.collection.update_one(
+                query,
+                {"$inc": {"booked": seats}, "$setOnInsert": {"experienceId": experience_id, "date": date}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release(self, experience_id, date, seats):
+        await self.collection.update_one({"_id": f"{experience_id}|{date}"}, {"$inc": {"booked": -seats}})
+
+    async def booked(self, experience_id, start, end):
+        cursor = self.collection.find(
+            {"experienceId": experience_id, "date": {"$gte": start, "$lte": end}, "booked": {"$gt": 0}}
+        )
+        return {doc["date"]: doc["booked"] async for doc in cursor}
+
+
+class MongoTokenRepository(TokenRepository):
+    def __init__(self, db):
+        self.db = db
+        self.collection = db.tokens
+
+    async def insert(self, key, user_id, expires_at):
+        await self.collection.replace_one(
+            {"_id": key},
+            {"userId": user_id, "expiresAt": datetime.fromtimestamp(expires_at, timezone.utc)},
+            upsert=True,
+        )
+
+    async def get(self, key):
+        doc = await self.collection.find_one({"_id": key})
+        if doc is None:
+            return None
+        expires_at = doc["expiresAt"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return doc["userId"], expires_at.timestamp()
+
+    async def delete(self, key):
+        result = await self.collection.delete_one({"_id": key})
+        if result.deleted_count:
+            await _record_change(self.db, "tokens", key)
+        return result.deleted_count > 0
+
+
+class MongoRepository(Repository):
+    name = "mongo"
+    shared = True
+
+    def __init__(self, url, db_name="rihla", max_pool_size=100, min_pool_size=0):
+        self.client = AsyncIOMotorClient(url, maxPoolSize=max_pool_size, minPoolSize=min_pool_size)
+        self.db = self.client[db_name]
+        super().__init__(
+            MongoUserRepository(self.db),
+            MongoExperienceRepository(self.db),
+            MongoBookingRepository(self.db),
+            MongoTokenRepository(self.db),
+            MongoAvailabilityRepository(self.db),
+            MongoReviewRepository(self.db),
+            MongoMessageRepository(self.db),
+        )
+
+    async def connect(self):
+        await self.db.users.create_index("_emailKey", unique=True)
+        await self.db.users.create_index("_seq")
+        await self.db.bookings.create_index("_seq")
+        await self.db.experiences.create_index("_seq", unique=True)
+        await self.db.experiences.create_index([("_categoryKey", ASCENDING), ("_seq", ASCENDING)])
+        await self.db.experiences.create_index([("_locationKey", ASCENDING), ("_seq", ASCENDING)])
+        await self.db.experiences.create_index([("_price", ASCENDING), ("_seq", ASCENDING)])
+        await self.db.bookings.create_index([("userId", ASCENDING), ("_date", ASCENDING), ("_seq", ASCENDING)])
+        await self.db.bookings.create_index([("experienceId", ASCENDING), ("_date", ASCENDING), ("_seq", ASCENDING)])
+        await self.db.availability.create_index([("experienceId", ASCENDING), ("date", ASCENDING)])
+        await self.db.reviews.create_index([("userId", ASCENDING), ("experienceId", ASCENDING)], unique=True)
+        await self.db.reviews.create_index([("experienceId", ASCENDING), ("_seq", ASCENDING)])
+        await self.db.conversations.create_index("_pairKey", unique=True)
+        await self.db.conversations.create_index([("participants", ASCENDING), ("activity", DESCENDING), ("_id", DESCENDING)])
+        await self.db.messages.create_index([("conversationId", ASCENDING), ("seq", ASCENDING)], unique=True)
+        if await self.db.availability.find_one({}) is None:
+            await self._backfill_availability()
+        # Expiration gérée par MongoDB lui-même (index TTL)
+        await self.db.tokens.create_index("expiresAt", expireAfterSeconds=0)
+        await self.db.changes.create_index("at", expireAfterSeconds=3600)
+
+    async def _backfill_availability(self):
+        """Rebuild the seat counters from existing bookings (first start with this collection)."""
+        pipeline = [
+            {"$match": {"status": {"$in": sorted(ACTIVE_STATUSES)}}},
+            {"$group": {
+                "_id": {"experienceId": "$experienceId", "date": "$_date"},
+                "booked": {"$sum": {"$ifNull": ["$guests", 1]}},
+            }},
+        ]
+        docs = [
+            {
+                "_id": f"{row['_id']['experienceId']}|{row['_id']['date']}",
+                "experienceId": row["_id"]["experienceId"],
+                "date": row["_id"]["date"],
+                "booked": row["booked"],
+            }
+            async for row in self.db.bookings.aggregate(pipeline)
+        ]
+        if docs:
+            await self.db.availability.insert_many(docs)
+
+    async def last_change(self):
+        doc = await self.db.changes.find_one({}, sort=[("_id", DESCENDING)])
+        return doc["_id"] if doc else 0
+
+    async def changes_since(self, seq, limit=1000):
+        cursor = self.db.changes.find({"_id": {"$gt": seq}}).sort("_id", ASCENDING).limit(limit)
+        return [(doc["_id"], doc["collection"], doc["key"]) async for doc in cursor]
+
+    async def sizes(self):
+        # Estimation tirée des métadonnées : pas de parcours de collection
+        return {
+            name: await self.db[name].estimated_document_count()
+            for name in ("users", "experiences", "bookings", "reviews", "conversations", "messages", "tokens")
+        }
+
+    async def close(self):
+        self.client.close()
@@ -0,0 +1,35 @@
+"""Opaque cursor helpers shared by the paginated endpoints."""
+
+import base64
+import json
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(key):
+    """Encode a sort key (tuple/list of JSON scalars) as an opaque cursor string."""
+    if key is None:
+        return None
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError if malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def clamp_limit(limit):
+    if limit is None:
+        return DEFAULT_LIMIT
+    return max(1, min(int(limit), MAX_LIMIT))
@@ -0,0 +1,72 @@
+"""Password hashing for the API, kept off the event loop.
+
+Hashes are produced with a passlib ``CryptContext``. The KDF is deliberately
+slow, so every hash and verify call runs on a small dedicated thread pool
+(passlib's pbkdf2 and bcrypt backends do their work in C with the GIL
+released): a burst of logins then occupies those threads instead of stalling
+every other request on the loop.
+
+Changing the scheme or the cost only affects new hashes; existing ones are
+upgraded transparently the next time their owner logs in (``verify`` returns
+the replacement hash). Accounts created before hashing was introduced still
+hold the plain password and are upgraded the same way.
+
+passlib and the thread pool are only loaded by the first hash or verify, so a
+worker that only serves catalogue reads never imports them.
+"""
+
+import asyncio
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PasswordHasher:
+    def __init__(self, scheme="pbkdf2_sha256", rounds=None, workers=None):
+        self.scheme = scheme
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self._context = None
+        self._executor = None
+
+    @property
+    def context(self):
+        if self._context is None:
+            from passlib.context import CryptContext
+
+            settings = {}
+            if self.rounds is not None:
+                # min = max = défaut : tout hachage d'un autre coût sera refait à la connexion
+                for option in ("default_rounds", "min_rounds", "max_rounds"):
+                    settings[f"{self.scheme}__{option}"] = self.rounds
+            schemes = [self.scheme] + [s for s in ("pbkdf2_sha256",) if s != self.scheme]
+            self._context = CryptContext(schemes=schemes, deprecated=["auto"], **settings)
+        return self._context
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def hash(self, password):
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password, stored):
+        """Check ``password`` against a stored value; returns ``(ok, new_hash_or_None)``.
+
+        ``stored`` None still burns one hash worth of time, so unknown emails
+        cannot be told apart from wrong passwords by timing.
+        """
+        if stored is None:
+            await self._run(self.context.dummy_verify)
+            return False, None
+        if self.context.identify(stored, required=False) is None:
+            # Compte antérieur au hachage : mot de passe stocké en clair
+            if hmac.compare_digest(str(password).encode(), str(stored).encode()):
+                return True, await self.hash(password)
+            return False, None
+        return await self._run(self.context.verify_and_update, password, stored)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,171 @@
+"""Opt-in sampling profiler for live requests.
+
+``ProfilerMiddleware`` marks a request as profiled when a random draw falls
+under ``sample_rate`` or when ``is_trusted(scope)`` accepts its debug header.
+While at least one profiled request is in flight, a background thread reads
+the event-loop thread's stack every ``interval`` seconds and, if the task
+running on the loop at that instant is a profiled request, counts the stack
+under that request's route template.
+
+Stacks are kept in the "collapsed" format read by ``flamegraph.pl`` and
+speedscope (``outer;inner;leaf count``, one line per distinct stack), so an
+export can be rendered without post-processing. Only the loop thread is
+sampled: time a request spends waiting on an executor (password hashing,
+SQLite) shows up as the ``await`` it is parked on, not as the worker's stack.
+The sampler needs the GIL to run, so a CPU-bound loop is sampled at most once
+per ``sys.getswitchinterval()`` (5 ms by default) whatever ``interval`` says.
+
+The middleware is only installed when profiling is enabled; a disabled
+profiler adds no code to the request path and starts no thread.
+"""
+
+import asyncio
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+TRUNCATED = "[truncated]"
+
+
+def _task_reader(loop):
+    """A function returning the task running on ``loop``, callable from another thread.
+
+    ``asyncio.current_task(loop)`` does this on the CPython versions we run.
+    Should it refuse, fall back to asyncio's private table of running tasks,
+    and failing that report no task: the profiler then counts requests but
+    takes no samples.
+    """
+    try:
+        asyncio.current_task(loop)
+        return functools.partial(asyncio.current_task, loop)
+    except RuntimeError:
+        pass
+    current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+    if isinstance(current_tasks, dict):
+        return functools.partial(current_tasks.get, loop)
+    return lambda: None
+
+
+class Profiler:
+    def __init__(self, sample_rate=0.0, interval=0.005, max_stacks=10_000, max_depth=128):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.requests = Counter()  # route -> profiled requests
+        self.samples = Counter()  # route -> samples taken
+        self._stacks = {}  # route -> Counter(collapsed stack -> samples)
+        self._active = {}  # task -> ASGI scope of a profiled request
+        self._pending = {}  # task -> Counter of samples taken before the route was known
+        self._loop = None
+        self._loop_thread = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def begin(self, task, scope):
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        self._active[task] = scope
+        self._wake.set()
+
+    def end(self, task, route):
+        self._active.pop(task, None)
+        if not self._active:
+            self._wake.clear()
+        with self._lock:
+            self.requests[route] += 1
+            # Échantillons pris avant le routage : rattachés à la route finale
+            pending = self._pending.pop(task, None)
+            if pending:
+                for stack, count in pending.items():
+                    self._add(route, stack, count)
+
+    def _run(self):
+        current_task = _task_reader(self._loop)
+        while True:
+            self._wake.wait()
+            task = current_task()
+            scope = self._active.get(task) if task is not None else None
+            frame = sys._current_frames().get(self._loop_thread) if scope is not None else None
+            if frame is not None:
+                stack = self._collapse(frame)
+                route = scope.get("route")
+                with self._lock:
+                    if route is None:
+                        self._pending.setdefault(task, Counter())[stack] += 1
+                    else:
+                        self._add(route.path, stack, 1)
+            time.sleep(self.interval)
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        names.reverse()
+        return ";".join(names)
+
+    def _add(self, route, stack, count):
+        stacks = self._stacks.setdefault(route, Counter())
+        if stack not in stacks and len(stacks) >= self.max_stacks:
+            stack = TRUNCATED
+        stacks[stack] += count
+        self.samples[route] += count
+
+    def summary(self):
+        with self._lock:
+            return {
+                route: {"requests": self.requests[route], "samples": self.samples[route]}
+                for route in sorted(self.requests)
+            }
+
+    def collapsed(self, route=None):
+        """Collapsed stacks for ``route``, or for every route with the route as the root frame."""
+        with self._lock:
+            if route is not None:
+                items = list(self._stacks.get(route, {}).items())
+            else:
+                items = [
+                    (f"{name};{stack}", count)
+                    for name, stacks in self._stacks.items()
+                    for stack, count in stacks.items()
+                ]
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(items))
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.samples.clear()
+            self._stacks.clear()
+
+
+class ProfilerMiddleware:
+    def __init__(self, app, profiler, is_trusted=None):
+        self.app = app
+        self.profiler = profiler
+        self.is_trusted = is_trusted
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if scope["type"] != "http" or not (
+            random.random() < profiler.sample_rate
+            or (self.is_trusted is not None and self.is_trusted(scope))
+        ):
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        profiler.begin(task, scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            profiler.end(task, route.path if route is not None else "unmatched")
@@ -0,0 +1,96 @@
+"""Rating aggregates per experience and per host, maintained incrementally.
+
+Every aggregate is a count, a sum and a 1-5 star histogram, so a review
+write adjusts a handful of integers instead of re-reading the reviews, and
+a listing page embeds ratings with one dict lookup per experience.
+
+``apply(review_id, review)`` is the only write path: it remembers the last
+contribution of each review, so a creation, an edit (the old rating is
+taken back first) and a deletion (``review`` None) all cost O(1), and
+replaying the same change from the change feed is a no-op.
+"""
+
+import threading
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+class RatingSummary:
+    __slots__ = ("count", "total", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0] * len(RATINGS)
+
+    def add(self, rating, sign):
+        self.count += sign
+        self.total += sign * rating
+        self.histogram[rating - 1] += sign
+
+    def average(self):
+        return round(self.total / self.count, 2) if self.count else 0.0
+
+
+class RatingAggregates:
+    def __init__(self):
+        self._experiences = {}  # experience id -> RatingSummary
+        self._hosts = {}  # host id -> RatingSummary
+        self._applied = {}  # review id -> (experience id, host id, rating)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._applied)
+
+    def apply(self, review_id, review):
+        """Make the aggregates reflect ``review`` (None once it is deleted); returns True if they changed."""
+        contribution = None
+        if review is not None:
+            contribution = (review["experienceId"], review.get("hostId"), review["rating"])
+        with self._lock:
+            previous = self._applied.get(review_id)
+            if previous == contribution:
+                return False
+            if previous is not None:
+                self._add(previous, -1)
+                del self._applied[review_id]
+            if contribution is not None:
+                self._add(contribution, 1)
+                self._applied[review_id] = contribution
+        return True
+
+    def _add(self, contribution, sign):
+        experience_id, host_id, rating = contribution
+        self._experiences.setdefault(experience_id, RatingSummary()).add(rating, sign)
+        if host_id is not None:
+            self._hosts.setdefault(host_id, RatingSummary()).add(rating, sign)
+
+    def experience(self, experience_id, histogram=False):
+        return self._fields(self._experiences.get(experience_id), histogram)
+
+    def host(self, host_id, histogram=False):
+        return self._fields(self._hosts.get(host_id), histogram)
+
+    def with_ratings(self, experiences):
+        """Copies of ``experiences`` carrying their ``rating`` and ``review_count``."""
+        summaries = self._experiences
+        rated = []
+        for experience in experiences:
+            summary = summaries.get(experience["id"])
+            rated.append({
+                **experience,
+                "rating": summary.average() if summary else 0.0,
+                "review_count": summary.count if summary else 0,
+            })
+        return rated
+
+    @staticmethod
+    def _fields(summary, histogram):
+        fields = {
+            "rating": summary.average() if summary else 0.0,
+            "review_count": summary.count if summary else 0,
+        }
+        if histogram:
+            counts = summary.histogram if summary else [0] * len(RATINGS)
+            fields["histogram"] = {str(stars): count for stars, count in zip(RATINGS, counts)}
+        return fields
@@ -0,0 +1,120 @@
+"""Compact in-memory records for the user and experience stores, and the id tables of the booking table.
+
+A dict per document costs a hash table per document, and every document
+keeps its own copy of the ids it points to. ``UserStore`` and
+``ExperienceStore`` instead keep ``__slots__`` records, whose known fields
+live in fixed slots and whose id strings are interned, so a host id or a
+category is stored once however many documents repeat it. Fields outside the
+known layout go to a small ``extra`` dict, so nothing posted is lost.
+
+Records never leave the stores: reads hand out ``to_dict()`` copies, so the
+handlers keep working with plain JSON documents.
+
+``BookingStore`` goes further and keeps no object per booking at all: its
+columns hold integer surrogate keys from ``Ids`` tables instead of the user
+and experience ids.
+"""
+
+import sys
+
+_MISSING = object()
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Base of the record types; subclasses list their ``FIELDS`` and which of them to intern."""
+
+    __slots__ = ("extra",)
+    FIELDS = ()
+    INTERNED = frozenset()
+
+    def __init_subclass__(cls):
+        super().__init_subclass__()
+        cls.FIELD_SET = frozenset(cls.FIELDS)
+
+    @classmethod
+    def from_dict(cls, doc):
+        record = cls.__new__(cls)
+        extra = None
+        for key, value in doc.items():
+            if key in cls.FIELD_SET:
+                setattr(record, key, _intern(value) if key in cls.INTERNED else value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        record.extra = extra
+        return record
+
+    def to_dict(self):
+        doc = {}
+        for key in self.FIELDS:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                doc[key] = value
+        if self.extra:
+            doc.update(self.extra)
+        return doc
+
+    def get(self, key, default=None):
+        if key in self.FIELD_SET:
+            return getattr(self, key, default)
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+
+class UserRecord(Record):
+    FIELDS = (
+        "id", "firstName", "lastName", "email", "password", "phoneNumber", "dateOfBirth",
+        "avatar", "bio", "isHost", "isAdmin", "createdAt",
+    )
+    INTERNED = frozenset({"id"})
+    __slots__ = FIELDS
+
+
+class ExperienceRecord(Record):
+    FIELDS = (
+        "id", "title", "description", "category", "location", "price", "duration", "groupSize",
+        "highlights", "images", "coordinates", "hostId", "createdAt",
+    )
+    # Les catégories, villes et durées se répètent d'une expérience à l'autre
+    INTERNED = frozenset({"id", "hostId", "category", "location", "duration"})
+    __slots__ = FIELDS
+
+
+
+class Ids:
+    """Ids mapped to dense integer surrogate keys (0, 1, 2…), each id stored once.
+
+    ``key`` adds unknown ids: callers serialize it with their own write lock.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._ids = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def key(self, value):
+        key = self._keys.get(value)
+        if key is None:
+            value = _intern(value)
+            key = self._keys[value] = len(self._ids)
+            self._ids.append(value)
+        return key
+
+    def find(self, value):
+        """The key of ``value``, or None if it was never added."""
+        return self._keys.get(value)
+
+    def id(self, key):
+        return self._ids[key]
@@ -0,0 +1,462 @@
+"""Storage interface used by the API handlers.
+
+Handlers only talk to ``Repository.users`` / ``.experiences`` / ``.bookings``
+/ ``.reviews`` / ``.messages`` through the async methods below, so the
+backend (process memory, SQLite or MongoDB) is picked by configuration
+without touching handler code.
+
+Shared backends (SQLite, Mongo) also keep token digests and an append-only
+change log, so that several worker processes can serve the same data: each
+worker polls ``changes_since`` to refresh its in-process caches and indexes.
+
+Paged queries return ``(items, next_key)``; ``next_key`` is an opaque tuple of
+JSON scalars that the caller hands back as ``after`` (the API wraps it with
+``pagination.encode_cursor``). Keys are only meaningful to the backend that
+produced them.
+
+``export_page`` walks a whole collection in insertion order for the NDJSON
+exports. ``since`` is an ISO-8601 UTC timestamp compared with ``createdAt``;
+a filtered page may hold fewer than ``limit`` items (even none), and only a
+``next_key`` of None means the end of the collection was reached.
+"""
+
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+
+from availability_store import AvailabilityStore
+from booking_store import BookingStore
+from experience_store import ExperienceStore
+from message_store import MessageStore
+from review_store import DuplicateReviewError, ReviewStore  # noqa: F401  (re-exported)
+from user_store import DuplicateEmailError, UserStore  # noqa: F401  (re-exported)
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    async def insert(self, user):
+        """Store a new user; raises DuplicateEmailError if the email is taken."""
+
+    @abstractmethod
+    async def get(self, user_id):
+        """Return the user or None."""
+
+    @abstractmethod
+    async def get_by_email(self, email):
+        """Return the user registered with ``email`` (case-insensitive) or None."""
+
+    @abstractmethod
+    async def update(self, user_id, changes):
+        """Apply ``changes`` and return the updated user, or None if unknown."""
+
+    @abstractmethod
+    def scan(self):
+        """Async iterator over every user."""
+
+    @abstractmethod
+    async def export_page(self, after=None, since=None, limit=1000):
+        """One page of users in insertion order, as ``(users, next_key)``."""
+
+
+class ExperienceRepository(ABC):
+    @abstractmethod
+    async def insert(self, experience):
+        """Store a new experience."""
+
+    @abstractmethod
+    async def insert_many(self, experiences):
+        """Store a batch of new experiences in one write."""
+
+    @abstractmethod
+    async def get(self, experience_id):
+        """Return the experience or None."""
+
+    @abstractmethod
+    async def get_many(self, experience_ids):
+        """Return the experiences for ``experience_ids``, in that order, skipping unknown ids."""
+
+    @abstractmethod
+    async def query(self, category=None, location=None, min_price=None, max_price=None,
+                    group_size=None, sort_by="createdAt", descending=True, after=None, limit=20):
+        """One filtered, sorted page as ``(experiences, next_key)``."""
+
+    @abstractmethod
+    def scan(self):
+        """Async iterator over every experience, oldest first."""
+
+    @abstractmethod
+    async def export_page(self, after=None, since=None, limit=1000):
+        """One page of experiences in insertion order, as ``(experiences, next_key)``."""
+
+
+class BookingRepository(ABC):
+    @abstractmethod
+    async def insert(self, booking):
+        """Store a new booking."""
+
+    @abstractmethod
+    async def insert_many(self, bookings):
+        """Store a batch of new bookings in one write."""
+
+    @abstractmethod
+    async def get(self, booking_id):
+        """Return the booking or None."""
+
+    @abstractmethod
+    async def for_user(self, user_id, after=None, limit=20, descending=False):
+        """One page of a user's bookings ordered by date, as ``(bookings, next_key)``."""
+
+    @abstractmethod
+    async def for_experience(self, experience_id, after=None, limit=20, descending=False):
+        """One page of an experience's bookings ordered by date, as ``(bookings, next_key)``."""
+
+    @abstractmethod
+    def scan(self):
+        """Async iterator over every booking."""
+
+    @abstractmethod
+    async def export_page(self, after=None, since=None, limit=1000):
+        """One page of bookings in insertion order, as ``(bookings, next_key)``."""
+
+
+class ReviewRepository(ABC):
+    """Reviews, at most one per (user, experience): ``insert`` raises DuplicateReviewError otherwise."""
+
+    @abstractmethod
+    async def insert(self, review):
+        """Store a new review."""
+
+    @abstractmethod
+    async def get(self, review_id):
+        """Return the review or None."""
+
+    @abstractmethod
+    async def update(self, review_id, changes):
+        """Apply ``changes`` and return the updated review, or None if it does not exist."""
+
+    @abstractmethod
+    async def delete(self, review_id):
+        """Remove a review; returns it, or None if it did not exist."""
+
+    @abstractmethod
+    async def for_experience(self, experience_id, after=None, limit=20, descending=True):
+        """One page of an experience's reviews in creation order, as ``(reviews, next_key)``."""
+
+    @abstractmethod
+    def scan(self):
+        """Async iterator over every review."""
+
+
+class MessageRepository(ABC):
+    """Two-party conversations, each with an append-only log of numbered messages."""
+
+    @abstractmethod
+    async def open_conversation(self, conversation):
+        """Store ``conversation`` unless its participants already have one; returns the stored one."""
+
+    @abstractmethod
+    async def get_conversation(self, conversation_id):
+        """Return the conversation or None."""
+
+    @abstractmethod
+    async def conversations_for(self, user_id, after=None, limit=20):
+        """One page of a user's conversations, most recently active first, as ``(conversations, next_key)``."""
+
+    @abstractmethod
+    async def append(self, conversation_id, message):
+        """Give ``message`` the next ``seq`` of the conversation and store it; returns ``(message, conversation)``.
+
+        Returns None if the conversation does not exist.
+        """
+
+    @abstractmethod
+    async def get_message(self, message_id):
+        """Return the message or None."""
+
+    @abstractmethod
+    async def messages(self, conversation_id, after=None, limit=50, descending=True):
+        """One page of a conversation's messages by ``seq``, as ``(messages, next_key)``."""
+
+    @abstractmethod
+    async def mark_read(self, conversation_id, user_id, seq):
+        """Move the participant's ``readSeq`` forward to ``seq``; returns the conversation."""
+
+
+class TokenRepository(ABC):
+    """Access tokens shared between workers, keyed by ``token_store.token_key``."""
+
+    @abstractmethod
+    async def insert(self, key, user_id, expires_at):
+        """Record a token issued to ``user_id`` until ``expires_at`` (epoch seconds)."""
+
+    @abstractmethod
+    async def get(self, key):
+        """Return ``(user_id, expires_at)`` or None."""
+
+    @abstractmethod
+    async def delete(self, key):
+        """Revoke a token; returns True if it existed."""
+
+
+class AvailabilityRepository(ABC):
+    """Seats booked per (experience, ISO date), updated atomically per key."""
+
+    @abstractmethod
+    async def reserve(self, experience_id, date, seats, capacity=None):
+        """Take ``seats`` if the day stays within ``capacity`` (None = unlimited); returns True on success."""
+
+    @abstractmethod
+    async def release(self, experience_id, date, seats):
+        """Give back seats taken by ``reserve``."""
+
+    @abstractmethod
+    async def booked(self, experience_id, start, end):
+        """``{date: seats}`` for the booked days between ``start`` and ``end`` (inclusive ISO dates)."""
+
+
+class Repository:
+    """The collections of one backend plus its connection lifecycle.
+
+    ``shared`` is True when several processes can open the same backend; only
+    then are ``tokens`` and the change log available.
+    """
+
+    name = "abstract"
+    shared = False
+
+    def __init__(self, users, experiences, bookings, tokens=None, availability=None, reviews=None, messages=None):
+        self.users = users
+        self.experiences = experiences
+        self.bookings = bookings
+        self.reviews = reviews
+        self.messages = messages
+        self.tokens = tokens
+        self.availability = availability
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def last_change(self):
+        """Sequence number of the newest change-log entry (0 if none)."""
+        return 0
+
+    async def changes_since(self, seq, limit=1000):
+        """Change-log entries after ``seq`` as ``(seq, collection, key)`` tuples, oldest first."""
+        return []
+
+    async def sizes(self):
+        """Document count per collection, for ``/metrics`` (may be an estimate)."""
+        return {}
+
+
+# --- In-memory backend ---
+
+def created_since(items, since):
+    if since is None:
+        return items
+    return [item for item in items if str(item.get("createdAt") or "") >= since]
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, store=None):
+        self.store = store if store is not None else UserStore()
+
+    async def insert(self, user):
+        return self.store.insert(user)
+
+    async def get(self, user_id):
+        return self.store.get(user_id)
+
+    async def get_by_email(self, email):
+        return self.store.get_by_email(email)
+
+    async def update(self, user_id, changes):
+        return self.store.update(user_id, changes)
+
+    async def scan(self):
+        for user in self.store.values():
+            yield user
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        users, next_key = self.store.in_order(after=after, limit=limit)
+        return created_since(users, since), next_key
+
+
+class MemoryExperienceRepository(ExperienceRepository):
+    def __init__(self, store=None):
+        self.store = store if store is not None else ExperienceStore()
+
+    async def insert(self, experience):
+        return self.store.insert(experience)
+
+    async def insert_many(self, experiences):
+        return self.store.insert_many(experiences)
+
+    async def get(self, experience_id):
+        return self.store.get(experience_id)
+
+    async def get_many(self, experience_ids):
+        return [exp for exp in map(self.store.get, experience_ids) if exp is not None]
+
+    async def query(self, **filters):
+        return self.store.query(**filters)
+
+    async def scan(self):
+        for experience in self.store.values():
+            yield experience
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        experiences, next_key = self.store.in_order(after=after, limit=limit)
+        return created_since(experiences, since), next_key
+
+
+class MemoryBookingRepository(BookingRepository):
+    def __init__(self, store=None):
+        self.store = store if store is not None else BookingStore()
+
+    async def insert(self, booking):
+        return self.store.insert(booking)
+
+    async def insert_many(self, bookings):
+        return self.store.insert_many(bookings)
+
+    async def get(self, booking_id):
+        return self.store.get(booking_id)
+
+    async def for_user(self, user_id, after=None, limit=20, descending=False):
+        return self.store.for_user(user_id, after=after, limit=limit, descending=descending)
+
+    async def for_experience(self, experience_id, after=None, limit=20, descending=False):
+        return self.store.for_experience(experience_id, after=after, limit=limit, descending=descending)
+
+    async def scan(self):
+        for booking in self.store.values():
+            yield booking
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        bookings, next_key = self.store.in_order(after=after, limit=limit)
+        return created_since(bookings, since), next_key
+
+
+class MemoryReviewRepository(ReviewRepository):
+    def __init__(self, store=None):
+        self.store = store if store is not None else ReviewStore()
+
+    async def insert(self, review):
+        return self.store.insert(review)
+
+    async def get(self, review_id):
+        return self.store.get(review_id)
+
+    async def update(self, review_id, changes):
+        return self.store.update(review_id, changes)
+
+    async def delete(self, review_id):
+        return self.store.delete(review_id)
+
+    async def for_experience(self, experience_id, after=None, limit=20, descending=True):
+        return self.store.for_experience(experience_id, after=after, limit=limit, descending=descending)
+
+    async def scan(self):
+        for review in self.store.values():
+            yield review
+
+
+class MemoryMessageRepository(MessageRepository):
+    def __init__(self, store=None):
+        self.store = store if store is not None else MessageStore()
+
+    async def open_conversation(self, conversation):
+        return self.store.open_conversation(conversation)
+
+    async def get_conversation(self, conversation_id):
+        return self.store.get_conversation(conversation_id)
+
+    async def conversations_for(self, user_id, after=None, limit=20):
+        return self.store.conversations_for(user_id, after=after, limit=limit)
+
+    async def append(self, conversation_id, message):
+        return self.store.append(conversation_id, message)
+
+    async def get_message(self, message_id):
+        return self.store.get_message(message_id)
+
+    async def messages(self, conversation_id, after=None, limit=50, descending=True):
+        return self.store.messages(conversation_id, after=after, limit=limit, descending=descending)
+
+    async def mark_read(self, conversation_id, user_id, seq):
+        return self.store.mark_read(conversation_id, user_id, seq)
+
+
+class MemoryAvailabilityRepository(AvailabilityRepository):
+    def __init__(self, store=None):
+        self.store = store if store is not None else AvailabilityStore()
+
+    async def reserve(self, experience_id, date, seats, capacity=None):
+        return self.store.reserve(experience_id, date, seats, capacity)
+
+    async def release(self, experience_id, date, seats):
+        self.store.release(experience_id, date, seats)
+
+    async def booked(self, experience_id, start, end):
+        first, last = date.fromisoformat(start), date.fromisoformat(end)
+        days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+        return self.store.booked(experience_id, days)
+
+
+class MemoryRepository(Repository):
+    """Process-local dict stores: fastest, but lost on restart and not shared between workers."""
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__(
+            MemoryUserRepository(),
+            MemoryExperienceRepository(),
+            MemoryBookingRepository(),
+            availability=MemoryAvailabilityRepository(),
+            reviews=MemoryReviewRepository(),
+            messages=MemoryMessageRepository(),
+        )
+
+    async def sizes(self):
+        return {
+            "users": len(self.users.store),
+            "experiences": len(self.experiences.store),
+            "bookings": len(self.bookings.store),
+            "reviews": len(self.reviews.store),
+            "conversations": self.messages.store.conversation_count(),
+            "messages": len(self.messages.store),
+        }
+
+
+def create_repository(backend="memory", **options):
+    """Build the repository named by ``backend`` ("memory", "sqlite" or "mongo").
+
+    The SQLite and Mongo implementations are imported lazily so the optional
+    drivers are only needed when selected. A memory backend given a
+    ``data_dir`` keeps a write-ahead log and snapshots there.
+    """
+    if backend == "memory":
+        if options.get("data_dir"):
+            from durable_repository import DurableMemoryRepository
+            return DurableMemoryRepository(
+                options["data_dir"],
+                sync=options.get("sync", True),
+                commit_delay=options.get("commit_delay", 0.0),
+                snapshot_interval=options.get("snapshot_interval", 300),
+            )
+        return MemoryRepository()
+    if backend == "sqlite":
+        from sqlite_repository import SQLiteRepository
+        return SQLiteRepository(options.get("path", "rihla.db"))
+    if backend == "mongo":
+        from mongo_repository import MongoRepository
+        return MongoRepository(
+            options["url"],
+            options.get("db_name", "rihla"),
+            max_pool_size=options.get("max_pool_size", 100),
+        )
+    raise ValueError(f"Unknown storage backend: {backend}")
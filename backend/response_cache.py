@@ -0,0 +1,90 @@
+"""Versioned cache of encoded response bodies for the catalogue listing endpoints.
+
+The catalogue only changes when an experience is written, so listing
+responses are encoded once per (path, query) and served as raw bytes until
+the next write bumps the version. Each entry carries a strong ETag derived
+from the body, so clients can revalidate with ``If-None-Match`` and get a 304.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from responses import dumps as encode_json  # noqa: F401  (re-exported)
+
+
+def make_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """``If-None-Match`` check (weak comparison, as RFC 9110 requires for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """LRU of ``key -> (body, etag)`` invalidated wholesale by ``invalidate``.
+
+    ``put`` takes the version read before the response was built and drops the
+    entry if a write happened meanwhile, so a slow request can never re-insert
+    a stale page after an invalidation.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(path, query_params):
+        return path, tuple(sorted(query_params.multi_items()))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, version):
+        entry = (body, make_etag(body))
+        with self._lock:
+            if version == self.version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(len(body) for body, _ in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "version": self.version,
+        }
@@ -0,0 +1,117 @@
+"""Fast JSON responses for the API.
+
+Handlers return plain dicts built from JSON data we already stored, so running
+them through ``jsonable_encoder`` and the stdlib ``json`` module is wasted
+work. ``FastJSONRoute`` hands the dict straight to ``dumps`` (orjson when it is
+installed) and only falls back to ``jsonable_encoder`` if that fails. Set
+``RIHLA_FAST_JSON=0`` to force the stdlib encoder.
+"""
+
+import asyncio
+import functools
+import json
+import os
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dépend de l'environnement
+    orjson = None
+
+FAST_JSON = orjson is not None and os.environ.get("RIHLA_FAST_JSON", "1") != "0"
+
+# Listes plus longues que ce seuil : réponse envoyée par morceaux
+STREAM_THRESHOLD = int(os.environ.get("JSON_STREAM_THRESHOLD", 1000))
+STREAM_CHUNK = 500
+
+
+def _std_dumps(content):
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(content):
+    """Encode ``content`` to UTF-8 JSON bytes, converting non-JSON types only if needed."""
+    if FAST_JSON:
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            return _std_dumps(jsonable_encoder(content))
+    try:
+        return _std_dumps(content)
+    except TypeError:
+        return _std_dumps(jsonable_encoder(content))
+
+
+def loads(data):
+    """Parse JSON bytes or text; raises ValueError on malformed input."""
+    return orjson.loads(data) if FAST_JSON else json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Drop-in ``JSONResponse`` that renders with ``dumps``."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def _large_list(content):
+    """Return ``(key, items)`` when ``content`` is an API envelope carrying a big list."""
+    data = content.get("data") if isinstance(content, dict) else None
+    if not isinstance(data, dict):
+        return None
+    for key, value in data.items():
+        if isinstance(value, list) and len(value) > STREAM_THRESHOLD:
+            return key, value
+    return None
+
+
+def _stream_envelope(content, key, items):
+    """Yield ``content`` as JSON a few hundred items at a time, with ``key`` written last in ``data``."""
+    data = content["data"]
+    head = {k: v for k, v in content.items() if k != "data"}
+    rest = {k: v for k, v in data.items() if k != key}
+    yield dumps(head)[:-1] + (b"," if head else b"") + b'"data":' + dumps(rest)[:-1] + (b"," if rest else b"")
+    yield dumps(key) + b":["
+    for start in range(0, len(items), STREAM_CHUNK):
+        chunk = dumps(items[start:start + STREAM_CHUNK])[1:-1]
+        yield (b"," if start else b"") + chunk
+    yield b"]}}"
+
+
+def json_response(content, status_code=200, headers=None):
+    large = _large_list(content)
+    if large is not None:
+        return StreamingResponse(
+            _stream_envelope(content, *large), status_code=status_code,
+            headers=headers, media_type="application/json",
+        )
+    return Response(dumps(content), status_code=status_code, headers=headers, media_type="application/json")
+
+
+class FastJSONRoute(APIRoute):
+    """Route class that encodes plain handler results with ``json_response``.
+
+    Routes declaring a ``response_model`` keep FastAPI's normal validation path.
+    """
+
+    def get_route_handler(self):
+        if self.response_model is None and self.dependant.call is not None:
+            self.dependant.call = self._wrap(self.dependant.call, self.status_code or 200)
+        return super().get_route_handler()
+
+    @staticmethod
+    def _wrap(call, status_code):
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def endpoint(**kwargs):
+                content = await call(**kwargs)
+                return content if isinstance(content, Response) else json_response(content, status_code)
+        else:
+            @functools.wraps(call)
+            def endpoint(**kwargs):
+                content = call(**kwargs)
+                return content if isinstance(content, Response) else json_response(content, status_code)
+        return endpoint
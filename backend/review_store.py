@@ -0,0 +1,101 @@
+"""In-memory review store with a per-experience index."""
+
+import bisect
+import itertools
+
+from locks import RWLock
+
+
+class DuplicateReviewError(ValueError):
+    """Raised when a user reviews the same experience twice."""
+
+
+class ReviewStore:
+    """Reviews keyed by id, plus one ``(seq, review_id)`` list per experience.
+
+    ``seq`` is an insertion counter, so each experience's list is already in
+    chronological order and a page is two slices around a bisect: O(log k +
+    page) for an experience with k reviews. A unique ``(user, experience)``
+    index enforces one review per user and experience.
+    """
+
+    def __init__(self):
+        self._by_id = {}
+        self._keys = {}  # review id -> (seq, review id)
+        self._by_experience = {}
+        self._by_author = {}  # (user id, experience id) -> review id
+        self._seq = itertools.count()
+        self._lock = RWLock("reviews")
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def values(self):
+        return list(self._by_id.values())
+
+    def get(self, review_id):
+        return self._by_id.get(review_id)
+
+    def insert(self, review):
+        author = (review["userId"], review["experienceId"])
+        with self._lock.write():
+            if author in self._by_author:
+                raise DuplicateReviewError(review["experienceId"])
+            key = (next(self._seq), review["id"])
+            self._by_id[review["id"]] = review
+            self._keys[review["id"]] = key
+            self._by_author[author] = review["id"]
+            self._by_experience.setdefault(review["experienceId"], []).append(key)
+        return review
+
+    def update(self, review_id, changes):
+        with self._lock.write():
+            review = self._by_id.get(review_id)
+            if review is None:
+                return None
+            # Auteur et expérience sont fixes : les index n'ont pas à bouger
+            updated = {**review, **changes, "id": review_id, "userId": review["userId"], "experienceId": review["experienceId"]}
+            self._by_id[review_id] = updated
+        return updated
+
+    def delete(self, review_id):
+        """Remove a review; returns it, or None if it did not exist."""
+        with self._lock.write():
+            review = self._by_id.pop(review_id, None)
+            if review is None:
+                return None
+            key = self._keys.pop(review_id)
+            del self._by_author[(review["userId"], review["experienceId"])]
+            keys = self._by_experience[review["experienceId"]]
+            del keys[bisect.bisect_left(keys, key)]
+        return review
+
+    def key_of(self, review_id):
+        """The ``(seq, review_id)`` index key of a review, or None."""
+        return self._keys.get(review_id)
+
+    def restore(self, review, key=None):
+        """Put ``review`` back as it was before an ``update``, or a deleted one under its old ``key``."""
+        with self._lock.write():
+            if key is not None:
+                self._keys[review["id"]] = key
+                self._by_author[(review["userId"], review["experienceId"])] = review["id"]
+                bisect.insort(self._by_experience.setdefault(review["experienceId"], []), key)
+            self._by_id[review["id"]] = review
+
+    def for_experience(self, experience_id, after=None, limit=20, descending=True):
+        """Return ``(reviews, next_key)`` for one page, newest first by default."""
+        with self._lock.read():
+            keys = self._by_experience.get(experience_id)
+            if not keys:
+                return [], None
+            if descending:
+                end = len(keys) if after is None else bisect.bisect_left(keys, tuple(after))
+                page = keys[max(0, end - limit):end][::-1]
+                has_more = end - limit > 0
+            else:
+                start = 0 if after is None else bisect.bisect_right(keys, tuple(after))
+                page = keys[start:start + limit]
+                has_more = start + limit < len(keys)
+            reviews = [self._by_id[key[1]] for key in page]
+        return reviews, (page[-1] if page and has_more else None)
@@ -0,0 +1,285 @@
+"""In-process full-text search over experiences (inverted index + BM25)."""
+
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from locks import RWLock
+
+# Champs indexés et leur poids dans la fréquence des termes
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "location": 2.0,
+    "category": 2.0,
+    "highlights": 1.5,
+    "description": 1.0,
+}
+
+STOP_WORDS = frozenset(
+    "a an and at de des du en et for in la le les of on or the to un une with".split()
+)
+
+# Lettres que NFKD ne décompose pas
+_SPECIAL_FOLDS = str.maketrans({"ß": "ss", "æ": "ae", "œ": "oe", "ø": "o", "ł": "l", "đ": "d", "ı": "i"})
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+MAX_PREFIX_EXPANSIONS = 50
+# Au-delà de ce nombre de candidats, on classe par l'algorithme à seuil plutôt qu'exhaustivement
+EXHAUSTIVE_SCORING_LIMIT = 1000
+# Reconstruit les listes d'impact quand la longueur moyenne des documents a dérivé de plus de 10 %
+IMPACT_DRIFT = 0.10
+
+
+def fold(text):
+    """Lowercase and strip diacritics so "Fès" matches "fes" and "Ouarzazate" matches "ouarzazate"."""
+    text = str(text).casefold()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize("NFKD", text).translate(_SPECIAL_FOLDS)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall(fold(text)) if t not in STOP_WORDS]
+
+
+def _field_text(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+
+class SearchIndex:
+    """Inverted index of weighted term frequencies, ranked with BM25.
+
+    Documents are added incrementally; nothing is ever rebuilt. The vocabulary
+    is also kept as a sorted list so the last query word can be expanded as a
+    prefix (autocomplete) with two bisects.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}  # term -> {doc: weighted tf}
+        self._vocabulary = []  # sorted terms, for prefix lookups
+        self._doc_ids = []  # doc -> experience id
+        self._doc_of = {}  # experience id -> doc
+        self._doc_len = []
+        self._total_len = 0.0
+        self._impacts = {}  # term -> (docs by descending impact, impact per doc, avg_len at build)
+        self._lock = RWLock("search_index")
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def __contains__(self, experience_id):
+        return experience_id in self._doc_of
+
+    @staticmethod
+    def _frequencies(experience):
+        frequencies = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for term, count in Counter(tokenize(_field_text(experience.get(field)))).items():
+                frequencies[term] = frequencies.get(term, 0.0) + weight * count
+        return frequencies
+
+    def add(self, experience):
+        """Index one experience; re-adding an id is a no-op."""
+        frequencies = self._frequencies(experience)
+        with self._lock.write():
+            if experience["id"] in self._doc_of:
+                return
+            doc = len(self._doc_ids)
+            self._doc_ids.append(experience["id"])
+            self._doc_of[experience["id"]] = doc
+            length = sum(frequencies.values())
+            self._doc_len.append(length)
+            self._total_len += length
+            for term, tf in frequencies.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._vocabulary, term)
+                postings[doc] = tf
+                cached = self._impacts.get(term)
+                if cached is not None:
+                    ranked, impact, avg_len = cached
+                    impact[doc] = self._impact(tf, length, avg_len)
+                    bisect.insort(ranked, doc, key=lambda d: (-impact[d], d))
+
+    def add_many(self, experiences):
+        """Index a batch under a single write lock.
+
+        New terms are merged into the vocabulary with one sort, and cached
+        impact lists of the touched terms are dropped (rebuilt on the next
+        query) instead of being patched document by document.
+        """
+        prepared = [(experience["id"], self._frequencies(experience)) for experience in experiences]
+        with self._lock.write():
+            new_terms = []
+            touched = set()
+            for experience_id, frequencies in prepared:
+                if experience_id in self._doc_of:
+                    continue
+                doc = len(self._doc_ids)
+                self._doc_ids.append(experience_id)
+                self._doc_of[experience_id] = doc
+                length = sum(frequencies.values())
+                self._doc_len.append(length)
+                self._total_len += length
+                for term, tf in frequencies.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = {}
+                        new_terms.append(term)
+                    postings[doc] = tf
+                touched.update(frequencies)
+            if new_terms:
+                self._vocabulary.extend(new_terms)
+                self._vocabulary.sort()
+            for term in touched & self._impacts.keys():
+                del self._impacts[term]
+
+    def expand_prefix(self, prefix, limit=MAX_PREFIX_EXPANSIONS):
+        """Indexed terms starting with ``prefix``, most frequent first."""
+        with self._lock.read():
+            return self._expand_prefix(prefix, limit)
+
+    def search(self, query, limit=20, offset=0, prefix=True):
+        """Return ``(experience_ids, total)`` ranked by BM25.
+
+        Every query word must match (AND semantics). With ``prefix`` the last
+        word also matches any indexed term it is a prefix of, which is what the
+        search box uses for autocomplete.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return [], 0
+        with self._lock.read():
+            if not self._doc_ids:
+                return [], 0
+            groups = [[t] if t in self._postings else [] for t in terms[:-1]]
+            last = terms[-1]
+            if prefix:
+                groups.append(self._expand_prefix(last, MAX_PREFIX_EXPANSIONS))
+            else:
+                groups.append([last] if last in self._postings else [])
+            if not all(groups):
+                return [], 0
+
+            # Intersect starting from the rarest group so we touch as few docs as possible
+            group_docs = [self._union(group) for group in groups]
+            group_docs.sort(key=len)
+            candidates = group_docs[0].keys() if isinstance(group_docs[0], dict) else group_docs[0]
+            for docs in group_docs[1:]:
+                candidates = candidates & docs.keys() if isinstance(docs, dict) else candidates & docs
+                if not candidates:
+                    return [], 0
+            total = len(candidates)
+
+            terms = [term for group in groups for term in group]
+            if len(terms) == 1:
+                ranked = self._impact_list(terms[0])[0]
+                return [self._doc_ids[doc] for doc in ranked[offset:offset + limit]], total
+            if total <= EXHAUSTIVE_SCORING_LIMIT:
+                top = self._score_all(terms, candidates, offset + limit)
+            else:
+                top = self._threshold_top_k(terms, candidates, offset + limit)
+            return [self._doc_ids[doc] for doc in top[offset:]], total
+
+    def _score_all(self, terms, candidates, k):
+        lists = [(self._idf(len(self._postings[t])), self._impact_list(t)[1]) for t in terms]
+        scores = dict.fromkeys(candidates, 0.0)
+        for idf, impact in lists:
+            for doc in candidates:
+                value = impact.get(doc)
+                if value is not None:
+                    scores[doc] += idf * value
+        top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [doc for doc, _ in top]
+
+    def _threshold_top_k(self, terms, candidates, k):
+        """Fagin's threshold algorithm over the impact-ordered posting lists.
+
+        Walks every term's list in lockstep; a doc's full score comes from the
+        impact maps. It stops as soon as the k-th best score seen beats the best
+        score any unseen doc could still reach, which for the usual skewed
+        distributions happens after a few hundred entries rather than all of them.
+        """
+        lists = []
+        for term in terms:
+            ranked, impact, _ = self._impact_list(term)
+            lists.append((self._idf(len(ranked)), ranked, impact, len(ranked)))
+        weights = [(idf, impact) for idf, _, impact, _ in lists]
+        longest = max(size for _, _, _, size in lists)
+        heap = []
+        seen = set()
+        for depth in range(longest):
+            threshold = 0.0
+            for idf, ranked, impact, size in lists:
+                if depth >= size:
+                    continue
+                doc = ranked[depth]
+                threshold += idf * impact[doc]
+                if doc in seen or doc not in candidates:
+                    continue
+                seen.add(doc)
+                score = 0.0
+                for w, imp in weights:
+                    value = imp.get(doc)
+                    if value is not None:
+                        score += w * value
+                entry = (score, -doc)
+                if len(heap) < k:
+                    heapq.heappush(heap, entry)
+                elif entry > heap[0]:
+                    heapq.heapreplace(heap, entry)
+            if len(heap) == k and heap[0][0] >= threshold:
+                break
+        return [-neg_doc for _, neg_doc in sorted(heap, reverse=True)]
+
+    def _idf(self, df):
+        n_docs = len(self._doc_ids)
+        return math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def _impact(self, tf, doc_len, avg_len):
+        """BM25 contribution of one posting, without the idf factor."""
+        norm = self.k1 * (1.0 - self.b + self.b * doc_len / avg_len)
+        return tf * (self.k1 + 1.0) / (tf + norm)
+
+    def _impact_list(self, term):
+        """``(docs, impact, avg_len)`` for ``term``, docs ordered by descending impact.
+
+        Built lazily on first use, then kept up to date by ``add``; it is only
+        rebuilt once the average document length has drifted noticeably.
+        """
+        avg_len = self._total_len / len(self._doc_ids) or 1.0
+        cached = self._impacts.get(term)
+        if cached is not None and abs(avg_len / cached[2] - 1.0) <= IMPACT_DRIFT:
+            return cached
+        doc_len = self._doc_len
+        impact = {
+            doc: self._impact(tf, doc_len[doc], avg_len) for doc, tf in self._postings[term].items()
+        }
+        ranked = sorted(impact, key=lambda doc: (-impact[doc], doc))
+        self._impacts[term] = cached = (ranked, impact, avg_len)
+        return cached
+
+    def _expand_prefix(self, prefix, limit):
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = bisect.bisect_left(vocabulary, prefix + "\U0010ffff", start)
+        if end - start <= limit:
+            return vocabulary[start:end]
+        return heapq.nlargest(limit, vocabulary[start:end], key=lambda t: len(self._postings[t]))
+
+    def _union(self, terms):
+        if len(terms) == 1:
+            return self._postings[terms[0]]
+        docs = set()
+        for term in terms:
+            docs.update(self._postings[term])
+        return docs
@@ -5,49 +5,232 @@
 # Endpoint pour créer une réservation (placé à la fin pour éviter les erreurs de portée)
 
 
+import asyncio
+import functools
+import hashlib
+import logging
 import os
+import time
 import uuid
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
-from dotenv import load_dotenv
-from fastapi import FastAPI, APIRouter, Depends, Request, HTTPException, status, Header
-from starlette.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, JSONResponse
-import threading
+from fastapi import FastAPI, APIRouter, Depends, Request, Response, HTTPException, status, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
+from token_store import TokenStore, token_key
+from access_tokens import AccessTokens, new_secret
+from change_feed import ChangeFeed
+from repository import DuplicateEmailError, DuplicateReviewError, create_repository
+from availability_store import ACTIVE_STATUSES
+from experience_store import to_number
+from user_store import normalize_email
+from search_index import SearchIndex
+from geo_index import GeoIndex, parse_coordinates
+from rating_aggregates import RATINGS, RatingAggregates
+from message_hub import TOKEN_EXPIRED, MessageHub
+from message_store import new_conversation
+from response_cache import ResponseCache, encode_json, etag_matches
+from idempotency import IN_FLIGHT, MISMATCH, IdempotencyCache
+from passwords import PasswordHasher
+from responses import FastJSONResponse, FastJSONRoute, dumps, loads
+from pagination import clamp_limit, decode_cursor, encode_cursor
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Metrics, MetricsMiddleware, labels
 
 
 
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
-
+if (ROOT_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(ROOT_DIR / '.env')
 
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Routes hors de /api (redirection, santé, métriques) ; l'application est assemblée par create_app()
+root_router = APIRouter(route_class=FastJSONRoute)
+api_router = APIRouter(prefix="/api", route_class=FastJSONRoute)
 
 
 # Redirection explicite de /api vers /api/
-@app.get("/api", include_in_schema=False)
+@root_router.get("/api", include_in_schema=False)
 async def redirect_api():
     return RedirectResponse(url="/api/")
 
 
-# Log de démarrage pour vérifier les routes exposées (factorisé)
-@app.on_event("startup")
-async def log_routes():
-    print("--- ROUTES REGISTERED ---")
-    for route in app.routes:
-        print(f"{route.path} -> {route.name}")
-    print("------------------------")
 
-api_router = APIRouter(prefix="/api")
+
+# Stockage : "memory" (dicts en mémoire), "sqlite" (fichier WAL) ou "mongo" (Motor)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "memory")
+repository = create_repository(
+    STORAGE_BACKEND,
+    path=os.environ.get("SQLITE_PATH", str(ROOT_DIR / "rihla.db")),
+    url=os.environ.get("MONGO_URL", "mongodb://localhost:27017"),
+    db_name=os.environ.get("DB_NAME", "rihla"),
+    max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", 100)),
+    # Mémoire persistante : journal d'écriture + snapshots dans MEMORY_DATA_DIR (vide = rien n'est gardé)
+    data_dir=os.environ.get("MEMORY_DATA_DIR"),
+    sync=os.environ.get("WAL_SYNC", "fsync") != "none",
+    commit_delay=float(os.environ.get("WAL_COMMIT_DELAY_MS", 0)) / 1000,
+    snapshot_interval=float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", 300)),
+)
+users_db = repository.users
+experiences_db = repository.experiences
+bookings_db = repository.bookings
+availability_db = repository.availability
+reviews_db = repository.reviews
+messages_db = repository.messages
+search_index = SearchIndex()
+# Index spatial des expériences qui ont des coordonnées (grille de GEO_CELL_DEGREES degrés)
+geo_index = GeoIndex(cell_degrees=float(os.environ.get("GEO_CELL_DEGREES", 0.05)))
+# Notes moyennes par expérience et par hôte, tenues à jour à chaque écriture d'avis
+rating_aggregates = RatingAggregates()
+
+# Réponses encodées des listes d'expériences, invalidées à chaque écriture du catalogue
+response_cache = ResponseCache(max_entries=int(os.environ.get("RESPONSE_CACHE_MAX", 1024)))
+
+# Connexions WebSocket de la messagerie : une file bornée de WS_QUEUE_SIZE événements chacune
+message_hub = MessageHub(queue_size=int(os.environ.get("WS_QUEUE_SIZE", 256)))
+
+# Plusieurs workers : chacun suit le journal des changements du stockage partagé
+change_feed = ChangeFeed(repository, interval=float(os.environ.get("CHANGE_POLL_INTERVAL", 0.05)))
+
+
+async def index_new_experiences(keys):
+    missing = [key for key in keys if key not in search_index]
+    if missing:
+        response_cache.invalidate()
+    experiences = await experiences_db.get_many(missing)
+    search_index.add_many(experiences)
+    geo_index.add_many(experiences)
+
+
+async def refresh_ratings(keys):
+    # Relit l'état courant de chaque avis : rejouer un changement déjà appliqué ne modifie rien
+    changed = False
+    for key in keys:
+        changed |= rating_aggregates.apply(key, await reviews_db.get(key))
+    if changed:
+        response_cache.invalidate()
+
+
+async def publish_new_messages(keys):
+    # Messages écrits par les autres workers ; ceux de ce worker sont déjà publiés
+    if not len(message_hub):
+        return
+    for key in keys:
+        if message_hub.seen(key):
+            continue
+        message = await messages_db.get_message(key)
+        if message is not None:
+            publish_message(await messages_db.get_conversation(message["conversationId"]), message)
+
+
+async def publish_read_receipts(keys):
+    if not len(message_hub):
+        return
+    for key in keys:
+        conversation = await messages_db.get_conversation(key)
+        if conversation is not None:
+            for user_id, seq in conversation["readSeq"].items():
+                if seq:
+                    publish_read(conversation, user_id)
+
+
+async def drop_revoked_tokens(keys):
+    for key in keys:
+        token_store.revoke_key(key)
+        access_tokens.revoke_session(key)
+        message_hub.close_session(key)
+
+
+change_feed.subscribe("experiences", index_new_experiences)
+change_feed.subscribe("reviews", refresh_ratings)
+change_feed.subscribe("messages", publish_new_messages)
+change_feed.subscribe("conversations", publish_read_receipts)
+change_feed.subscribe("tokens", drop_revoked_tokens)
+
+
+async def startup():
+    """The only startup hook: open storage, rebuild the in-memory indexes and ratings, follow the change feed."""
+    started = time.perf_counter()
+    await repository.connect()
+    await flag_admins()
+    if not repository.shared and int(os.environ.get("WEB_CONCURRENCY", 1)) > 1:
+        logger.warning(
+            "STORAGE_BACKEND=%s is process-local: use sqlite or mongo with several workers", repository.name
+        )
+    last_change = await repository.last_change()
+    # L'index de recherche vit en mémoire : on le reconstruit depuis le stockage persistant, par lots
+    batch = []
+    async for experience in experiences_db.scan():
+        batch.append(experience)
+        if len(batch) >= 1000:
+            search_index.add_many(batch)
+            geo_index.add_many(batch)
+            batch = []
+    search_index.add_many(batch)
+    geo_index.add_many(batch)
+    async for review in reviews_db.scan():
+        rating_aggregates.apply(review["id"], review)
+    if repository.shared:
+        await change_feed.start(from_seq=last_change)
+    logger.info(
+        "Rihla API ready in %.0f ms (storage=%s, %d experiences indexed, %d reviews)",
+        (time.perf_counter() - started) * 1000, repository.name, len(search_index), len(rating_aggregates),
+    )
+
+
+async def shutdown():
+    message_hub.close_all()
+    await change_feed.stop()
+    await repository.close()
+    password_hasher.close()
+
+# Jetons de rafraîchissement : opaques, révocables, partagés entre workers via le stockage
+token_store = TokenStore(
+    ttl_seconds=int(os.environ.get("REFRESH_TOKEN_TTL_SECONDS", os.environ.get("TOKEN_TTL_SECONDS", 30 * 24 * 3600))),
+    max_tokens=int(os.environ.get("TOKEN_STORE_MAX", 100_000)),
+)
+
+# Jetons d'accès : JWT signés, vérifiés sans lire users_db
+JWT_SECRET = os.environ.get("JWT_SECRET")
+if not JWT_SECRET:
+    logger.warning(
+        "JWT_SECRET is not set: using a random per-process secret (tokens will not work across workers or restarts)"
+    )
+access_tokens = AccessTokens(
+    JWT_SECRET or new_secret(),
+    ttl_seconds=int(os.environ.get("ACCESS_TOKEN_TTL_SECONDS", 3600)),
+    cache_size=int(os.environ.get("ACCESS_TOKEN_CACHE_MAX", 50_000)),
+)
+
+
+# Hachage des mots de passe (passlib) sur un pool de threads borné, hors de la boucle
+password_hasher = PasswordHasher(
+    scheme=os.environ.get("PASSWORD_SCHEME", "pbkdf2_sha256"),
+    rounds=int(os.environ["PASSWORD_ROUNDS"]) if os.environ.get("PASSWORD_ROUNDS") else None,
+    workers=int(os.environ["PASSWORD_HASH_WORKERS"]) if os.environ.get("PASSWORD_HASH_WORKERS") else None,
+)
 
 
+async def issue_tokens(user):
+    """A new session for ``user``: a refresh token plus an access token bound to it."""
+    refresh_token, expires_at = token_store.issue(user["id"])
+    session = token_key(refresh_token)
+    if repository.shared:
+        await repository.tokens.insert(session, user["id"], expires_at)
+    access_token, _ = access_tokens.issue({**user, "isAdmin": admin_account(user)}, session)
+    return {
+        "accessToken": access_token,
+        "refreshToken": refresh_token,
+        "expiresIn": access_tokens.ttl_seconds
+    }
 
 
-# Thread-safe in-memory DBs
-users_db = {}
-experiences_db = {}
-bookings_db = {}
-db_lock = threading.Lock()
+async def revoke_session(session):
+    token_store.revoke_key(session)
+    access_tokens.revoke_session(session)
+    message_hub.close_session(session)
+    if repository.shared:
+        await repository.tokens.delete(session)
 
 
 @api_router.get("/", tags=["root"])
@@ -63,19 +246,57 @@ async def root():
 
 # Health check at root (not under /api)
 
-@app.get("/health")
+@root_router.get("/health")
 async def root_health_check():
     return {"status": "OK", "message": "Rihla Backend API is running"}
 
 
+# Métriques Prometheus ; METRICS_TOKEN (facultatif) protège l'endpoint par un jeton Bearer
+metrics = Metrics()
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+
+@root_router.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: str = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    sizes = await repository.sizes()
+    responses = response_cache.stats()
+    idempotency = idempotency_cache.stats()
+    gauges = [
+        ("rihla_collection_documents", "Documents per storage collection.",
+         {labels(collection=name): count for name, count in sizes.items()}),
+        ("rihla_search_index_documents", "Experiences in the search index.", {"": len(search_index)}),
+        ("rihla_geo_index_documents", "Experiences with coordinates in the spatial index.", {"": len(geo_index)}),
+        ("rihla_ws_connections", "Open messaging WebSocket connections.", {"": len(message_hub)}),
+        ("rihla_ws_queued_events", "Events waiting in the WebSocket send queues.", {"": message_hub.queued()}),
+        ("rihla_cache_entries", "Entries held by each in-process cache.", {
+            labels(cache="responses"): responses["entries"],
+            labels(cache="idempotency"): idempotency["entries"],
+            labels(cache="access_tokens"): len(access_tokens),
+            labels(cache="refresh_tokens"): len(token_store),
+        }),
+        ("rihla_cache_bytes", "Body bytes held by each in-process cache.", {
+            labels(cache="responses"): responses["bytes"],
+            labels(cache="idempotency"): idempotency["bytes"],
+        }),
+    ]
+    return Response(metrics.render(gauges), media_type=METRICS_CONTENT_TYPE)
+
+
 @api_router.get("/health", tags=["health"])
 async def api_health_check():
     return {"status": "OK", "message": "Rihla Backend API is running"}
 
 
+# Champs conservés à l'inscription : le reste du corps posté n'est pas stocké
+REGISTER_FIELDS = ["firstName", "lastName", "email", "password", "phoneNumber", "dateOfBirth", "avatar", "bio", "isHost"]
+
+
 @api_router.post("/auth/register", status_code=201, tags=["auth"])
 async def register(request: Request):
     user = await request.json()
+    user = {field: user[field] for field in REGISTER_FIELDS if field in user}
     # Ajouter isHost à False immédiatement après récupération du JSON
     if "isHost" not in user:
         user["isHost"] = False
@@ -83,11 +304,20 @@ async def register(request: Request):
     for field in required:
         if field not in user or not user[field]:
             raise HTTPException(status_code=422, detail=f"Missing field: {field}")
+    if not isinstance(user["password"], str):
+        raise HTTPException(status_code=422, detail="password must be a string")
+    if reserved_email(user["email"]):
+        raise HTTPException(status_code=403, detail="This email address is reserved")
     user_id = str(uuid.uuid4())
     user["id"] = user_id
-    with db_lock:
-        users_db[user["email"]] = user
-    token = f"token-{user_id}"
+    user["createdAt"] = datetime.now(timezone.utc).isoformat()
+    # Seul le hachage est conservé, sous la même clé "password"
+    user["password"] = await password_hasher.hash(user["password"])
+    try:
+        await users_db.insert(user)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=409, detail="Email already registered")
+    tokens = await issue_tokens(user)
     return {
         "success": True,
         "data": {
@@ -98,9 +328,7 @@ async def register(request: Request):
                 "email": user["email"],
             "isHost": user["isHost"]
             },
-            "tokens": {
-                "accessToken": token
-            }
+            "tokens": tokens
         }
     }
 
@@ -108,11 +336,17 @@ async def register(request: Request):
 @api_router.post("/auth/login", tags=["auth"])
 async def login(request: Request):
     data = await request.json()
-    with db_lock:
-        user_dict = users_db.get(data.get("email"))
-    if not user_dict or user_dict.get("password") != data.get("password"):
+    user_dict = await users_db.get_by_email(data.get("email"))
+    password = data.get("password")
+    if not isinstance(password, str):
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = f"token-{user_dict['id']}"
+    ok, new_hash = await password_hasher.verify(password, user_dict.get("password") if user_dict else None)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash is not None:
+        # Coût ou algorithme changé (ou ancien mot de passe en clair) : on remplace le hachage
+        await users_db.update(user_dict["id"], {"password": new_hash})
+    tokens = await issue_tokens(user_dict)
     return {
         "success": True,
         "data": {
@@ -123,27 +357,100 @@ async def login(request: Request):
                 "email": user_dict["email"],
                 "isHost": user_dict["isHost"]
             },
-            "tokens": {
-                "accessToken": token
-            }
+            "tokens": tokens
         }
     }
 
-# Simulate token-based authentication
 
-def get_current_user(authorization: str = Header(None)):
+@api_router.post("/auth/refresh", tags=["auth"])
+async def refresh(request: Request):
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    refresh_token = data.get("refreshToken") if isinstance(data, dict) else None
+    if not isinstance(refresh_token, str) or not refresh_token:
+        raise HTTPException(status_code=422, detail="Missing refreshToken")
+    session = token_key(refresh_token)
+    user_id = token_store.resolve(refresh_token)
+    if user_id is None and repository.shared:
+        # Jeton émis par un autre worker : on le lit dans le stockage partagé
+        row = await repository.tokens.get(session)
+        if row is not None and row[1] > time.time():
+            user_id = row[0]
+    user = await users_db.get(user_id) if user_id else None
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    # Rotation : l'ancien jeton de rafraîchissement (et ses jetons d'accès) ne servent plus
+    await revoke_session(session)
+    return {
+        "success": True,
+        "data": {
+            "tokens": await issue_tokens(user)
+        }
+    }
+
+async def get_current_user(authorization: str = Header(None)):
+    """The caller, as described by its access token: ``{"id", "email", "isHost", "isAdmin", "session"}``."""
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
-    token = authorization.split(" ", 1)[1]
-    with db_lock:
-        for user in users_db.values():
-            if f"token-{user['id']}" == token:
-                return user
-    raise HTTPException(status_code=401, detail="Invalid token")
+    claims = access_tokens.verify(authorization.split(" ", 1)[1])
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return caller(claims)
+
+
+def caller(claims):
+    return {
+        "id": claims["sub"], "email": claims["email"], "isHost": claims["isHost"],
+        "isAdmin": claims.get("isAdmin", False), "session": claims["sid"],
+    }
+
+
+# Administrateurs : désignés par la configuration, jamais par le client. Le compte qui porte une
+# adresse d'ADMIN_EMAILS au démarrage reçoit isAdmin ; ces adresses ne peuvent plus être prises
+# à l'inscription ni par une modification de profil.
+ADMIN_EMAILS = {normalize_email(e) for e in os.environ.get("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+
+def reserved_email(email):
+    return normalize_email(email) in ADMIN_EMAILS
+
+
+async def flag_admins():
+    """Set ``isAdmin`` on the accounts that hold an ``ADMIN_EMAILS`` address (at startup)."""
+    for email in ADMIN_EMAILS:
+        user = await users_db.get_by_email(email)
+        if user is not None and not user.get("isAdmin"):
+            await users_db.update(user["id"], {"isAdmin": True})
+
+
+def admin_account(user):
+    """True for a stored user flagged by ``flag_admins`` whose address is still configured."""
+    return user.get("isAdmin") is True and reserved_email(user.get("email"))
+
+
+def is_admin(user):
+    """True if the caller's access token carries the admin flag."""
+    return user.get("isAdmin") is True
+
+
+async def get_current_admin(user=Depends(get_current_user)):
+    if not is_admin(user):
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+@api_router.post("/auth/logout", tags=["auth"])
+async def logout(user=Depends(get_current_user)):
+    await revoke_session(user["session"])
+    return {"success": True, "data": {"message": "Logged out"}}
 
 
 @api_router.get("/auth/me", tags=["auth"])
 async def get_me(user=Depends(get_current_user)):
+    # Le jeton ne porte que l'essentiel : le profil complet vient du stockage
+    user = await users_db.get(user["id"])
     user_data = None
     if user:
         user_data = {
@@ -165,7 +472,144 @@ async def get_me(user=Depends(get_current_user)):
 
 
 
+# Réponses rejouées pour les POST réessayés avec le même en-tête Idempotency-Key
+idempotency_cache = IdempotencyCache(
+    ttl_seconds=int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", 24 * 3600)),
+    max_entries=int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 10_000)),
+    max_bytes=int(os.environ.get("IDEMPOTENCY_MAX_BYTES", 16 * 1024 * 1024)),
+)
+
+
+def idempotent(status_code):
+    """Make a ``(request, user)`` POST handler replay its first response for a repeated ``Idempotency-Key``.
+
+    Keys are scoped to the user and the route. Only successful responses are
+    stored; a failed attempt can be retried with the same key.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def endpoint(request, user, **kwargs):
+            key = request.headers.get("idempotency-key")
+            if not key:
+                return await handler(request=request, user=user, **kwargs)
+            cache_key = (user["id"], request.method, request.url.path, key)
+            fingerprint = hashlib.blake2b(await request.body(), digest_size=16).digest()
+            stored = idempotency_cache.start(cache_key, fingerprint)
+            if stored is IN_FLIGHT:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+            if stored is MISMATCH:
+                raise HTTPException(status_code=422, detail="Idempotency-Key already used for a different request")
+            if stored is not None:
+                return Response(stored[1], status_code=stored[0], media_type="application/json",
+                                headers={"Idempotent-Replayed": "true"})
+            try:
+                content = await handler(request=request, user=user, **kwargs)
+            except BaseException:
+                idempotency_cache.abandon(cache_key)
+                raise
+            body = dumps(content)
+            idempotency_cache.finish(cache_key, fingerprint, status_code, body)
+            return Response(body, status_code=status_code, media_type="application/json")
+        return endpoint
+    return decorate
+
+
+@api_router.get("/admin/caches", tags=["admin"])
+async def get_cache_stats(admin=Depends(get_current_admin)):
+    return {
+        "success": True,
+        "data": {
+            "responses": response_cache.stats(),
+            "idempotency": idempotency_cache.stats(),
+            "accessTokens": access_tokens.stats(),
+            "refreshTokens": {"entries": len(token_store), "maxEntries": token_store.max_tokens}
+        }
+    }
+
+
+# Profilage échantillonné, désactivé par défaut : sans PROFILE_ENABLED=1 aucun middleware n'est installé
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "0") == "1"
+PROFILE_HEADER = os.environ.get("PROFILE_HEADER", "X-Rihla-Profile").lower().encode()
+profiler = None
+if PROFILE_ENABLED:
+    from profiler import Profiler
+    profiler = Profiler(
+        sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+        interval=float(os.environ.get("PROFILE_INTERVAL_MS", 5)) / 1000,
+        max_stacks=int(os.environ.get("PROFILE_MAX_STACKS", 10_000)),
+    )
+
+
+def profile_requested(scope):
+    """True when the request carries the profiling header and an admin's access token."""
+    headers = dict(scope["headers"])
+    if PROFILE_HEADER not in headers:
+        return False
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.startswith("Bearer "):
+        return False
+    claims = access_tokens.verify(authorization.split(" ", 1)[1])
+    return claims is not None and is_admin(claims)
+
+
+def require_profiler():
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler disabled")
+    return profiler
+
+
+@api_router.get("/admin/profile", tags=["admin"])
+async def get_profile_summary(admin=Depends(get_current_admin)):
+    active = require_profiler()
+    return {
+        "success": True,
+        "data": {
+            "sampleRate": active.sample_rate,
+            "intervalMs": active.interval * 1000,
+            "routes": active.summary()
+        }
+    }
+
+
+@api_router.get("/admin/profile/stacks", tags=["admin"])
+async def download_profile(route: str = None, admin=Depends(get_current_admin)):
+    """Collapsed stacks (flamegraph.pl / speedscope input), for one route template or all of them."""
+    body = require_profiler().collapsed(route)
+    return Response(
+        body, media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="rihla-profile.collapsed"'},
+    )
+
+
+@api_router.delete("/admin/profile", tags=["admin"])
+async def reset_profile(admin=Depends(get_current_admin)):
+    require_profiler().reset()
+    return {"success": True, "data": {"message": "Profile reset"}}
+
+
+EXPERIENCE_REQUIRED_FIELDS = ["title", "description", "category", "location", "price", "duration", "groupSize", "highlights", "images", "hostId"]
+
+
+def build_experience(exp, user, created_at):
+    """Validated copy of a posted experience with its server-side fields; raises ValueError."""
+    if not isinstance(exp, dict):
+        raise ValueError("Expected a JSON object")
+    exp_dict = exp.copy()
+    if not exp_dict.get("hostId"):
+        exp_dict["hostId"] = user["id"]
+    for field in EXPERIENCE_REQUIRED_FIELDS:
+        if field not in exp_dict or exp_dict[field] in [None, ""]:
+            raise ValueError(f"Missing field: {field}")
+    if exp_dict.get("coordinates") is not None:
+        lat, lng = parse_coordinates(exp_dict["coordinates"])
+        exp_dict["coordinates"] = {"lat": lat, "lng": lng}
+    exp_dict["id"] = str(uuid.uuid4())
+    exp_dict["createdAt"] = created_at
+    return exp_dict
+
+
 @api_router.api_route("/experiences", methods=["POST"], status_code=201, tags=["experiences"], include_in_schema=True)
+@idempotent(status_code=201)
 async def create_experience(request: Request, user=Depends(get_current_user)):
     if not user or not user.get("isHost"):
         raise HTTPException(status_code=403, detail="Only hosts can create experiences")
@@ -173,18 +617,14 @@ async def create_experience(request: Request, user=Depends(get_current_user)):
         exp = await request.json()
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON body")
-    if not exp.get("hostId"):
-        exp["hostId"] = user["id"]
-    required_fields = ["title", "description", "category", "location", "price", "duration", "groupSize", "highlights", "images", "hostId"]
-    for field in required_fields:
-        if field not in exp or exp[field] in [None, ""]:
-            raise HTTPException(status_code=422, detail=f"Missing field: {field}")
-    exp_id = str(uuid.uuid4())
-    exp_dict = exp.copy()
-    exp_dict["id"] = exp_id
-    exp_dict["hostId"] = exp["hostId"]
-    with db_lock:
-        experiences_db[exp_id] = exp_dict
+    try:
+        exp_dict = build_experience(exp, user, datetime.now(timezone.utc).isoformat())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    await experiences_db.insert(exp_dict)
+    search_index.add(exp_dict)
+    geo_index.add(exp_dict)
+    response_cache.invalidate()
     return {
         "success": True,
         "data": {
@@ -194,14 +634,342 @@ async def create_experience(request: Request, user=Depends(get_current_user)):
 
 
 
+# Import par lots : tableau JSON ou NDJSON (un objet par ligne)
+IMPORT_MAX_ITEMS = int(os.environ.get("IMPORT_MAX_ITEMS", 50_000))
+
+
+class _InvalidItem:
+    """Placeholder for an NDJSON line that is not valid JSON."""
+
+
+async def read_batch(request):
+    body = await request.body()
+    if "ndjson" in request.headers.get("content-type", ""):
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(loads(line))
+            except ValueError:
+                items.append(_InvalidItem)
+    else:
+        try:
+            items = loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=422, detail="Expected a JSON array")
+    if len(items) > IMPORT_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {IMPORT_MAX_ITEMS} items per batch")
+    return items
+
+
+def build_batch(items, build):
+    """Run ``build`` on every item; returns ``(valid records, per-item results)``."""
+    records, results = [], []
+    for index, item in enumerate(items):
+        try:
+            if item is _InvalidItem:
+                raise ValueError("Invalid JSON")
+            record = build(item)
+        except ValueError as exc:
+            results.append({"index": index, "success": False, "error": str(exc)})
+            continue
+        records.append(record)
+        results.append({"index": index, "success": True, "id": record["id"]})
+    return records, results
+
+
+def batch_response(records, results):
+    return {
+        "success": True,
+        "data": {
+            "created": len(records),
+            "failed": len(results) - len(records),
+            "results": results
+        }
+    }
+
+
+@api_router.post("/experiences/batch", tags=["experiences"])
+async def create_experiences_batch(request: Request, user=Depends(get_current_user)):
+    if not user.get("isHost"):
+        raise HTTPException(status_code=403, detail="Only hosts can create experiences")
+    items = await read_batch(request)
+    created_at = datetime.now(timezone.utc).isoformat()
+    records, results = build_batch(items, lambda exp: build_experience(exp, user, created_at))
+    if records:
+        await experiences_db.insert_many(records)
+        search_index.add_many(records)
+        geo_index.add_many(records)
+        response_cache.invalidate()
+    return batch_response(records, results)
+
+
+def decode_key(cursor, shape):
+    """``decode_cursor`` plus a check that the key holds values of the types in ``shape``."""
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after is not None and (
+        len(after) != len(shape)
+        or any(isinstance(value, bool) or not isinstance(value, kind) for value, kind in zip(after, shape))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return after
+
+
+async def cached_response(request, build):
+    """Serve ``await build()`` from the response cache, with ETag / If-None-Match support."""
+    key = response_cache.key(request.url.path, request.query_params)
+    entry = response_cache.get(key)
+    if entry is None:
+        version = response_cache.version
+        entry = response_cache.put(key, encode_json(await build()), version)
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 @api_router.get("/experiences", tags=["experiences"])
-async def get_experiences():
-    with db_lock:
-        experiences = list(experiences_db.values())
+async def get_experiences(
+    request: Request,
+    category: str = None,
+    location: str = None,
+    minPrice: float = None,
+    maxPrice: float = None,
+    groupSize: int = None,
+    sortBy: str = "createdAt",
+    order: str = "desc",
+    limit: int = 20,
+    cursor: str = None,
+):
+    if sortBy not in ("createdAt", "price"):
+        raise HTTPException(status_code=422, detail="sortBy must be 'createdAt' or 'price'")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=422, detail="order must be 'asc' or 'desc'")
+    # Clé du curseur : (seq,) par date de création, (prix, seq) par prix
+    after = decode_key(cursor, ((int, float), int) if sortBy == "price" else (int,))
+
+    async def build():
+        experiences, next_key = await experiences_db.query(
+            category=category,
+            location=location,
+            min_price=minPrice,
+            max_price=maxPrice,
+            group_size=groupSize,
+            sort_by=sortBy,
+            descending=order == "desc",
+            after=after,
+            limit=clamp_limit(limit),
+        )
+        return {
+            "success": True,
+            "data": {
+                "experiences": rating_aggregates.with_ratings(experiences),
+                "nextCursor": encode_cursor(next_key)
+            }
+        }
+    return await cached_response(request, build)
+
+
+@api_router.get("/experiences/search", tags=["experiences"])
+async def search_experiences(request: Request, q: str = "", limit: int = 20, cursor: str = None, prefix: bool = True):
+    after = decode_key(cursor, (int,))
+    if after is not None and after[0] < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    offset = after[0] if after else 0
+    limit = clamp_limit(limit)
+
+    async def build():
+        ids, total = search_index.search(q, limit=limit, offset=offset, prefix=prefix)
+        experiences = await experiences_db.get_many(ids)
+        next_offset = offset + limit
+        return {
+            "success": True,
+            "data": {
+                "experiences": rating_aggregates.with_ratings(experiences),
+                "total": total,
+                "nextCursor": encode_cursor((next_offset,)) if next_offset < total else None
+            }
+        }
+    return await cached_response(request, build)
+
+
+@api_router.get("/experiences/nearby", tags=["experiences"])
+async def nearby_experiences(lat: float, lng: float, radius: float = None, limit: int = 20):
+    """Experiences nearest to ``lat``/``lng``, optionally within ``radius`` km, each with its ``distanceKm``."""
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise HTTPException(status_code=422, detail="lat must be within [-90, 90] and lng within [-180, 180]")
+    if radius is not None and radius <= 0:
+        raise HTTPException(status_code=422, detail="radius must be a positive number of kilometres")
+    matches = geo_index.nearby(lat, lng, radius_km=radius, limit=clamp_limit(limit))
+    by_id = {exp["id"]: exp for exp in await experiences_db.get_many([experience_id for experience_id, _ in matches])}
+    experiences = [
+        {**by_id[experience_id], "distanceKm": round(distance, 3)}
+        for experience_id, distance in matches if experience_id in by_id
+    ]
+    experiences = rating_aggregates.with_ratings(experiences)
     return {
         "success": True,
         "data": {
-            "experiences": experiences
+            "experiences": experiences,
+            "count": len(experiences)
+        }
+    }
+
+
+# Exports NDJSON : une page du stockage par morceau envoyé, mémoire bornée
+EXPORT_BATCH = int(os.environ.get("EXPORT_BATCH", 500))
+
+
+def parse_since(since):
+    """``since`` as an ISO-8601 UTC string comparable with ``createdAt`` (accepts epoch seconds too)."""
+    if not since:
+        return None
+    try:
+        try:
+            moment = datetime.fromtimestamp(float(since), timezone.utc)
+        except ValueError:
+            moment = datetime.fromisoformat(since.replace("Z", "+00:00"))
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=422, detail="since must be an ISO-8601 timestamp or epoch seconds")
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+def ndjson_export(collection, since, cursor, project=None):
+    """Stream ``collection`` as newline-delimited JSON.
+
+    Each batch of records is followed by a ``{"nextCursor": ...}`` line: pass
+    the last one received back as ``cursor`` (with the same ``since``) to resume
+    an interrupted export. The stream ends with ``{"nextCursor": null}``.
+    """
+    since = parse_since(since)
+    # Vérifié avant l'envoi des en-têtes : une erreur dans le flux couperait la réponse sans statut
+    after = decode_key(cursor, (int,))
+
+    async def lines():
+        key = after
+        while True:
+            items, key = await collection.export_page(after=key, since=since, limit=EXPORT_BATCH)
+            if project is not None:
+                items = map(project, items)
+            chunk = b"".join(dumps(item) + b"\n" for item in items)
+            yield chunk + dumps({"nextCursor": encode_cursor(key)}) + b"\n"
+            if key is None:
+                return
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@api_router.get("/experiences/export", tags=["experiences"])
+async def export_experiences(since: str = None, cursor: str = None):
+    return ndjson_export(experiences_db, since, cursor)
+
+
+@api_router.get("/bookings/export", tags=["bookings"])
+async def export_bookings(since: str = None, cursor: str = None, admin=Depends(get_current_admin)):
+    return ndjson_export(bookings_db, since, cursor)
+
+
+def export_user(user):
+    return {k: v for k, v in user.items() if k != "password"}
+
+
+@api_router.get("/users/export", tags=["users"])
+async def export_users(since: str = None, cursor: str = None, admin=Depends(get_current_admin)):
+    return ndjson_export(users_db, since, cursor, project=export_user)
+
+
+# Calendrier de disponibilité : au plus un an par requête
+AVAILABILITY_MAX_DAYS = 366
+
+
+def capacity_of(experience):
+    """Seats per day for an experience (its ``groupSize``), or None if it has no usable limit."""
+    capacity = to_number(experience.get("groupSize"))
+    return int(capacity) if capacity is not None else None
+
+
+@api_router.get("/experiences/{experience_id}/availability", tags=["experiences"])
+async def get_availability(
+    experience_id: str,
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+):
+    experience = await experiences_db.get(experience_id)
+    if experience is None:
+        raise HTTPException(status_code=404, detail="Experience not found")
+    try:
+        first = date.fromisoformat(start) if start else datetime.now(timezone.utc).date()
+        last = date.fromisoformat(end) if end else first + timedelta(days=30)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="from and to must be ISO dates (YYYY-MM-DD)")
+    if last < first or (last - first).days >= AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"to must be after from, at most {AVAILABILITY_MAX_DAYS} days later")
+    capacity = capacity_of(experience)
+    booked = await availability_db.booked(experience_id, first.isoformat(), last.isoformat())
+    days = []
+    for offset in range((last - first).days + 1):
+        day = (first + timedelta(days=offset)).isoformat()
+        seats = booked.get(day, 0)
+        days.append({
+            "date": day,
+            "booked": seats,
+            "available": max(0, capacity - seats) if capacity is not None else None
+        })
+    return {
+        "success": True,
+        "data": {
+            "experienceId": experience_id,
+            "capacity": capacity,
+            "days": days
+        }
+    }
+
+
+# Champs modifiables via PUT /users/profile
+PROFILE_FIELDS = ["firstName", "lastName", "email", "phoneNumber", "dateOfBirth", "avatar", "bio"]
+
+
+@api_router.put("/users/profile", tags=["users"])
+async def update_profile(request: Request, user=Depends(get_current_user)):
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail="Expected a JSON object")
+    changes = {k: v for k, v in data.items() if k in PROFILE_FIELDS}
+    for field in ["firstName", "lastName", "email"]:
+        if field in changes and not changes[field]:
+            raise HTTPException(status_code=422, detail=f"Missing field: {field}")
+    if "email" in changes and reserved_email(changes["email"]):
+        current = await users_db.get(user["id"])
+        if current is None or normalize_email(current["email"]) != normalize_email(changes["email"]):
+            raise HTTPException(status_code=403, detail="This email address is reserved")
+    try:
+        updated = await users_db.update(user["id"], changes)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=409, detail="Email already registered")
+    if updated is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {
+        "success": True,
+        "data": {
+            "user": {
+                "id": updated["id"],
+                "firstName": updated["firstName"],
+                "lastName": updated["lastName"],
+                "email": updated["email"],
+                "isHost": updated.get("isHost", False)
+            }
         }
     }
 
@@ -209,17 +977,18 @@ async def get_experiences():
 @api_router.get("/users/{user_id}", tags=["users"])
 async def get_user_profile(user_id: str):
     user_data = None
-    with db_lock:
-        for user in users_db.values():
-            if user["id"] == user_id:
-                user_data = {
-                    "id": user.get("id"),
-                    "firstName": user.get("firstName"),
-                    "lastName": user.get("lastName"),
-                    "email": user.get("email"),
-                    "isHost": user.get("isHost", False)
-                }
-                break
+    user = await users_db.get(user_id)
+    if user is not None:
+        ratings = rating_aggregates.host(user_id)
+        user_data = {
+            "id": user.get("id"),
+            "firstName": user.get("firstName"),
+            "lastName": user.get("lastName"),
+            "email": user.get("email"),
+            "isHost": user.get("isHost", False),
+            "rating": ratings["rating"],
+            "reviews_count": ratings["review_count"]
+        }
     return {
         "success": True,
         "data": {"user": user_data}
@@ -229,91 +998,550 @@ async def get_user_profile(user_id: str):
 
 
 @api_router.get("/bookings/my-bookings", tags=["bookings"])
-async def get_my_bookings(user=Depends(get_current_user)):
+async def get_my_bookings(
+    user=Depends(get_current_user),
+    limit: int = 20,
+    cursor: str = None,
+    order: str = "asc",
+):
     if user is None or "id" not in user:
         raise HTTPException(status_code=401, detail="Missing user token")
-    user_id = user["id"]
-    with db_lock:
-        user_bookings = [b for b in bookings_db.values() if b.get("userId") == user_id]
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=422, detail="order must be 'asc' or 'desc'")
+    # Clé du curseur (date, seq, id) : vérifiée ici pour que tous les stockages répondent pareil
+    after = decode_key(cursor, (str, int, str))
+    if after is not None and after[0]:
+        try:
+            date.fromisoformat(after[0])
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    user_bookings, next_key = await bookings_db.for_user(
+        user["id"], after=after, limit=clamp_limit(limit), descending=order == "desc"
+    )
     return {
         "success": True,
         "data": {
-            "bookings": user_bookings
+            "bookings": user_bookings,
+            "nextCursor": encode_cursor(next_key)
         }
     }
 
-# --- AUTRES ENDPOINTS ---
-
-# Endpoint pour récupérer les réservations de l'utilisateur connecté (à la fin du fichier)
 
+def build_booking(data, user_id, created_at, trusted=False):
+    """Booking record for a posted body; raises ValueError if it is not usable.
 
+    The status is set here: only a ``trusted`` caller (the admin import) may
+    bring its own, otherwise a cancelled booking would skip the capacity check.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    status = data.get("status", "confirmed")
+    if not trusted and status != "confirmed":
+        raise ValueError("status is set by the server")
+    if not isinstance(status, str) or not status:
+        raise ValueError("status must be a non-empty string")
+    if "experienceId" not in data or not data["experienceId"]:
+        raise ValueError("Missing experienceId")
+    try:
+        day = date.fromisoformat(str(data.get("date", "2025-08-26"))).isoformat()
+    except ValueError:
+        raise ValueError("date must be an ISO date (YYYY-MM-DD)")
+    guests = data.get("guests", 1)
+    if isinstance(guests, bool) or not isinstance(guests, int) or guests < 1:
+        raise ValueError("guests must be a positive integer")
+    return {
+        "id": str(uuid.uuid4()),
+        "userId": user_id,
+        "experienceId": data["experienceId"],
+        "date": day,
+        "guests": guests,
+        "status": status,
+        "createdAt": created_at
+    }
 
-# Log de démarrage pour vérifier les routes
-@app.on_event("startup")
-async def log_routes():
-    print("--- ROUTES REGISTERED ---")
-    for route in app.routes:
-        print(f"{route.path} -> {route.name}")
-    print("------------------------")
 
+async def reserve_seats(booking, experience):
+    """Take the seats ``booking`` needs; returns None, or ``(status_code, message)`` if it is refused."""
+    if experience is None:
+        return 404, "Experience not found"
+    if booking["status"] not in ACTIVE_STATUSES:
+        return None
+    capacity = capacity_of(experience)
+    if capacity is not None and booking["guests"] > capacity:
+        return 400, f"Maximum group size is {capacity}"
+    if not await availability_db.reserve(booking["experienceId"], booking["date"], booking["guests"], capacity):
+        return 409, "Not enough capacity available for selected date"
+    return None
+
+
+async def release_seats(bookings):
+    for booking in bookings:
+        if booking["status"] in ACTIVE_STATUSES:
+            await availability_db.release(booking["experienceId"], booking["date"], booking["guests"])
+
+
+@api_router.post("/bookings/batch", tags=["bookings"])
+async def create_bookings_batch(request: Request, user=Depends(get_current_user)):
+    items = await read_batch(request)
+    created_at = datetime.now(timezone.utc).isoformat()
+    # Un administrateur peut importer les réservations d'autres utilisateurs
+    admin = is_admin(user)
+
+    def build(data):
+        owner = data.get("userId") if admin and isinstance(data, dict) and data.get("userId") else user["id"]
+        return build_booking(data, owner, created_at, trusted=admin)
+
+    records, results = build_batch(items, build)
+    experience_ids = list({booking["experienceId"] for booking in records})
+    experiences = {exp["id"]: exp for exp in await experiences_db.get_many(experience_ids)}
+    accepted = []
+    for booking, result in zip(records, [r for r in results if r["success"]]):
+        refused = await reserve_seats(booking, experiences.get(booking["experienceId"]))
+        if refused is None:
+            accepted.append(booking)
+        else:
+            del result["id"]
+            result.update(success=False, error=refused[1])
+    if accepted:
+        try:
+            await bookings_db.insert_many(accepted)
+        except Exception:
+            await release_seats(accepted)
+            raise
+    return batch_response(accepted, results)
 
 
+@api_router.post("/bookings", status_code=201, tags=["bookings"])
+@idempotent(status_code=201)
+async def create_booking(request: Request, user=Depends(get_current_user)):
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if user is None or "id" not in user:
+        raise HTTPException(status_code=401, detail="Missing user token")
+    try:
+        booking = build_booking(data, user["id"], datetime.now(timezone.utc).isoformat())
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    refused = await reserve_seats(booking, await experiences_db.get(booking["experienceId"]))
+    if refused is not None:
+        raise HTTPException(status_code=refused[0], detail=refused[1])
+    try:
+        await bookings_db.insert(booking)
+    except Exception:
+        await release_seats([booking])
+        raise
+    return {
+        "success": True,
+        "data": {
+            "booking": booking
+        }
+    }
 
+# Avis : un par utilisateur et par expérience
+REVIEW_COMMENT_MAX = int(os.environ.get("REVIEW_COMMENT_MAX", 2000))
+
+
+def review_fields(data, partial=False):
+    """Validated ``rating`` / ``comment`` of a posted review; raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    fields = {}
+    if "rating" in data or not partial:
+        rating = data.get("rating")
+        if isinstance(rating, bool) or not isinstance(rating, int) or rating not in RATINGS:
+            raise ValueError(f"rating must be an integer between {RATINGS[0]} and {RATINGS[-1]}")
+        fields["rating"] = rating
+    if "comment" in data or not partial:
+        comment = data.get("comment") or ""
+        if not isinstance(comment, str) or len(comment) > REVIEW_COMMENT_MAX:
+            raise ValueError(f"comment must be a string of at most {REVIEW_COMMENT_MAX} characters")
+        fields["comment"] = comment
+    return fields
+
+
+async def owned_review(review_id, user, allow_admin=False):
+    review = await reviews_db.get(review_id)
+    if review is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    if review["userId"] != user["id"] and not (allow_admin and is_admin(user)):
+        raise HTTPException(status_code=403, detail="Not allowed to modify this review")
+    return review
+
+
+@api_router.get("/reviews/experience/{experience_id}", tags=["reviews"])
+async def get_experience_reviews(
+    request: Request, experience_id: str, limit: int = 20, cursor: str = None, order: str = "desc"
+):
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=422, detail="order must be 'asc' or 'desc'")
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    async def build():
+        if await experiences_db.get(experience_id) is None:
+            raise HTTPException(status_code=404, detail="Experience not found")
+        reviews, next_key = await reviews_db.for_experience(
+            experience_id, after=after, limit=clamp_limit(limit), descending=order == "desc"
+        )
+        return {
+            "success": True,
+            "data": {
+                "reviews": reviews,
+                "summary": rating_aggregates.experience(experience_id, histogram=True),
+                "nextCursor": encode_cursor(next_key)
+            }
+        }
+    return await cached_response(request, build)
 
 
+@api_router.post("/reviews", status_code=201, tags=["reviews"])
+@idempotent(status_code=201)
+async def create_review(request: Request, user=Depends(get_current_user)):
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(data, dict) or not data.get("experienceId"):
+        raise HTTPException(status_code=422, detail="Missing experienceId")
+    try:
+        fields = review_fields(data)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    experience = await experiences_db.get(data["experienceId"])
+    if experience is None:
+        raise HTTPException(status_code=404, detail="Experience not found")
+    if experience.get("hostId") == user["id"]:
+        raise HTTPException(status_code=403, detail="Hosts cannot review their own experience")
+    now = datetime.now(timezone.utc).isoformat()
+    review = {
+        "id": str(uuid.uuid4()),
+        "experienceId": experience["id"],
+        "hostId": experience.get("hostId"),
+        "userId": user["id"],
+        **fields,
+        "createdAt": now,
+        "updatedAt": now
+    }
+    try:
+        await reviews_db.insert(review)
+    except DuplicateReviewError:
+        raise HTTPException(status_code=409, detail="You have already reviewed this experience")
+    rating_aggregates.apply(review["id"], review)
+    response_cache.invalidate()
+    return {
+        "success": True,
+        "data": {
+            "review": review
+        }
+    }
 
-# Include the router in the main app
-app.include_router(api_router)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["https://rihlama.com"],
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Authorization", "Content-Type"],
-)
+@api_router.put("/reviews/{review_id}", tags=["reviews"])
+async def update_review(review_id: str, request: Request, user=Depends(get_current_user)):
+    try:
+        data = await request.json()
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    try:
+        changes = review_fields(data, partial=True)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    await owned_review(review_id, user)
+    changes["updatedAt"] = datetime.now(timezone.utc).isoformat()
+    updated = await reviews_db.update(review_id, changes)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    rating_aggregates.apply(review_id, updated)
+    response_cache.invalidate()
+    return {
+        "success": True,
+        "data": {
+            "review": updated
+        }
+    }
 
-# Désactiver le mode debug en production
-import logging
-logging.getLogger("uvicorn.error").setLevel(logging.INFO)
-logging.getLogger("uvicorn.access").setLevel(logging.INFO)
 
-# Headers de sécurité
-from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
-from starlette.middleware.trustedhost import TrustedHostMiddleware
-app.add_middleware(HTTPSRedirectMiddleware)
-app.add_middleware(TrustedHostMiddleware, allowed_hosts=["rihlama.com", "www.rihlama.com"])
+@api_router.delete("/reviews/{review_id}", tags=["reviews"])
+async def delete_review(review_id: str, user=Depends(get_current_user)):
+    # L'auteur ou un administrateur (modération)
+    await owned_review(review_id, user, allow_admin=True)
+    if await reviews_db.delete(review_id) is None:
+        raise HTTPException(status_code=404, detail="Review not found")
+    rating_aggregates.apply(review_id, None)
+    response_cache.invalidate()
+    return {
+        "success": True,
+        "data": {
+            "id": review_id
+        }
+    }
 
-async def shutdown_db_client():
-    pass  # Removed unnecessary client.close() reference
+# Messagerie : conversations à deux, journal de messages en ajout seul, diffusion en direct par WebSocket
+MESSAGE_MAX_LENGTH = int(os.environ.get("MESSAGE_MAX_LENGTH", 4000))
+
+
+def conversation_view(conversation, user_id):
+    return {**conversation, "unreadCount": conversation["unread"].get(user_id, 0)}
+
+
+def publish_message(conversation, message):
+    # Le curseur permet au client de reprendre la lecture (order=asc) après une déconnexion
+    event = {"type": "message", "message": message, "cursor": encode_cursor((message["seq"],))}
+    message_hub.publish(conversation["participants"], event, key=message["id"])
+
+
+def publish_read(conversation, user_id):
+    seq = conversation["readSeq"].get(user_id, 0)
+    event = {"type": "read", "conversationId": conversation["id"], "userId": user_id, "readSeq": seq}
+    message_hub.publish(conversation["participants"], event, key=f"read:{conversation['id']}:{user_id}:{seq}")
+
+
+async def participant_conversation(conversation_id, user):
+    conversation = await messages_db.get_conversation(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    if user["id"] not in conversation["participants"]:
+        raise HTTPException(status_code=403, detail="Not a participant of this conversation")
+    return conversation
+
+
+async def send_message(user, data):
+    """Append a message from ``user`` and push it to the participants; returns ``(message, conversation)``."""
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=422, detail="Expected a JSON object")
+    text = data.get("text")
+    if not isinstance(text, str) or not text.strip() or len(text) > MESSAGE_MAX_LENGTH:
+        raise HTTPException(status_code=422, detail=f"text must be a non-empty string of at most {MESSAGE_MAX_LENGTH} characters")
+    now = datetime.now(timezone.utc).isoformat()
+    if data.get("conversationId"):
+        conversation = await participant_conversation(data["conversationId"], user)
+    else:
+        recipient_id = data.get("recipientId")
+        if not recipient_id:
+            raise HTTPException(status_code=422, detail="Missing conversationId or recipientId")
+        if recipient_id == user["id"]:
+            raise HTTPException(status_code=422, detail="Cannot send a message to yourself")
+        if await users_db.get(recipient_id) is None:
+            raise HTTPException(status_code=404, detail="Recipient not found")
+        experience_id = data.get("experienceId") or None
+        if experience_id is not None and await experiences_db.get(experience_id) is None:
+            raise HTTPException(status_code=404, detail="Experience not found")
+        conversation = await messages_db.open_conversation(
+            new_conversation(str(uuid.uuid4()), [user["id"], recipient_id], experience_id, now)
+        )
+    appended = await messages_db.append(
+        conversation["id"], {"id": str(uuid.uuid4()), "senderId": user["id"], "text": text, "createdAt": now}
+    )
+    if appended is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    message, conversation = appended
+    publish_message(conversation, message)
+    return message, conversation
+
+
+async def read_message(user, message_id):
+    """Mark everything up to ``message_id`` as read by ``user``; returns the conversation."""
+    message = await messages_db.get_message(message_id) if isinstance(message_id, str) else None
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    conversation = await participant_conversation(message["conversationId"], user)
+    updated = await messages_db.mark_read(conversation["id"], user["id"], message["seq"])
+    if updated["readSeq"].get(user["id"]) != conversation["readSeq"].get(user["id"]):
+        publish_read(updated, user["id"])
+    return updated
+
+
+@api_router.get("/messages/conversations", tags=["messages"])
+async def get_conversations(user=Depends(get_current_user), limit: int = 20, cursor: str = None):
+    after = decode_key(cursor, (int, str))
+    conversations, next_key = await messages_db.conversations_for(user["id"], after=after, limit=clamp_limit(limit))
+    return {
+        "success": True,
+        "data": {
+            "conversations": [conversation_view(c, user["id"]) for c in conversations],
+            "nextCursor": encode_cursor(next_key)
+        }
+    }
 
 
+@api_router.get("/messages/conversations/{conversation_id}", tags=["messages"])
+async def get_conversation_messages(
+    conversation_id: str, user=Depends(get_current_user), limit: int = 50, cursor: str = None, order: str = "desc"
+):
+    """Messages newest first; ``order=asc`` with the cursor of the last message received reads what followed it."""
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=422, detail="order must be 'asc' or 'desc'")
+    after = decode_key(cursor, (int,))
+    conversation = await participant_conversation(conversation_id, user)
+    messages, next_key = await messages_db.messages(
+        conversation_id, after=after, limit=clamp_limit(limit), descending=order == "desc"
+    )
+    return {
+        "success": True,
+        "data": {
+            "conversation": conversation_view(conversation, user["id"]),
+            "messages": messages,
+            "nextCursor": encode_cursor(next_key)
+        }
+    }
 
-# Endpoint pour créer une réservation (placé à la fin pour éviter les erreurs de portée)
 
-@api_router.post("/bookings", status_code=201, tags=["bookings"])
-async def create_booking(request: Request, user=Depends(get_current_user)):
+@api_router.post("/messages", status_code=201, tags=["messages"])
+@idempotent(status_code=201)
+async def create_message(request: Request, user=Depends(get_current_user)):
     try:
         data = await request.json()
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON body")
-    if "experienceId" not in data or not data["experienceId"]:
-        raise HTTPException(status_code=422, detail="Missing experienceId")
-    if user is None or "id" not in user:
-        raise HTTPException(status_code=401, detail="Missing user token")
-    booking_id = str(uuid.uuid4())
-    booking = {
-        "id": booking_id,
-        "userId": user["id"],
-        "experienceId": data["experienceId"],
-        "date": data.get("date", "2025-08-26"),
-        "status": data.get("status", "confirmed")
+    message, conversation = await send_message(user, data)
+    return {
+        "success": True,
+        "data": {
+            "message": message,
+            "conversation": conversation_view(conversation, user["id"])
+        }
     }
-    with db_lock:
-        bookings_db[booking_id] = booking
+
+
+@api_router.put("/messages/{message_id}/read", tags=["messages"])
+async def mark_message_read(message_id: str, user=Depends(get_current_user)):
+    conversation = await read_message(user, message_id)
     return {
         "success": True,
         "data": {
-            "booking": booking
+            "conversationId": conversation["id"],
+            "readSeq": conversation["readSeq"].get(user["id"], 0),
+            "unreadCount": conversation["unread"].get(user["id"], 0)
         }
     }
+
+
+async def handle_frame(user, frame):
+    """Reply to one client frame: ``send`` (same body as POST /messages), ``read`` or ``ping``."""
+    ref = frame.get("ref") if isinstance(frame, dict) else None
+    try:
+        kind = frame.get("type") if isinstance(frame, dict) else None
+        if kind == "send":
+            message, _ = await send_message(user, frame)
+            return {"type": "sent", "ref": ref, "message": message}
+        if kind == "read":
+            conversation = await read_message(user, frame.get("messageId"))
+            return {"type": "ack", "ref": ref, "conversationId": conversation["id"],
+                    "readSeq": conversation["readSeq"].get(user["id"], 0)}
+        if kind == "ping":
+            return {"type": "pong", "ref": ref}
+        raise HTTPException(status_code=422, detail="type must be 'send', 'read' or 'ping'")
+    except HTTPException as exc:
+        return {"type": "error", "ref": ref, "status": exc.status_code, "detail": exc.detail}
+
+
+async def receive_frames(websocket, user):
+    while True:
+        received = await websocket.receive()
+        if received["type"] == "websocket.disconnect":
+            return
+        try:
+            frame = loads(received.get("text") or received.get("bytes") or b"")
+        except ValueError:
+            frame = None
+        await websocket.send_text(dumps(await handle_frame(user, frame)).decode())
+
+
+async def forward_events(websocket, subscription):
+    queue = subscription.queue
+    while True:
+        event = await queue.get()
+        if isinstance(event, tuple):
+            code, reason = event
+            await websocket.close(code=code, reason=reason)
+            return
+        await websocket.send_text(event)
+
+
+@api_router.websocket("/messages/ws")
+async def messages_socket(websocket: WebSocket):
+    """Live messaging channel, authenticated like the REST API.
+
+    Browsers cannot set headers on a WebSocket, so the access token is also
+    accepted as the ``token`` query parameter. The server pushes ``message``
+    and ``read`` events; the connection is closed with 1008 when the token
+    expires or its session is revoked, and with 1013 if the client falls too
+    far behind.
+    """
+    authorization = websocket.headers.get("authorization") or ""
+    token = authorization[7:] if authorization.startswith("Bearer ") else websocket.query_params.get("token")
+    claims = access_tokens.verify(token) if token else None
+    if claims is None:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+    user = caller(claims)
+    await websocket.accept()
+    subscription = message_hub.connect(user["id"], user["session"])
+    expiry = asyncio.get_running_loop().call_later(
+        max(0.0, claims["exp"] - time.time()), subscription.close, TOKEN_EXPIRED
+    )
+    tasks = {
+        asyncio.create_task(receive_frames(websocket, user)),
+        asyncio.create_task(forward_events(websocket, subscription)),
+    }
+    try:
+        # Le premier qui se termine (client parti, fermeture demandée par le hub) arrête l'autre
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            try:
+                task.result()
+            except WebSocketDisconnect:
+                pass
+    finally:
+        expiry.cancel()
+        message_hub.disconnect(subscription)
+        for task in tasks:
+            task.cancel()
+
+# --- AUTRES ENDPOINTS ---
+
+# Endpoint pour récupérer les réservations de l'utilisateur connecté (à la fin du fichier)
+
+
+
+def create_app():
+    """Assemble the ASGI app: routers, then middleware from the innermost layer outwards."""
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
+    from starlette.middleware.trustedhost import TrustedHostMiddleware
+
+    app = FastAPI(default_response_class=FastJSONResponse, on_startup=[startup], on_shutdown=[shutdown])
+    app.router.route_class = FastJSONRoute
+    app.include_router(root_router)
+    app.include_router(api_router)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["https://rihlama.com"],
+        allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+        allow_headers=["Authorization", "Content-Type"],
+    )
+    # Headers de sécurité
+    app.add_middleware(HTTPSRedirectMiddleware)
+    app.add_middleware(TrustedHostMiddleware, allowed_hosts=["rihlama.com", "www.rihlama.com"])
+    if profiler is not None:
+        from profiler import ProfilerMiddleware
+        app.add_middleware(ProfilerMiddleware, profiler=profiler, is_trusted=profile_requested)
+    # En dernier : enveloppe toutes les autres couches, la latence mesurée est celle vue par le client
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    return app
+
+
+# Désactiver le mode debug en production
+logging.getLogger("uvicorn.error").setLevel(logging.INFO)
+logging.getLogger("uvicorn.access").setLevel(logging.INFO)
+
+app = create_app()
@@ -0,0 +1,735 @@
+"""Embedded SQLite backend (WAL mode) for tests, offline work and single-node deployments.
+
+Each collection is a table holding the JSON document plus the indexed columns
+the API filters and sorts on. sqlite3 calls block, so they run on a small
+thread pool with one connection per thread; WAL lets those readers proceed
+while another connection writes.
+"""
+
+import asyncio
+import functools
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from experience_store import normalize_key, to_number
+from message_store import after_append, conversation_key
+from availability_store import ACTIVE_STATUSES
+from repository import (
+    AvailabilityRepository,
+    BookingRepository,
+    DuplicateEmailError,
+    DuplicateReviewError,
+    ExperienceRepository,
+    MessageRepository,
+    Repository,
+    ReviewRepository,
+    TokenRepository,
+    UserRepository,
+)
+from user_store import normalize_email
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    email_key TEXT NOT NULL UNIQUE,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS experiences (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    category_key TEXT,
+    location_key TEXT,
+    price REAL,
+    group_size REAL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS experiences_category ON experiences (category_key, seq);
+CREATE INDEX IF NOT EXISTS experiences_location ON experiences (location_key, seq);
+CREATE INDEX IF NOT EXISTS experiences_price ON experiences (price, seq);
+CREATE TABLE IF NOT EXISTS bookings (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    experience_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bookings_user ON bookings (user_id, date, seq);
+CREATE INDEX IF NOT EXISTS bookings_experience ON bookings (experience_id, date, seq);
+CREATE TABLE IF NOT EXISTS reviews (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    user_id TEXT NOT NULL,
+    experience_id TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS reviews_author ON reviews (user_id, experience_id);
+CREATE INDEX IF NOT EXISTS reviews_experience ON reviews (experience_id, seq);
+CREATE TABLE IF NOT EXISTS conversations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    pair_key TEXT NOT NULL UNIQUE,
+    activity INTEGER NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversation_members (
+    user_id TEXT NOT NULL,
+    conversation_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, conversation_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    conversation_id TEXT NOT NULL,
+    conversation_seq INTEGER NOT NULL,
+    sender_id TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS messages_log ON messages (conversation_id, conversation_seq);
+CREATE TABLE IF NOT EXISTS availability (
+    experience_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    booked INTEGER NOT NULL,
+    PRIMARY KEY (experience_id, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tokens (
+    key TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tokens_expiry ON tokens (expires_at);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS experiences_changed AFTER INSERT ON experiences
+BEGIN INSERT INTO changes (collection, key) VALUES ('experiences', NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS users_changed AFTER UPDATE ON users
+BEGIN INSERT INTO changes (collection, key) VALUES ('users', NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS reviews_created AFTER INSERT ON reviews
+BEGIN INSERT INTO changes (collection, key) VALUES ('reviews', NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS reviews_updated AFTER UPDATE ON reviews
+BEGIN INSERT INTO changes (collection, key) VALUES ('reviews', NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS reviews_deleted AFTER DELETE ON reviews
+BEGIN INSERT INTO changes (collection, key) VALUES ('reviews', OLD.id); END;
+CREATE TRIGGER IF NOT EXISTS messages_created AFTER INSERT ON messages
+BEGIN INSERT INTO changes (collection, key) VALUES ('messages', NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS conversations_read AFTER UPDATE ON conversations
+WHEN json_extract(NEW.doc, '$.readSeq') IS NOT json_extract(OLD.doc, '$.readSeq')
+BEGIN INSERT INTO changes (collection, key) VALUES ('conversations', NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS tokens_revoked AFTER DELETE ON tokens
+BEGIN INSERT INTO changes (collection, key) VALUES ('tokens', OLD.key); END;
+"""
+
+# Nombre d'entrées conservées dans le journal des changements
+CHANGES_RETAINED = 100_000
+# Toutes les CHANGES_PRUNE_EVERY entrées, le trigger supprime celles sorties de la fenêtre
+CHANGES_PRUNE_EVERY = 1000
+PRUNE_CHANGES = f"""
+BEGIN;
+DROP TRIGGER IF EXISTS changes_pruned;
+CREATE TRIGGER changes_pruned AFTER INSERT ON changes
+WHEN NEW.seq % {CHANGES_PRUNE_EVERY} = 0
+BEGIN DELETE FROM changes WHERE seq <= NEW.seq - {CHANGES_RETAINED}; END;
+COMMIT;
+"""
+
+SCAN_BATCH = 1000
+
+
+def _dumps(doc):
+    return json.dumps(doc, separators=(",", ":"), ensure_ascii=False)
+
+
+class _Database:
+    """Thread-local sqlite3 connections driven from an executor."""
+
+    def __init__(self, path, workers=4):
+        self.path = path
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sqlite")
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    async def run(self, fn, *args):
+        """Run ``fn(conn, *args)`` on the pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(self._call, fn, *args)
+        )
+
+    def _call(self, fn, *args):
+        return fn(self._connection(), *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+class SQLiteUserRepository(UserRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, user):
+        def insert(conn):
+            try:
+                conn.execute(
+                    "INSERT INTO users (id, email_key, doc) VALUES (?, ?, ?)",
+                    (user["id"], normalize_email(user["email"]), _dumps(user)),
+                )
+            except sqlite3.IntegrityError:
+                raise DuplicateEmailError(user["email"])
+        await self.db.run(insert)
+        return user
+
+    async def get(self, user_id):
+        def get(conn):
+            row = conn.execute("SELECT doc FROM users WHERE id = ?", (user_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def get_by_email(self, email):
+        def get(conn):
+            row = conn.execute(
+                "SELECT doc FROM users WHERE email_key = ?", (normalize_email(email),)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def update(self, user_id, changes):
+        def update(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT doc FROM users WHERE id = ?", (user_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                updated = {**json.loads(row[0]), **changes, "id": user_id}
+                conn.execute(
+                    "UPDATE users SET email_key = ?, doc = ? WHERE id = ?",
+                    (normalize_email(updated["email"]), _dumps(updated), user_id),
+                )
+                conn.execute("COMMIT")
+                return updated
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK")
+                raise DuplicateEmailError(changes.get("email"))
+        return await self.db.run(update)
+
+    async def scan(self):
+        async for doc in _scan(self.db, "SELECT rowid, doc FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?"):
+            yield doc
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        return await _export_page(self.db, "users", "rowid", after, since, limit)
+
+
+class SQLiteExperienceRepository(ExperienceRepository):
+    def __init__(self, db):
+        self.db = db
+
+    INSERT = (
+        "INSERT INTO experiences (id, category_key, location_key, price, group_size, doc) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+
+    @staticmethod
+    def _row(experience):
+        return (
+            experience["id"],
+            normalize_key(experience.get("category")),
+            normalize_key(experience.get("location")),
+            to_number(experience.get("price")),
+            to_number(experience.get("groupSize")),
+            _dumps(experience),
+        )
+
+    async def insert(self, experience):
+        await self.db.run(lambda conn: conn.execute(self.INSERT, self._row(experience)))
+        return experience
+
+    async def insert_many(self, experiences):
+        rows = [self._row(experience) for experience in experiences]
+        await self.db.run(_executemany, self.INSERT, rows)
+        return experiences
+
+    async def get(self, experience_id):
+        def get(conn):
+            row = conn.execute("SELECT doc FROM experiences WHERE id = ?", (experience_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def get_many(self, experience_ids):
+        if not experience_ids:
+            return []
+
+        def get_many(conn):
+            marks = ",".join("?" * len(experience_ids))
+            rows = conn.execute(
+                f"SELECT id, doc FROM experiences WHERE id IN ({marks})", list(experience_ids)
+            ).fetchall()
+            return {row[0]: json.loads(row[1]) for row in rows}
+        found = await self.db.run(get_many)
+        return [found[i] for i in experience_ids if i in found]
+
+    async def query(self, category=None, location=None, min_price=None, max_price=None,
+                    group_size=None, sort_by="createdAt", descending=True, after=None, limit=20):
+        where, params = [], []
+        if category:
+            where.append("category_key = ?")
+            params.append(normalize_key(category))
+        if location:
+            where.append("location_key = ?")
+            params.append(normalize_key(location))
+        if min_price is not None:
+            where.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            where.append("price <= ?")
+            params.append(max_price)
+        if group_size is not None:
+            where.append("group_size >= ?")
+            params.append(group_size)
+        direction = "DESC" if descending else "ASC"
+        op = "<" if descending else ">"
+        if sort_by == "price":
+            where.append("price IS NOT NULL")
+            if after is not None:
+                where.append(f"(price, seq) {op} (?, ?)")
+                params.extend(after[:2])
+            order = f"price {direction}, seq {direction}"
+        else:
+            if after is not None:
+                where.append(f"seq {op} ?")
+                params.append(after[0])
+            order = f"seq {direction}"
+        sql = "SELECT seq, price, doc FROM experiences"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = await self.db.run(lambda conn: conn.execute(sql, params).fetchall())
+        page = rows[:limit]
+        next_key = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_key = (last[1], last[0]) if sort_by == "price" else (last[0],)
+        return [json.loads(row[2]) for row in page], next_key
+
+    async def scan(self):
+        async for doc in _scan(self.db, "SELECT seq, doc FROM experiences WHERE seq > ? ORDER BY seq LIMIT ?"):
+            yield doc
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        return await _export_page(self.db, "experiences", "seq", after, since, limit)
+
+
+class SQLiteBookingRepository(BookingRepository):
+    def __init__(self, db):
+        self.db = db
+
+    INSERT = "INSERT INTO bookings (id, user_id, experience_id, date, doc) VALUES (?, ?, ?, ?, ?)"
+
+    @staticmethod
+    def _row(booking):
+        return (
+            booking["id"],
+            booking["userId"],
+            booking["experienceId"],
+            str(booking.get("date") or ""),
+            _dumps(booking),
+        )
+
+    async def insert(self, booking):
+        await self.db.run(lambda conn: conn.execute(self.INSERT, self._row(booking)))
+        return booking
+
+    async def insert_many(self, bookings):
+        rows = [self._row(booking) for booking in bookings]
+        await self.db.run(_executemany, self.INSERT, rows)
+        return bookings
+
+    async def get(self, booking_id):
+        def get(conn):
+            row = conn.execute("SELECT doc FROM bookings WHERE id = ?", (booking_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def for_user(self, user_id, after=None, limit=20, descending=False):
+        return await self._page("user_id", user_id, after, limit, descending)
+
+    async def for_experience(self, experience_id, after=None, limit=20, descending=False):
+        return await self._page("experience_id", experience_id, after, limit, descending)
+
+    async def _page(self, column, owner, after, limit, descending):
+        direction = "DESC" if descending else "ASC"
+        sql = f"SELECT date, seq, id, doc FROM bookings WHERE {column} = ?"
+        params = [owner]
+        if after is not None:
+            sql += f" AND (date, seq) {'<' if descending else '>'} (?, ?)"
+            params.extend(after[:2])
+        sql += f" ORDER BY date {direction}, seq {direction} LIMIT ?"
+        params.append(limit + 1)
+        rows = await self.db.run(lambda conn: conn.execute(sql, params).fetchall())
+        page = rows[:limit]
+        next_key = tuple(page[-1][:3]) if len(rows) > limit else None
+        return [json.loads(row[3]) for row in page], next_key
+
+    async def scan(self):
+        async for doc in _scan(self.db, "SELECT seq, doc FROM bookings WHERE seq > ? ORDER BY seq LIMIT ?"):
+            yield doc
+
+    async def export_page(self, after=None, since=None, limit=1000):
+        return await _export_page(self.db, "bookings", "seq", after, since, limit)
+
+
+class SQLiteReviewRepository(ReviewRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, review):
+        def insert(conn):
+            try:
+                conn.execute(
+                    "INSERT INTO reviews (id, user_id, experience_id, doc) VALUES (?, ?, ?, ?)",
+                    (review["id"], review["userId"], review["experienceId"], _dumps(review)),
+                )
+            except sqlite3.IntegrityError:
+                raise DuplicateReviewError(review["experienceId"])
+        await self.db.run(insert)
+        return review
+
+    async def get(self, review_id):
+        def get(conn):
+            row = conn.execute("SELECT doc FROM reviews WHERE id = ?", (review_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def update(self, review_id, changes):
+        def update(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT doc FROM reviews WHERE id = ?", (review_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                review = json.loads(row[0])
+                updated = {**review, **changes, "id": review_id, "userId": review["userId"],
+                           "experienceId": review["experienceId"]}
+                conn.execute("UPDATE reviews SET doc = ? WHERE id = ?", (_dumps(updated), review_id))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return updated
+        return await self.db.run(update)
+
+    async def delete(self, review_id):
+        def delete(conn):
+            row = conn.execute("DELETE FROM reviews WHERE id = ? RETURNING doc", (review_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(delete)
+
+    async def for_experience(self, experience_id, after=None, limit=20, descending=True):
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT seq, id, doc FROM reviews WHERE experience_id = ?"
+        params = [experience_id]
+        if after is not None:
+            sql += f" AND seq {'<' if descending else '>'} ?"
+            params.append(after[0])
+        sql += f" ORDER BY seq {direction} LIMIT ?"
+        params.append(limit + 1)
+        rows = await self.db.run(lambda conn: conn.execute(sql, params).fetchall())
+        page = rows[:limit]
+        next_key = tuple(page[-1][:2]) if len(rows) > limit else None
+        return [json.loads(row[2]) for row in page], next_key
+
+    async def scan(self):
+        async for doc in _scan(self.db, "SELECT seq, doc FROM reviews WHERE seq > ? ORDER BY seq LIMIT ?"):
+            yield doc
+
+
+class SQLiteMessageRepository(MessageRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def open_conversation(self, conversation):
+        key = conversation_key(conversation["participants"], conversation.get("experienceId"))
+
+        def open_conversation(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO conversations (id, pair_key, activity, doc) VALUES (?, ?, ?, ?)",
+                    (conversation["id"], key, conversation["activity"], _dumps(conversation)),
+                )
+                if cursor.rowcount:
+                    conn.executemany(
+                        "INSERT INTO conversation_members (user_id, conversation_id) VALUES (?, ?)",
+                        [(user_id, conversation["id"]) for user_id in conversation["participants"]],
+                    )
+                row = conn.execute("SELECT doc FROM conversations WHERE pair_key = ?", (key,)).fetchone()
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return json.loads(row[0])
+        return await self.db.run(open_conversation)
+
+    async def get_conversation(self, conversation_id):
+        def get(conn):
+            row = conn.execute("SELECT doc FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def conversations_for(self, user_id, after=None, limit=20):
+        sql = (
+            "SELECT c.activity, c.id, c.doc FROM conversation_members m "
+            "JOIN conversations c ON c.id = m.conversation_id WHERE m.user_id = ?"
+        )
+        params = [user_id]
+        if after is not None:
+            sql += " AND (c.activity, c.id) < (?, ?)"
+            params.extend(after[:2])
+        sql += " ORDER BY c.activity DESC, c.id DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = await self.db.run(lambda conn: conn.execute(sql, params).fetchall())
+        page = rows[:limit]
+        next_key = tuple(page[-1][:2]) if len(rows) > limit else None
+        return [json.loads(row[2]) for row in page], next_key
+
+    async def append(self, conversation_id, message):
+        def append(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT doc FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                conversation = json.loads(row[0])
+                stored = {**message, "conversationId": conversation_id, "seq": conversation["messageCount"] + 1}
+                cursor = conn.execute(
+                    "INSERT INTO messages (id, conversation_id, conversation_seq, sender_id, doc) VALUES (?, ?, ?, ?, ?)",
+                    (stored["id"], conversation_id, stored["seq"], stored["senderId"], _dumps(stored)),
+                )
+                # Le rowid global du message sert d'ordre d'activité des conversations
+                conversation = after_append(conversation, stored, cursor.lastrowid)
+                conn.execute(
+                    "UPDATE conversations SET activity = ?, doc = ? WHERE id = ?",
+                    (conversation["activity"], _dumps(conversation), conversation_id),
+                )
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return stored, conversation
+        return await self.db.run(append)
+
+    async def get_message(self, message_id):
+        def get(conn):
+            row = conn.execute("SELECT doc FROM messages WHERE id = ?", (message_id,)).fetchone()
+            return json.loads(row[0]) if row else None
+        return await self.db.run(get)
+
+    async def messages(self, conversation_id, after=None, limit=50, descending=True):
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT conversation_seq, doc FROM messages WHERE conversation_id = ?"
+        params = [conversation_id]
+        if after is not None:
+            sql += f" AND conversation_seq {'<' if descending else '>'} ?"
+            params.append(after[0])
+        sql += f" ORDER BY conversation_seq {direction} LIMIT ?"
+        params.append(limit + 1)
+        rows = await self.db.run(lambda conn: conn.execute(sql, params).fetchall())
+        page = rows[:limit]
+        next_key = (page[-1][0],) if len(rows) > limit else None
+        return [json.loads(row[1]) for row in page], next_key
+
+    async def mark_read(self, conversation_id, user_id, seq):
+        def mark_read(conn):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT doc FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+                conversation = json.loads(row[0]) if row else None
+                if conversation is None or seq <= conversation["readSeq"].get(user_id, seq):
+                    conn.execute("ROLLBACK")
+                    return conversation
+                seq_read = min(seq, conversation["messageCount"])
+                unread = conn.execute(
+                    "SELECT COUNT(*) FROM messages WHERE conversation_id = ? AND conversation_seq > ? AND sender_id != ?",
+                    (conversation_id, seq_read, user_id),
+                ).fetchone()[0]
+                conversation["readSeq"][user_id] = seq_read
+                conversation["unread"][user_id] = unread
+                conn.execute("UPDATE conversations SET doc = ? WHERE id = ?", (_dumps(conversation), conversation_id))
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return conversation
+        return await self.db.run(mark_read)
+
+
+class SQLiteAvailabilityRepository(AvailabilityRepository):
+    # Vérification et incrément en une seule instruction : atomique même entre processus
+    RESERVE = (
+        "INSERT INTO availability (experience_id, date, booked) VALUES (?, ?, ?) "
+        "ON CONFLICT (experience_id, date) DO UPDATE SET booked = booked + excluded.booked "
+        "WHERE ? IS NULL OR booked + excluded.booked <= ?"
+    )
+
+    def __init__(self, db):
+        self.db = db
+
+    async def reserve(self, experience_id, date, seats, capacity=None):
+        if capacity is not None and seats > capacity:
+            return False
+        cursor = await self.db.run(lambda conn: conn.execute(
+            self.RESERVE, (experience_id, date, seats, capacity, capacity)
+        ))
+        return cursor.rowcount > 0
+
+    async def release(self, experience_id, date, seats):
+        await self.db.run(lambda conn: conn.execute(
+            "UPDATE availability SET booked = MAX(0, booked - ?) WHERE experience_id = ? AND date = ?",
+            (seats, experience_id, date),
+        ))
+
+    async def booked(self, experience_id, start, end):
+        rows = await self.db.run(lambda conn: conn.execute(
+            "SELECT date, booked FROM availability "
+            "WHERE experience_id = ? AND date BETWEEN ? AND ? AND booked > 0",
+            (experience_id, start, end),
+        ).fetchall())
+        return dict(rows)
+
+
+class SQLiteTokenRepository(TokenRepository):
+    def __init__(self, db):
+        self.db = db
+
+    async def insert(self, key, user_id, expires_at):
+        await self.db.run(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO tokens (key, user_id, expires_at) VALUES (?, ?, ?)",
+            (key, user_id, expires_at),
+        ))
+
+    async def get(self, key):
+        return await self.db.run(lambda conn: conn.execute(
+            "SELECT user_id, expires_at FROM tokens WHERE key = ?", (key,)
+        ).fetchone())
+
+    async def delete(self, key):
+        cursor = await self.db.run(lambda conn: conn.execute("DELETE FROM tokens WHERE key = ?", (key,)))
+        return cursor.rowcount > 0
+
+
+def _executemany(conn, sql, rows):
+    """Insert ``rows`` in a single transaction (one fsync for the whole batch)."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(sql, rows)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+async def _scan(db, sql):
+    last = 0
+    while True:
+        rows = await db.run(lambda conn: conn.execute(sql, (last, SCAN_BATCH)).fetchall())
+        for _, doc in rows:
+            yield json.loads(doc)
+        if len(rows) < SCAN_BATCH:
+            return
+        last = rows[-1][0]
+
+
+async def _export_page(db, table, seq_column, after, since, limit):
+    sql = f"SELECT {seq_column}, doc FROM {table} WHERE {seq_column} > ?"
+    params = [after[0] if after is not None else 0]
+    if since is not None:
+        sql += " AND json_extract(doc, '$.createdAt') >= ?"
+        params.append(since)
+    sql += f" ORDER BY {seq_column} LIMIT ?"
+    params.append(limit + 1)
+    rows = await db.run(lambda conn: conn.execute(sql, params).fetchall())
+    page = rows[:limit]
+    next_key = (page[-1][0],) if len(rows) > limit else None
+    return [json.loads(row[1]) for row in page], next_key
+
+
+class SQLiteRepository(Repository):
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path="rihla.db", workers=4):
+        self.db = _Database(path, workers=workers)
+        super().__init__(
+            SQLiteUserRepository(self.db),
+            SQLiteExperienceRepository(self.db),
+            SQLiteBookingRepository(self.db),
+            SQLiteTokenRepository(self.db),
+            SQLiteAvailabilityRepository(self.db),
+            SQLiteReviewRepository(self.db),
+            SQLiteMessageRepository(self.db),
+        )
+
+    async def connect(self):
+        def connect(conn):
+            conn.executescript(SCHEMA)
+            # Recréé à chaque démarrage : la fenêtre suit CHANGES_RETAINED
+            conn.executescript(PRUNE_CHANGES)
+            if conn.execute("SELECT 1 FROM availability LIMIT 1").fetchone() is None:
+                # Compteurs de places reconstruits depuis les réservations existantes
+                marks = ",".join("?" * len(ACTIVE_STATUSES))
+                conn.execute(
+                    "INSERT INTO availability (experience_id, date, booked) "
+                    "SELECT experience_id, date, SUM(COALESCE(json_extract(doc, '$.guests'), 1)) FROM bookings "
+                    f"WHERE COALESCE(json_extract(doc, '$.status'), 'confirmed') IN ({marks}) "
+                    "GROUP BY experience_id, date",
+                    sorted(ACTIVE_STATUSES),
+                )
+            conn.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (CHANGES_RETAINED,))
+            conn.execute("DELETE FROM tokens WHERE expires_at <= ?", (time.time(),))
+        await self.db.run(connect)
+
+    async def last_change(self):
+        row = await self.db.run(lambda conn: conn.execute("SELECT MAX(seq) FROM changes").fetchone())
+        return row[0] or 0
+
+    async def changes_since(self, seq, limit=1000):
+        return await self.db.run(lambda conn: conn.execute(
+            "SELECT seq, collection, key FROM changes WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+        ).fetchall())
+
+    async def sizes(self):
+        tables = ("users", "experiences", "bookings", "reviews", "conversations", "messages", "tokens")
+        row = await self.db.run(lambda conn: conn.execute(
+            "SELECT " + ", ".join(f"(SELECT COUNT(*) FROM {table})" for table in tables)
+        ).fetchone())
+        return dict(zip(tables, row))
+
+    async def close(self):
+        self.db.close()
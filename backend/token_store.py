@@ -0,0 +1,108 @@
+"""Bearer token store for the Rihla API.
+
+Maps an opaque access token to the id of the user it was issued for, so that
+``get_current_user`` resolves a request in constant time instead of scanning
+every registered user.
+
+Tokens are keyed by their SHA-256 digest (``token_key``): the raw token is
+never kept, and the digest is what gets shared with other workers through the
+persistent backend when running with several processes.
+"""
+
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+def token_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenStore:
+    """Thread-safe token -> user id mapping with expiry, revocation and a size cap.
+
+    Tokens are kept in insertion/usage order; once ``max_tokens`` is reached the
+    least recently used token is evicted, which bounds memory no matter how many
+    logins happen. Expiry uses wall-clock time so it means the same thing in
+    every worker process.
+    """
+
+    def __init__(self, ttl_seconds=7 * 24 * 3600, max_tokens=100_000, clock=time.time):
+        self.ttl_seconds = ttl_seconds
+        self.max_tokens = max_tokens
+        self._clock = clock
+        self._tokens = OrderedDict()  # token key -> (user_id, expires_at)
+        self._by_user = {}  # user_id -> set(token keys), used for revoke_user
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def issue(self, user_id):
+        """Create a token for ``user_id``; returns ``(token, expires_at)``."""
+        token = secrets.token_urlsafe(32)
+        expires_at = self._clock() + self.ttl_seconds
+        self.remember(token_key(token), user_id, expires_at)
+        return token, expires_at
+
+    def remember(self, key, user_id, expires_at):
+        """Cache a token issued elsewhere (e.g. by another worker)."""
+        with self._lock:
+            self._tokens[key] = (user_id, expires_at)
+            self._tokens.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._tokens) > self.max_tokens:
+                old_key, (old_user, _) = self._tokens.popitem(last=False)
+                self._forget(old_user, old_key)
+
+    def resolve(self, token):
+        """Return the user id for ``token`` or None if unknown, expired or revoked."""
+        key = token_key(token)
+        with self._lock:
+            entry = self._tokens.get(key)
+            if entry is None:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= self._clock():
+                del self._tokens[key]
+                self._forget(user_id, key)
+                return None
+            self._tokens.move_to_end(key)
+            return user_id
+
+    def revoke(self, token):
+        return self.revoke_key(token_key(token))
+
+    def revoke_key(self, key):
+        with self._lock:
+            entry = self._tokens.pop(key, None)
+            if entry is None:
+                return False
+            self._forget(entry[0], key)
+            return True
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to ``user_id``; returns how many were dropped."""
+        with self._lock:
+            keys = self._by_user.pop(user_id, set())
+            for key in keys:
+                self._tokens.pop(key, None)
+            return len(keys)
+
+    def purge_expired(self):
+        now = self._clock()
+        with self._lock:
+            expired = [k for k, (_, exp) in self._tokens.items() if exp <= now]
+            for key in expired:
+                user_id, _ = self._tokens.pop(key)
+                self._forget(user_id, key)
+            return len(expired)
+
+    def _forget(self, user_id, key):
+        keys = self._by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[user_id]
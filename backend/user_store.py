@@ -0,0 +1,109 @@
+"""In-memory user store with a primary id index and a unique email index."""
+
+from locks import RWLock
+from records import UserRecord
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when a write would give two users the same email address."""
+
+
+def normalize_email(email):
+    return email.strip().lower() if isinstance(email, str) else email
+
+
+class UserStore:
+    """Users keyed by id, with a secondary unique index on the email address.
+
+    Both indexes are updated under the same write lock so they never disagree:
+    every id in ``_by_email`` points at a user in ``_by_id`` and vice versa.
+    Point lookups are single dict reads and take no lock at all.
+
+    Users are kept as ``UserRecord``s and handed out as dicts. A user's
+    position in ``_order`` is its registration sequence number.
+    """
+
+    def __init__(self):
+        self._by_id = {}  # user id -> UserRecord
+        self._by_email = {}  # normalized email -> user id
+        self._order = []  # user ids in registration order, for exports
+        self._lock = RWLock("users")
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, user_id):
+        return user_id in self._by_id
+
+    def values(self):
+        return [record.to_dict() for record in list(self._by_id.values())]
+
+    def snapshot(self):
+        """The users as of now, as dicts built lazily (safe to consume from another thread)."""
+        return map(UserRecord.to_dict, list(self._by_id.values()))
+
+    def get(self, user_id):
+        record = self._by_id.get(user_id)
+        return record.to_dict() if record is not None else None
+
+    def get_by_email(self, email):
+        user_id = self._by_email.get(normalize_email(email))
+        return self.get(user_id) if user_id is not None else None
+
+    def insert(self, user):
+        key = normalize_email(user["email"])
+        with self._lock.write():
+            if key in self._by_email:
+                raise DuplicateEmailError(user["email"])
+            record = UserRecord.from_dict(user)
+            self._by_id[record.id] = record
+            self._by_email[key] = record.id
+            self._order.append(record.id)
+        return user
+
+    def in_order(self, after=None, limit=1000):
+        """One page of users in registration order, as ``(users, next_key)``."""
+        with self._lock.read():
+            start = 0 if after is None else max(0, after[0] + 1)
+            records = [self._by_id[user_id] for user_id in self._order[start:start + limit]]
+            has_more = start + limit < len(self._order)
+        users = [record.to_dict() for record in records]
+        return users, ((start + len(users) - 1,) if users and has_more else None)
+
+    def update(self, user_id, changes):
+        """Apply ``changes`` to a user, re-indexing the email if it changed.
+
+        Returns the updated user, or None if ``user_id`` is unknown.
+        """
+        with self._lock.write():
+            user = self._by_id.get(user_id)
+            if user is None:
+                return None
+            old_key = normalize_email(user["email"])
+            new_key = normalize_email(changes.get("email", user["email"]))
+            if new_key != old_key:
+                if new_key in self._by_email:
+                    raise DuplicateEmailError(changes["email"])
+                del self._by_email[old_key]
+                self._by_email[new_key] = user_id
+            updated = {**user.to_dict(), **changes, "id": user_id}
+            self._by_id[user_id] = UserRecord.from_dict(updated)
+            return updated
+
+    def discard(self, user_id):
+        """Remove the most recently inserted user (rolls back an ``insert``)."""
+        with self._lock.write():
+            user = self._by_id.pop(user_id, None)
+            if user is None:
+                return
+            del self._by_email[normalize_email(user["email"])]
+            self._order.remove(user_id)
+
+    def restore(self, user):
+        """Put ``user`` back as it was before an ``update`` (rolls it back)."""
+        with self._lock.write():
+            current = self._by_id.get(user["id"])
+            if current is not None:
+                del self._by_email[normalize_email(current["email"])]
+            self._by_email[normalize_email(user["email"])] = user["id"]
+            self._by_id[user["id"]] = UserRecord.from_dict(user)
@@ -0,0 +1,368 @@
+"""Append-only write-ahead log with group commit, plus compressed snapshots.
+
+The log is a directory of numbered segments ``wal-00000001.log`` … holding
+one record per line: ``<crc32 hex> <json>\\n``, where a record is a JSON array
+``[op, *args]``. Appends are queued in memory and written by a single flusher
+task: every record queued while the previous write was on disk goes out in
+the next ``write`` + ``fsync``, so the cost of a sync is shared by all the
+requests that waited on it (group commit) instead of paid once per request.
+
+A snapshot ``snapshot-<N>.ndjson.gz`` holds the records that rebuild the
+whole state as it was when segment N was started. Recovery loads the newest
+snapshot and replays the segments from N on; older files can be deleted.
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import queue
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from responses import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+_ROTATE = object()  # marqueur dans la file : passer au segment suivant
+
+
+def encode_record(record):
+    payload = dumps(record)
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_record(line):
+    """The record of one log line, or None if the line is torn or corrupt."""
+    if len(line) < 10 or not line.endswith(b"\n") or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return loads(payload)
+    except ValueError:
+        return None
+
+
+def segment_path(directory, number):
+    return Path(directory) / f"wal-{number:08d}.log"
+
+
+def snapshot_path(directory, number):
+    return Path(directory) / f"snapshot-{number:08d}.ndjson.gz"
+
+
+def _numbers(directory, prefix, suffix):
+    numbers = []
+    for path in Path(directory).glob(f"{prefix}*{suffix}"):
+        middle = path.name[len(prefix):-len(suffix)]
+        if middle.isdigit():
+            numbers.append(int(middle))
+    return sorted(numbers)
+
+
+def segments(directory):
+    return _numbers(directory, "wal-", ".log")
+
+
+def snapshots(directory):
+    return _numbers(directory, "snapshot-", ".ndjson.gz")
+
+
+def read_segment(path):
+    """Yield the records of a segment.
+
+    A bad last line is what a crash in the middle of a write leaves behind:
+    it was never acknowledged, so it is skipped with a warning. A bad line
+    followed by good ones means the file is damaged, and raises ValueError.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        torn = None
+        for line in f:
+            if torn is not None:
+                raise ValueError(f"{path}: corrupt record at byte {torn}")
+            record = decode_record(line)
+            if record is None:
+                torn = offset
+            else:
+                yield record
+            offset += len(line)
+    if torn is not None:
+        logger.warning("%s: ignoring a torn record at byte %d (%d bytes)", path, torn, offset - torn)
+
+
+def read_snapshot(path):
+    """Yield the records of a snapshot.
+
+    Decompression runs in a thread (zlib releases the GIL), so it overlaps
+    with the parsing and applying done by the caller.
+    """
+    chunks = queue.Queue(maxsize=8)
+
+    def decompress():
+        try:
+            with gzip.open(path, "rb") as f:
+                while chunk := f.read(1 << 20):
+                    chunks.put(chunk)
+            chunks.put(b"")
+        except Exception as exc:
+            chunks.put(exc)
+
+    threading.Thread(target=decompress, name="snapshot-reader", daemon=True).start()
+    tail = b""
+    while True:
+        chunk = chunks.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if not chunk:
+            break
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop()
+        for line in lines:
+            yield loads(line)
+    if tail:
+        yield loads(tail)
+
+
+def write_snapshot(directory, number, records, sync=True):
+    """Write ``records`` as snapshot ``number``; the file only appears once complete."""
+    path = snapshot_path(directory, number)
+    tmp = path.with_name(path.name + ".tmp")
+    count = 0
+    with open(tmp, "wb") as raw:
+        # Niveau 1 : la compression ne doit pas coûter plus que l'écriture qu'elle évite
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as f:
+            chunk = []
+            for record in records:
+                chunk.append(dumps(record))
+                if len(chunk) >= 1000:
+                    f.write(b"\n".join(chunk) + b"\n")
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                f.write(b"\n".join(chunk) + b"\n")
+                count += len(chunk)
+        raw.flush()
+        if sync:
+            os.fsync(raw.fileno())
+    os.replace(tmp, path)
+    if sync:
+        _sync_directory(directory)
+    return count
+
+
+def prune(directory, number):
+    """Delete the snapshots and segments made obsolete by snapshot ``number``."""
+    for old in snapshots(directory):
+        if old < number:
+            snapshot_path(directory, old).unlink(missing_ok=True)
+    for old in segments(directory):
+        if old < number:
+            segment_path(directory, old).unlink(missing_ok=True)
+
+
+def _sync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """The writing end of the log.
+
+    ``append`` runs on the event loop: it encodes the record, queues it and
+    returns a future that resolves once the record is on disk (``sync=False``
+    skips the fsync: the record survives a crash of the process, not of the
+    machine). ``commit_delay`` makes the flusher wait a little before each
+    write to gather bigger batches, trading latency for fewer syncs.
+
+    Callers apply a write to memory before appending its record, and pass an
+    ``undo`` that takes it back. If a write fails, the records that did not
+    reach the disk and every record queued after them are rolled back, newest
+    first, before their futures fail: memory then holds exactly what a
+    restart would recover. The failed bytes are truncated off the segment.
+    """
+
+    def __init__(self, directory, sync=True, commit_delay=0.0):
+        self.directory = Path(directory)
+        self.sync = sync
+        self.commit_delay = commit_delay
+        self.segment = None  # segment où vont les prochains enregistrements
+        self.appended = 0
+        self.records = 0
+        self.commits = 0
+        self.bytes = 0
+        self._file = None
+        self._file_segment = None
+        self._pending = []  # (ligne, undo, future) ou _ROTATE
+        self._done = 0  # éléments du lot en cours déjà écrits
+        self._waiters = []
+        self._wakeup = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wal")
+
+    def open(self, segment):
+        """Start writing to a new ``segment`` (call from the event loop)."""
+        self.segment = segment
+        self._open_file(segment)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def append(self, *record, undo=None):
+        line = encode_record(record)
+        future = self._waiter()
+        self._pending.append((line, undo, future))
+        self.appended += 1
+        return future
+
+    def rotate(self):
+        """Send the next records to a new segment; returns its number.
+
+        Every record appended before the call is in an older segment.
+        """
+        self.segment += 1
+        self._pending.append(_ROTATE)
+        self._wakeup.set()
+        return self.segment
+
+    async def flush(self):
+        """Wait until every record appended so far is written."""
+        await self._waiter()
+
+    async def close(self):
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close_file)
+        self._executor.shutdown()
+
+    def stats(self):
+        return {
+            "segment": self.segment,
+            "appended": self.appended,
+            "records": self.records,
+            "commits": self.commits,
+            "bytes": self.bytes,
+            "pending": len(self._pending),
+        }
+
+    def _waiter(self):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._wakeup.set()
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.commit_delay:
+                await asyncio.sleep(self.commit_delay)
+            batch, waiters = self._pending, self._waiters
+            self._pending, self._waiters = [], []
+            error = None
+            self._done = 0
+            if batch:
+                try:
+                    await loop.run_in_executor(self._executor, self._write, batch)
+                except Exception as exc:
+                    logger.exception("Write-ahead log write failed")
+                    error = exc
+            if error is not None:
+                waiters += self._rollback(batch, error)
+            for waiter in waiters:
+                if not waiter.done():
+                    if error is None:
+                        waiter.set_result(None)
+                    else:
+                        waiter.set_exception(error)
+
+    def _rollback(self, batch, error):
+        """Undo and fail the records of ``batch`` that were not written, and every record queued since.
+
+        Returns the waiters queued since (they fail with ``error`` too).
+        """
+        for item in batch[:self._done]:
+            if item is not _ROTATE and not item[2].done():
+                item[2].set_result(None)
+        queued = batch[self._done:] + self._pending
+        failed = [item for item in queued if item is not _ROTATE]
+        # Les changements de segment non faits restent dus (numéros de snapshot)
+        self._pending = [item for item in queued if item is _ROTATE]
+        waiters, self._waiters = self._waiters, []
+        for _, undo, _ in reversed(failed):
+            if undo is not None:
+                try:
+                    undo()
+                except Exception:
+                    logger.exception("Could not roll back a write-ahead log record")
+        for _, _, future in failed:
+            if not future.done():
+                future.set_exception(error)
+        return waiters
+
+    # --- Thread d'écriture ---
+
+    def _open_file(self, segment):
+        # Sans tampon : après un échec, rien ne reste à écrire dans un tampon Python
+        self._file = open(segment_path(self.directory, segment), "ab", buffering=0)
+        self._file_segment = segment
+        if self.sync:
+            _sync_directory(self.directory)
+
+    def _close_file(self):
+        if self._file is not None:
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def _write(self, batch):
+        chunk = []
+        for index, item in enumerate(batch):
+            if item is _ROTATE:
+                self._write_chunk(chunk)
+                self._done = index
+                chunk = []
+                self._close_file()
+                self._open_file(self._file_segment + 1)
+                self._done = index + 1
+            else:
+                chunk.append(item[0])
+        self._write_chunk(chunk)
+        self._done = len(batch)
+
+    def _write_chunk(self, chunk):
+        if not chunk:
+            return
+        data = b"".join(chunk)
+        start = self._file.tell()
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[self._file.write(view):]
+            if self.sync:
+                os.fsync(self._file.fileno())
+        except Exception:
+            # Un enregistrement à moitié écrit suivi de bons rendrait le segment illisible
+            try:
+                self._file.truncate(start)
+            except OSError:
+                pass
+            raise
+        self.records += len(chunk)
+        self.commits += 1
+        self.bytes += len(data)
@@ -0,0 +1,133 @@
+"""Shared fixtures.
+
+The backend is a flat set of modules run from ``backend/`` (``uvicorn
+server:app``), so the tests import them the same way. ``server`` builds its
+state at import time from the environment: the defaults below give it the
+in-memory store, a fixed JWT secret, one admin address and cheap password
+hashing.
+"""
+
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+ADMIN_EMAIL = "admin@rihla.test"
+PASSWORD = "SecurePass123!"
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.pop("MEMORY_DATA_DIR", None)
+os.environ.setdefault("JWT_SECRET", "rihla-test-secret-at-least-32-bytes-long")
+os.environ.setdefault("ADMIN_EMAILS", ADMIN_EMAIL)
+os.environ.setdefault("PASSWORD_ROUNDS", "1000")
+
+
+class FakeClock:
+    """A ``clock`` callable for the TTL caches, moved by hand (``clock.now += 60``).
+
+    It starts at the current time: PyJWT also checks ``exp`` against the real clock.
+    """
+
+    def __init__(self):
+        self.now = int(time.time())
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(scope="session")
+def server():
+    import server
+
+    return server
+
+
+@pytest.fixture(scope="session")
+def client(server):
+    from fastapi.testclient import TestClient
+
+    # TrustedHost et HTTPSRedirect n'acceptent que https://rihlama.com
+    with TestClient(server.app, base_url="https://rihlama.com") as client:
+        yield client
+
+
+def bearer(account):
+    return {"Authorization": f"Bearer {account['tokens']['accessToken']}"}
+
+
+@pytest.fixture
+def signup(client):
+    """Register a new account; returns ``{"user", "tokens", "headers"}``."""
+
+    def signup(is_host=False, **fields):
+        body = {
+            "firstName": "Amina",
+            "lastName": "Tazi",
+            "email": f"{uuid.uuid4().hex[:12]}@example.com",
+            "password": PASSWORD,
+            "isHost": is_host,
+            **fields,
+        }
+        response = client.post("/api/auth/register", json=body)
+        assert response.status_code == 201, response.text
+        account = response.json()["data"]
+        account["headers"] = bearer(account)
+        return account
+
+    return signup
+
+
+@pytest.fixture(scope="session")
+def admin(client, server):
+    """The account holding ``ADMIN_EMAIL``: stored directly, then flagged like at startup."""
+    user = {
+        "id": str(uuid.uuid4()),
+        "firstName": "Admin",
+        "lastName": "Rihla",
+        "email": ADMIN_EMAIL,
+        "password": client.portal.call(server.password_hasher.hash, PASSWORD),
+        "isHost": True,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+    client.portal.call(server.users_db.insert, user)
+    client.portal.call(server.flag_admins)
+    response = client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    account = response.json()["data"]
+    account["headers"] = bearer(account)
+    return account
+
+
+@pytest.fixture
+def create_experience(client):
+    """Post an experience as ``host``; returns the stored experience."""
+
+    def create_experience(host, **fields):
+        body = {
+            "title": "Sunset camel ride",
+            "description": "Ride into the dunes at dusk",
+            "category": "Adventure",
+            "location": "Merzouga",
+            "price": 450,
+            "duration": "3 hours",
+            "groupSize": 8,
+            "highlights": ["Dunes"],
+            "images": ["camel.jpg"],
+            **fields,
+        }
+        response = client.post("/api/experiences", json=body, headers=host["headers"])
+        assert response.status_code == 201, response.text
+        return response.json()["data"]["experience"]
+
+    return create_experience
@@ -0,0 +1,88 @@
+import jwt
+
+from access_tokens import AccessTokens
+
+SECRET = "rihla-test-secret-at-least-32-bytes-long"
+USER = {"id": "u1", "email": "a@example.com", "isHost": True}
+
+
+def test_issue_and_verify():
+    tokens = AccessTokens(SECRET)
+    token, _ = tokens.issue(USER, "s1")
+    claims = tokens.verify(token)
+    assert (claims["sub"], claims["sid"], claims["isHost"], claims["isAdmin"]) == ("u1", "s1", True, False)
+    assert tokens.verify(token) == claims
+    assert (tokens.misses, tokens.hits) == (1, 1)
+
+
+def test_forged_or_foreign_tokens_are_rejected():
+    tokens = AccessTokens(SECRET)
+    assert tokens.verify("garbage") is None
+    forged = jwt.encode({"sub": "u1", "sid": "s1", "exp": 2_000_000_000, "typ": "access"}, "x" * 32, algorithm="HS256")
+    assert tokens.verify(forged) is None
+    refresh_like = jwt.encode({"sub": "u1", "sid": "s1", "exp": 2_000_000_000, "typ": "refresh"}, SECRET, algorithm="HS256")
+    assert tokens.verify(refresh_like) is None
+
+
+def test_expired_token_is_rejected_even_when_cached(clock):
+    tokens = AccessTokens(SECRET, ttl_seconds=60, clock=clock)
+    token, expires_at = tokens.issue(USER, "s1")
+    assert expires_at == clock.now + 60
+    assert tokens.verify(token) is not None
+    clock.now += 60
+    assert tokens.verify(token) is None
+    assert len(tokens) == 0
+
+
+def test_revoked_session_rejects_its_tokens():
+    tokens = AccessTokens(SECRET)
+    first, _ = tokens.issue(USER, "s1")
+    other, _ = tokens.issue(USER, "s2")
+    tokens.verify(first)
+    tokens.revoke_session("s1")
+    assert tokens.verify(first) is None
+    assert tokens.verify(other) is not None
+    assert tokens.stats()["revokedSessions"] == 1
+
+
+def test_cache_is_bounded():
+    tokens = AccessTokens(SECRET, cache_size=3)
+    for i in range(5):
+        tokens.verify(tokens.issue(USER, f"s{i}")[0])
+    assert len(tokens) == 3
+
+
+def test_refresh_rotates_the_session(client, signup):
+    account = signup()
+    old_refresh = account["tokens"]["refreshToken"]
+    response = client.post("/api/auth/refresh", json={"refreshToken": old_refresh})
+    assert response.status_code == 200
+    tokens = response.json()["data"]["tokens"]
+    assert tokens["refreshToken"] != old_refresh
+    assert client.get("/api/auth/me", headers=account["headers"]).status_code == 401
+    assert client.get("/api/auth/me", headers={"Authorization": f"Bearer {tokens['accessToken']}"}).status_code == 200
+    assert client.post("/api/auth/refresh", json={"refreshToken": old_refresh}).status_code == 401
+
+
+def test_logout_invalidates_access_and_refresh_tokens(client, signup):
+    account = signup()
+    assert client.post("/api/auth/logout", headers=account["headers"]).status_code == 200
+    assert client.get("/api/auth/me", headers=account["headers"]).status_code == 401
+    refreshed = client.post("/api/auth/refresh", json={"refreshToken": account["tokens"]["refreshToken"]})
+    assert refreshed.status_code == 401
+
+
+def test_refresh_rejects_malformed_bodies(client):
+    assert client.post("/api/auth/refresh", content=b"{").status_code == 400
+    assert client.post("/api/auth/refresh", json={}).status_code == 422
+    assert client.post("/api/auth/refresh", json={"refreshToken": "unknown"}).status_code == 401
+
+
+def test_revocations_are_purged_once_expired(clock):
+    tokens = AccessTokens(SECRET, ttl_seconds=60, clock=clock)
+    for minute in range(50):
+        for i in range(500):
+            tokens.revoke_session(f"s{minute}-{i}")
+        clock.now += 61
+    # Seules les révocations encore utiles (moins d'un TTL) et un lot en attente de nettoyage restent
+    assert tokens.stats()["revokedSessions"] < 2048
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from availability_store import AvailabilityStore
+
+
+def test_reserve_respects_capacity():
+    store = AvailabilityStore()
+    assert store.reserve("e1", "2026-08-01", 3, capacity=4)
+    assert not store.reserve("e1", "2026-08-01", 2, capacity=4)
+    assert store.reserve("e1", "2026-08-02", 4, capacity=4)
+    assert store.reserve("e1", "2026-08-01", 100)
+    store.release("e1", "2026-08-01", 200)
+    assert store.booked("e1", ["2026-08-01", "2026-08-02", "2026-08-03"]) == {"2026-08-02": 4}
+
+
+def test_concurrent_reservations_never_overbook():
+    store = AvailabilityStore(shards=4)
+
+    def reserve(_):
+        return store.reserve("e1", "2026-08-01", 1, capacity=10)
+
+    with ThreadPoolExecutor(16) as pool:
+        accepted = sum(pool.map(reserve, range(200)))
+    assert accepted == 10
+    assert store.booked("e1", ["2026-08-01"]) == {"2026-08-01": 10}
+
+
+def test_concurrent_bookings_get_409_once_full(client, signup, create_experience):
+    host = signup(is_host=True)
+    guests = [signup() for _ in range(4)]
+    exp = create_experience(host, groupSize=5)
+
+    def book(i):
+        guest = guests[i % len(guests)]
+        body = {"experienceId": exp["id"], "date": "2026-08-10"}
+        return client.post("/api/bookings", json=body, headers=guest["headers"]).status_code
+
+    with ThreadPoolExecutor(8) as pool:
+        statuses = list(pool.map(book, range(24)))
+    assert statuses.count(201) == 5
+    assert statuses.count(409) == 19
+    days = client.get(f"/api/experiences/{exp['id']}/availability",
+                      params={"from": "2026-08-10", "to": "2026-08-11"}).json()["data"]["days"]
+    assert days == [
+        {"date": "2026-08-10", "booked": 5, "available": 0},
+        {"date": "2026-08-11", "booked": 0, "available": 5},
+    ]
+
+
+def test_booking_is_checked_against_the_experience(client, signup, create_experience):
+    host = signup(is_host=True)
+    guest = signup()
+    exp = create_experience(host, groupSize=2)
+
+    def post(body):
+        return client.post("/api/bookings", json=body, headers=guest["headers"])
+
+    assert post({"experienceId": exp["id"], "date": "2026-08-12", "guests": 3}).status_code == 400
+    assert post({"experienceId": "missing", "date": "2026-08-12"}).status_code == 404
+    assert post({"experienceId": exp["id"], "date": "2026-08-12", "guests": 0}).status_code == 422
+    assert post({"experienceId": exp["id"], "date": "12/08/2026"}).status_code == 422
+    # Le statut est fixé par le serveur : un client ne peut pas contourner la capacité
+    assert post({"experienceId": exp["id"], "date": "2026-08-12", "guests": 2, "status": "cancelled"}).status_code == 422
+    assert post({"experienceId": exp["id"], "date": "2026-08-12", "status": "confirmed"}).status_code == 201
+    assert post({"experienceId": exp["id"], "date": "2026-08-12"}).status_code == 201
+    assert post({"experienceId": exp["id"], "date": "2026-08-13", "guests": 2}).status_code == 201
+    assert post({"experienceId": exp["id"], "date": "2026-08-12"}).status_code == 409
+
+
+def test_failed_insert_gives_the_seats_back(client, server, signup, create_experience, monkeypatch):
+    host = signup(is_host=True)
+    guest = signup()
+    exp = create_experience(host, groupSize=2)
+
+    async def broken(*args):
+        raise OSError(5, "injected")
+
+    body = {"experienceId": exp["id"], "date": "2026-08-20", "guests": 2}
+    with monkeypatch.context() as patch:
+        patch.setattr(server.bookings_db, "insert", broken)
+        patch.setattr(server.bookings_db, "insert_many", broken)
+        with pytest.raises(OSError):
+            client.post("/api/bookings", json=body, headers=guest["headers"])
+        with pytest.raises(OSError):
+            client.post("/api/bookings/batch", json=[body], headers=guest["headers"])
+    days = client.get(f"/api/experiences/{exp['id']}/availability",
+                      params={"from": "2026-08-20", "to": "2026-08-20"}).json()["data"]["days"]
+    assert days == [{"date": "2026-08-20", "booked": 0, "available": 2}]
+    assert client.post("/api/bookings", json=body, headers=guest["headers"]).status_code == 201
+
+
+def test_availability_rejects_bad_ranges(client, signup, create_experience):
+    host = signup(is_host=True)
+    exp = create_experience(host)
+    path = f"/api/experiences/{exp['id']}/availability"
+    assert client.get(path, params={"from": "2026-08-10", "to": "2026-08-01"}).status_code == 422
+    assert client.get(path, params={"from": "2026-01-01", "to": "2027-06-01"}).status_code == 422
+    assert client.get(path, params={"from": "soon"}).status_code == 422
+    assert client.get("/api/experiences/missing/availability").status_code == 404
@@ -0,0 +1,79 @@
+import json
+import uuid
+
+
+def experience(**fields):
+    return {
+        "title": "Atlas hike", "description": "Day hike", "category": "Adventure", "location": "Imlil",
+        "price": 300, "duration": "6 hours", "groupSize": 2, "highlights": ["Toubkal"], "images": ["atlas.jpg"],
+        **fields,
+    }
+
+
+def test_experience_batch_reports_each_item(client, signup):
+    host = signup(is_host=True)
+    category = uuid.uuid4().hex
+    items = [experience(category=category), {"title": "incomplete"}, "not an object", experience(category=category)]
+    response = client.post("/api/experiences/batch", json=items, headers=host["headers"])
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert (data["created"], data["failed"]) == (2, 2)
+    assert [r["success"] for r in data["results"]] == [True, False, False, True]
+    assert data["results"][1]["error"].startswith("Missing field")
+    listed = client.get("/api/experiences", params={"category": category}).json()["data"]["experiences"]
+    assert {exp["id"] for exp in listed} == {data["results"][0]["id"], data["results"][3]["id"]}
+
+
+def test_experience_batch_accepts_ndjson(client, signup):
+    host = signup(is_host=True)
+    body = "\n".join([json.dumps(experience()), "{broken", "", json.dumps(experience())])
+    response = client.post("/api/experiences/batch", content=body,
+                           headers={**host["headers"], "Content-Type": "application/x-ndjson"})
+    data = response.json()["data"]
+    assert (data["created"], data["failed"]) == (2, 1)
+    assert data["results"][1] == {"index": 1, "success": False, "error": "Invalid JSON"}
+
+
+def test_experience_batch_needs_a_host_and_an_array(client, signup):
+    guest = signup()
+    host = signup(is_host=True)
+    assert client.post("/api/experiences/batch", json=[experience()], headers=guest["headers"]).status_code == 403
+    assert client.post("/api/experiences/batch", json={"a": 1}, headers=host["headers"]).status_code == 422
+    assert client.post("/api/experiences/batch", content=b"{", headers=host["headers"]).status_code == 400
+
+
+def test_booking_batch_checks_capacity_per_item(client, signup, create_experience):
+    host = signup(is_host=True)
+    guest = signup()
+    exp = create_experience(host, groupSize=3)
+    items = [
+        {"experienceId": exp["id"], "date": "2026-07-01", "guests": 2},
+        {"experienceId": exp["id"], "date": "2026-07-01", "guests": 2},
+        {"experienceId": exp["id"], "date": "2026-07-01", "guests": 1},
+        {"experienceId": "missing", "date": "2026-07-01"},
+        {"experienceId": exp["id"], "date": "July"},
+    ]
+    data = client.post("/api/bookings/batch", json=items, headers=guest["headers"]).json()["data"]
+    assert [r["success"] for r in data["results"]] == [True, False, True, False, False]
+    assert (data["created"], data["failed"]) == (2, 3)
+    assert "capacity" in data["results"][1]["error"]
+    bookings = client.get("/api/bookings/my-bookings", headers=guest["headers"]).json()["data"]["bookings"]
+    assert sorted(b["guests"] for b in bookings) == [1, 2]
+
+
+def test_only_admins_import_bookings_for_others(client, signup, admin, create_experience):
+    host = signup(is_host=True)
+    guest = signup()
+    other = signup()
+    exp = create_experience(host, groupSize=10)
+    item = {"experienceId": exp["id"], "date": "2026-07-02", "userId": other["user"]["id"]}
+    client.post("/api/bookings/batch", json=[item], headers=guest["headers"])
+    client.post("/api/bookings/batch", json=[item], headers=admin["headers"])
+    mine = client.get("/api/bookings/my-bookings", headers=guest["headers"]).json()["data"]["bookings"]
+    theirs = client.get("/api/bookings/my-bookings", headers=other["headers"]).json()["data"]["bookings"]
+    assert len(mine) == 1 and len(theirs) == 1
+    # Seul l'import administrateur garde le statut fourni
+    item = {"experienceId": exp["id"], "date": "2026-07-03", "status": "cancelled"}
+    refused, = client.post("/api/bookings/batch", json=[item], headers=guest["headers"]).json()["data"]["results"]
+    imported, = client.post("/api/bookings/batch", json=[item], headers=admin["headers"]).json()["data"]["results"]
+    assert (refused["success"], imported["success"]) == (False, True)
@@ -0,0 +1,47 @@
+import random
+
+import httpx
+
+from benchmarks import bench_api
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert bench_api.percentile(values, 0.5) == 51
+    assert bench_api.percentile(values, 0.99) == 100
+    assert bench_api.percentile([], 0.5) is None
+
+
+def test_every_scenario_runs_without_errors(client, server):
+    """A tiny seeded run of each scenario, on the app the tests already started."""
+
+    async def run():
+        rng = random.Random(7)
+        user_ids, experience_ids = await bench_api.seed(20, 10, 50, rng)
+        tokens = [(await server.issue_tokens(await server.users_db.get(user_id)))["accessToken"]
+                  for user_id in user_ids[:5]]
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="https://rihlama.com") as http:
+            return {
+                name: await bench_api.run_scenario(http, factory, 0.05, 2, n)
+                for n, (name, factory) in enumerate(bench_api.scenarios(user_ids, experience_ids, tokens).items())
+            }
+
+    results = client.portal.call(run)
+    assert len(results) == 10
+    for name, result in results.items():
+        assert result["requests"] > 0, name
+        assert result["errors"] == 0, name
+        assert result["p50_ms"] <= result["p99_ms"] <= result["max_ms"]
+
+
+def test_compare_prints_relative_changes(capsys):
+    baseline = {"commit": "abc", "results": {"GET /health": {"rps": 100.0, "p50_ms": 2.0, "p99_ms": 4.0}}}
+    report = {"results": {
+        "GET /health": {"rps": 150.0, "p50_ms": 1.0, "p99_ms": 4.0},
+        "GET /api/auth/me": {"rps": 10.0, "p50_ms": 1.0, "p99_ms": 1.0},
+    }}
+    bench_api.compare(report, baseline)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[-1].split() == ["GET", "/health", "+50.0%", "-50.0%", "+0.0%"]
+    assert not any("auth/me" in line for line in lines)
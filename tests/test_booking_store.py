@@ -0,0 +1,144 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from booking_store import BookingStore
+from pagination import encode_cursor
+
+
+def booking(i, user_id="u1", day="2026-03-01", experience_id="e1"):
+    return {"id": f"b{i}", "userId": user_id, "experienceId": experience_id, "date": day, "guests": 1}
+
+
+def pages(store, user_id, limit, descending=False):
+    seen, after = [], None
+    while True:
+        page, after = store.for_user(user_id, after=after, limit=limit, descending=descending)
+        seen.extend(b["id"] for b in page)
+        if after is None:
+            return seen
+
+
+def test_for_user_orders_by_date_then_insertion():
+    store = BookingStore()
+    store.insert(booking(0, day="2026-03-05"))
+    store.insert(booking(1, day="2026-03-01"))
+    store.insert(booking(2, user_id="u2", day="2026-03-02"))
+    store.insert(booking(3, day="2026-03-01"))
+    page, next_key = store.for_user("u1")
+    assert [b["id"] for b in page] == ["b1", "b3", "b0"]
+    assert next_key is None
+    assert store.count_for_user("u1") == 3
+    assert store.for_user("nobody") == ([], None)
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_pages_cover_every_booking_once(descending):
+    store = BookingStore()
+    for i in range(23):
+        store.insert(booking(i, day=f"2026-03-{i % 7 + 1:02d}"))
+    expected = [b["id"] for b in store.for_user("u1", limit=100, descending=descending)[0]]
+    assert len(expected) == 23
+    for limit in (1, 5, 23):
+        assert pages(store, "u1", limit, descending) == expected
+
+
+def test_insert_many_matches_single_inserts():
+    one, many = BookingStore(), BookingStore()
+    bookings = [booking(i, user_id=f"u{i % 3}", day=f"2026-04-{i % 5 + 1:02d}") for i in range(30)]
+    for b in bookings:
+        one.insert(b)
+    many.insert_many(bookings[:10])
+    many.insert_many(bookings[10:])
+    for user_id in ("u0", "u1", "u2"):
+        assert one.for_user(user_id, limit=50) == many.for_user(user_id, limit=50)
+    assert one.for_experience("e1", limit=50) == many.for_experience("e1", limit=50)
+
+
+def test_get_and_in_order():
+    store = BookingStore()
+    for i in range(5):
+        store.insert(booking(i))
+    assert store.get("b3")["id"] == "b3"
+    assert store.get("missing") is None
+    first, key = store.in_order(limit=3)
+    rest, last_key = store.in_order(after=key, limit=3)
+    assert [b["id"] for b in first + rest] == [f"b{i}" for i in range(5)]
+    assert last_key is None
+
+
+def api_booking(user_id, experience_id, day="2026-06-01", **fields):
+    """A booking shaped as the API builds it, with its own copy of every string."""
+    return {"id": str(uuid.uuid4()), "userId": "".join(user_id), "experienceId": "".join(experience_id),
+            "date": day, "guests": 2, "status": "confirmed",
+            "createdAt": datetime.now(timezone.utc).isoformat(), **fields}
+
+
+def test_columns_round_trip_and_share_ids():
+    store = BookingStore()
+    user_id, experience_id = str(uuid.uuid4()), str(uuid.uuid4())
+    fitting = [api_booking(user_id, experience_id, day=f"2026-06-0{i + 1}") for i in range(3)]
+    odd = [api_booking(user_id, experience_id, note="window seat"), api_booking(user_id, experience_id, guests=1.5),
+           {**api_booking(user_id, experience_id), "id": "legacy-1"}]
+    store.insert_many(fitting[:2] + odd)
+    store.insert(fitting[2])
+    for booking in fitting + odd:
+        assert store.get(booking["id"]) == booking and booking["id"] in store
+    assert list(store.snapshot()) == fitting[:2] + odd + fitting[2:]
+    page, _ = store.for_user(user_id, limit=10)
+    assert {b["id"] for b in page} == {b["id"] for b in fitting + odd}
+    # Les identifiants sont conservés une seule fois, quelle que soit la réservation
+    first, second = store.get(fitting[0]["id"]), store.get(fitting[1]["id"])
+    assert first["userId"] is second["userId"] and first["experienceId"] is second["experienceId"]
+    assert store.seats_by_day({"confirmed"})[(experience_id, "2026-06-01")] == 2 + 2 + 1.5 + 2
+
+
+def test_reads_hand_out_copies_and_discard_invalidates_them():
+    store = BookingStore(cached_rows=8)
+    kept = api_booking("u1", "e1")
+    store.insert(kept)
+    store.get(kept["id"])["guests"] = 99
+    assert store.for_user("u1")[0][0]["guests"] == 2
+    dropped = api_booking("u1", "e1", day="2026-06-02")
+    store.insert(dropped)
+    assert store.get(dropped["id"]) == dropped
+    store.discard([dropped])
+    assert store.get(dropped["id"]) is None and store.count_for_user("u1") == 1
+    # La ligne libérée est réutilisée : le cache ne doit pas rendre l'ancienne réservation
+    replacement = api_booking("u2", "e2", day="2026-06-03", guests=5)
+    store.insert(replacement)
+    assert store.for_user("u2")[0] == [replacement]
+    assert store.for_user("u1")[0] == [kept]
+
+
+def test_my_bookings_pages(client, signup, create_experience):
+    host = signup(is_host=True)
+    guest = signup()
+    experience = create_experience(host, groupSize=50)
+    for day in ("2026-05-03", "2026-05-01", "2026-05-02"):
+        response = client.post("/api/bookings", json={"experienceId": experience["id"], "date": day},
+                               headers=guest["headers"])
+        assert response.status_code == 201, response.text
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/bookings/my-bookings", params=params, headers=guest["headers"]).json()["data"]
+        seen.extend(b["date"] for b in data["bookings"])
+        cursor = data["nextCursor"]
+        if cursor is None:
+            break
+    assert seen == ["2026-05-01", "2026-05-02", "2026-05-03"]
+
+
+@pytest.mark.parametrize("cursor", [
+    "garbage",
+    encode_cursor(("x",)),
+    encode_cursor((1, 2, 3)),
+    encode_cursor(("2026-05-01", "1", "b1")),
+    encode_cursor(("not-a-date", 1, "b1")),
+])
+def test_my_bookings_rejects_bad_cursors(client, signup, cursor):
+    guest = signup()
+    response = client.get("/api/bookings/my-bookings", params={"cursor": cursor}, headers=guest["headers"])
+    assert response.status_code == 400
@@ -0,0 +1,68 @@
+import asyncio
+
+from change_feed import ChangeFeed
+from repository import create_repository
+
+
+def test_feed_delivers_other_workers_writes(tmp_path):
+    """Two repositories on one SQLite file stand for two worker processes."""
+    path = str(tmp_path / "rihla.db")
+
+    async def main():
+        writer = create_repository("sqlite", path=path)
+        reader = create_repository("sqlite", path=path)
+        await writer.connect()
+        await reader.connect()
+        await writer.experiences.insert({"id": "old", "title": "Before the feed started"})
+        feed = ChangeFeed(reader, batch=2)
+        received = []
+
+        async def on_experiences(keys):
+            received.append(list(keys))
+
+        feed.subscribe("experiences", on_experiences)
+        await feed.start()
+        await feed.stop()
+        await writer.experiences.insert_many([{"id": f"e{i}", "title": "Tour"} for i in range(3)])
+        await writer.users.insert({"id": "u1", "email": "a@example.com"})
+        await writer.users.update("u1", {"bio": "Guide"})
+        assert await feed.poll() == 4
+        assert await feed.poll() == 0
+        await writer.close()
+        await reader.close()
+        return received, feed.last_seq
+
+    received, last_seq = asyncio.run(main())
+    # Lots de 2 entrées : e0, e1 puis e2 (l'entrée "users" n'a pas d'abonné)
+    assert received == [["e0", "e1"], ["e2"]]
+    assert last_seq > 0
+
+
+def test_failing_handler_does_not_stop_the_feed(tmp_path):
+    path = str(tmp_path / "rihla.db")
+
+    async def main():
+        repo = create_repository("sqlite", path=path)
+        await repo.connect()
+        feed = ChangeFeed(repo, interval=0.01)
+        calls = []
+
+        async def flaky(keys):
+            calls.append(keys)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+
+        feed.subscribe("experiences", flaky)
+        await feed.start()
+        await repo.experiences.insert({"id": "e1", "title": "Tour"})
+        for _ in range(200):
+            if len(calls) >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await feed.stop()
+        await repo.close()
+        return calls
+
+    calls = asyncio.run(main())
+    # L'entrée est redistribuée au tour suivant : les abonnés doivent être idempotents
+    assert calls[:2] == [["e1"], ["e1"]]
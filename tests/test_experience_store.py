@@ -0,0 +1,160 @@
+import random
+import uuid
+
+import pytest
+
+from experience_store import ExperienceStore
+from pagination import encode_cursor
+
+CATEGORIES = ["Adventure", "Food", "Culture"]
+LOCATIONS = ["Marrakech", "Fes", " marrakech "]
+
+
+@pytest.fixture(scope="module")
+def store():
+    rng = random.Random(4)
+    store = ExperienceStore()
+    experiences = [
+        {
+            "id": f"e{i}",
+            "category": rng.choice(CATEGORIES),
+            "location": rng.choice(LOCATIONS),
+            "price": rng.choice([100, 250, "300", 450.5, None]),
+            "groupSize": rng.choice([2, 6, 12]),
+        }
+        for i in range(200)
+    ]
+    store.insert_many(experiences[:50])
+    for experience in experiences[50:]:
+        store.insert(experience)
+    store.inserted = experiences
+    return store
+
+
+def price(experience):
+    value = experience["price"]
+    return float(value) if value is not None else None
+
+
+def expected(store, category=None, location=None, min_price=None, max_price=None, group_size=None,
+             sort_by="createdAt", descending=True):
+    """The same query by brute force over every experience."""
+    def keep(exp):
+        if category and exp["category"].lower() != category.lower():
+            return False
+        if location and exp["location"].strip().lower() != location.strip().lower():
+            return False
+        if (min_price is not None or max_price is not None) and price(exp) is None:
+            return False
+        if min_price is not None and price(exp) < min_price:
+            return False
+        if max_price is not None and price(exp) > max_price:
+            return False
+        return group_size is None or exp["groupSize"] >= group_size
+
+    seq = {exp["id"]: i for i, exp in enumerate(store.inserted)}
+    matches = [exp for exp in store.inserted if keep(exp)]
+    if sort_by == "price":
+        matches = [exp for exp in matches if price(exp) is not None]
+        matches.sort(key=lambda exp: (price(exp), seq[exp["id"]]), reverse=descending)
+    elif descending:
+        matches.reverse()
+    return [exp["id"] for exp in matches]
+
+
+def all_pages(store, limit, **filters):
+    seen, after = [], None
+    while True:
+        page, after = store.query(after=after, limit=limit, **filters)
+        seen.extend(exp["id"] for exp in page)
+        if after is None:
+            return seen
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"descending": False},
+    {"category": "adventure"},
+    {"location": "Marrakech"},
+    {"category": "Food", "location": "fes", "group_size": 6},
+    {"min_price": 200, "max_price": 400},
+    {"sort_by": "price"},
+    {"sort_by": "price", "descending": False, "min_price": 250},
+    {"sort_by": "price", "category": "Culture", "max_price": 300},
+    {"group_size": 12},
+    {"group_size": 7, "min_price": 200, "descending": False},
+    {"min_price": 450, "location": "marrakech"},
+    {"sort_by": "price", "group_size": 12},
+    {"sort_by": "price", "descending": False, "category": "Food", "group_size": 12, "min_price": 100},
+])
+def test_query_pages_match_brute_force(store, filters):
+    assert all_pages(store, 7, **filters) == expected(store, **filters)
+    assert all_pages(store, 500, **filters) == expected(store, **filters)
+
+
+def test_query_scans_only_the_smallest_candidate_set():
+    store = ExperienceStore()
+    store.insert_many([
+        {"id": f"e{i}", "category": "Food" if i % 2 else "Culture", "price": i, "groupSize": 20 if i % 100 == 0 else 4}
+        for i in range(1000)
+    ])
+
+    def scanned(**filters):
+        before = store.scanned
+        ids = all_pages(store, 3, **filters)
+        return ids, store.scanned - before
+
+    # Dix expériences pour vingt personnes, dix prix entre 500 et 509 : aucune page ne doit parcourir le reste
+    ids, count = scanned(group_size=12)
+    assert ids == [f"e{i}" for i in range(900, -1, -100)] and count <= 10 + 4
+    ids, count = scanned(min_price=500, max_price=509, category="Food")
+    assert ids == [f"e{i}" for i in range(509, 500, -2)] and count <= 10 + 4
+    ids, count = scanned(sort_by="price", category="Culture", group_size=12, descending=False)
+    assert ids == [f"e{i}" for i in range(0, 1000, 100)] and count <= 10 + 4
+    assert store.stats()["queries"] == 10
+
+
+def test_get_and_in_order(store):
+    assert store.get("e10")["id"] == "e10"
+    assert store.get("missing") is None
+    first, key = store.in_order(limit=150)
+    rest, last_key = store.in_order(after=key, limit=150)
+    assert [exp["id"] for exp in first + rest] == [exp["id"] for exp in store.inserted]
+    assert last_key is None
+
+
+def test_experiences_endpoint_pages(client, signup, create_experience):
+    host = signup(is_host=True)
+    category = uuid.uuid4().hex
+    for value in (300, 100, 200):
+        create_experience(host, category=category, price=value)
+    seen, cursor = [], None
+    while True:
+        params = {"category": category, "sortBy": "price", "order": "asc", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/api/experiences", params=params).json()["data"]
+        seen.extend(exp["price"] for exp in data["experiences"])
+        cursor = data["nextCursor"]
+        if cursor is None:
+            break
+    assert seen == [100, 200, 300]
+
+
+@pytest.mark.parametrize("sort_by, cursor", [
+    ("createdAt", "garbage"),
+    ("createdAt", encode_cursor(("x",))),
+    ("createdAt", encode_cursor((True,))),
+    ("createdAt", encode_cursor((1, 2))),
+    ("price", encode_cursor((1,))),
+    ("price", encode_cursor(("100", 1))),
+    ("price", encode_cursor((100, 1.5))),
+])
+def test_experiences_endpoint_rejects_bad_cursors(client, sort_by, cursor):
+    response = client.get("/api/experiences", params={"sortBy": sort_by, "cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_experiences_endpoint_rejects_unknown_sort(client):
+    assert client.get("/api/experiences", params={"sortBy": "title"}).status_code == 422
+    assert client.get("/api/experiences", params={"order": "up"}).status_code == 422
@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import encode_cursor
+from tests.conftest import ADMIN_EMAIL, PASSWORD
+
+
+def read_export(response):
+    """``(records, cursors)`` of an NDJSON export body."""
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records, cursors = [], []
+    for line in response.text.splitlines():
+        item = json.loads(line)
+        if set(item) == {"nextCursor"}:
+            cursors.append(item["nextCursor"])
+        else:
+            records.append(item)
+    return records, cursors
+
+
+def test_experience_export_pages_and_resumes(client, server, signup, create_experience, monkeypatch):
+    monkeypatch.setattr(server, "EXPORT_BATCH", 2)
+    host = signup(is_host=True)
+    since = datetime.now(timezone.utc).isoformat()
+    created = [create_experience(host, title=f"Export {i}")["id"] for i in range(5)]
+    response = client.get("/api/experiences/export", params={"since": since})
+    records, cursors = read_export(response)
+    assert [exp["id"] for exp in records] == created
+    assert cursors[-1] is None and len(cursors) >= 3
+    # Reprise au curseur qui suit le premier lot exporté
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    first = next(i for i, item in enumerate(lines) if "id" in item)
+    cursor = next(item["nextCursor"] for item in lines[first:] if "nextCursor" in item)
+    done = sum(1 for item in lines[:lines.index({"nextCursor": cursor})] if "id" in item)
+    resumed, _ = read_export(client.get("/api/experiences/export", params={"since": since, "cursor": cursor}))
+    assert [exp["id"] for exp in resumed] == created[done:]
+    assert 0 < done < len(created)
+
+
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor(("x",)), encode_cursor((1, 2)), encode_cursor((False,))])
+def test_export_rejects_bad_cursors(client, cursor):
+    assert client.get("/api/experiences/export", params={"cursor": cursor}).status_code == 400
+
+
+def test_export_rejects_bad_since(client):
+    assert client.get("/api/experiences/export", params={"since": "yesterday"}).status_code == 422
+
+
+def test_booking_and_user_exports_need_an_admin(client, signup, admin):
+    user = signup()
+    for path in ("/api/bookings/export", "/api/users/export"):
+        assert client.get(path, headers=user["headers"]).status_code == 403
+        assert client.get(path, headers=admin["headers"]).status_code == 200
+
+
+def test_user_export_omits_passwords(client, signup, admin):
+    since = datetime.now(timezone.utc).isoformat()
+    account = signup()
+    records, _ = read_export(client.get("/api/users/export", params={"since": since}, headers=admin["headers"]))
+    assert [user["id"] for user in records] == [account["user"]["id"]]
+    assert "password" not in records[0]
+
+
+def test_admin_email_cannot_be_registered(client):
+    response = client.post("/api/auth/register", json={
+        "firstName": "Mallory", "lastName": "X", "email": ADMIN_EMAIL.upper(), "password": PASSWORD,
+    })
+    assert response.status_code == 403
+
+
+def test_admin_email_cannot_be_taken_through_the_profile(client, signup):
+    account = signup()
+    response = client.put("/api/users/profile", json={"email": ADMIN_EMAIL}, headers=account["headers"])
+    assert response.status_code == 403
+    refreshed = client.post("/api/auth/refresh", json={"refreshToken": account["tokens"]["refreshToken"]})
+    headers = {"Authorization": f"Bearer {refreshed.json()['data']['tokens']['accessToken']}"}
+    assert client.get("/api/users/export", headers=headers).status_code == 403
+
+
+def test_admin_keeps_its_rights_across_refresh(client, admin):
+    refreshed = client.post("/api/auth/refresh", json={"refreshToken": admin["tokens"]["refreshToken"]})
+    assert refreshed.status_code == 200
+    admin["tokens"] = refreshed.json()["data"]["tokens"]
+    admin["headers"] = {"Authorization": f"Bearer {admin['tokens']['accessToken']}"}
+    assert client.get("/api/users/export", headers=admin["headers"]).status_code == 200
@@ -0,0 +1,98 @@
+import random
+
+import pytest
+
+from geo_index import GeoIndex, haversine_km, parse_coordinates
+
+
+def brute_force(points, lat, lng, radius_km=None, limit=20):
+    distances = sorted(
+        (haversine_km(lat, lng, point_lat, point_lng), experience_id)
+        for experience_id, (point_lat, point_lng) in points.items()
+    )
+    return [(experience_id, d) for d, experience_id in distances if radius_km is None or d <= radius_km][:limit]
+
+
+def random_points(rng, n, lat_range=(-89.9, 89.9), lng_range=(-180, 180)):
+    return {f"e{i}": (rng.uniform(*lat_range), rng.uniform(*lng_range)) for i in range(n)}
+
+
+def index_of(points, cell_degrees=0.05):
+    index = GeoIndex(cell_degrees=cell_degrees)
+    index.add_many({"id": i, "coordinates": {"lat": lat, "lng": lng}} for i, (lat, lng) in points.items())
+    return index
+
+
+def assert_same(result, expected):
+    assert [i for i, _ in result] == [i for i, _ in expected]
+    assert [d for _, d in result] == pytest.approx([d for _, d in expected])
+
+
+def test_haversine():
+    assert haversine_km(31.63, -8.0, 31.63, -8.0) == 0
+    # Marrakech - Fès : environ 390 km à vol d'oiseau
+    assert 380 < haversine_km(31.63, -8.0, 34.03, -5.0) < 400
+
+
+@pytest.mark.parametrize("cell_degrees", [0.05, 1.0])
+def test_nearest_matches_brute_force(cell_degrees):
+    rng = random.Random(21)
+    # Un amas dense autour de Marrakech et des points épars sur tout le globe
+    points = {**random_points(rng, 500, (31.5, 31.8), (-8.1, -7.9)), **{
+        f"w{i}": point for i, point in random_points(rng, 500).items()}}
+    index = index_of(points, cell_degrees)
+    for lat, lng in [(31.63, -8.0), (0, 0), (89.5, 10), (-60, 179.99), (10, -179.99)]:
+        for limit in (1, 7, 50):
+            assert_same(index.nearby(lat, lng, limit=limit), brute_force(points, lat, lng, limit=limit))
+        for radius in (1, 25, 3000):
+            assert_same(index.nearby(lat, lng, radius_km=radius, limit=1000),
+                        brute_force(points, lat, lng, radius, limit=1000))
+
+
+def test_sparse_index_finds_far_points():
+    points = {"north": (80.0, 0.0), "south": (-80.0, 170.0)}
+    index = index_of(points)
+    assert [i for i, _ in index.nearby(0, 0, limit=5)] == ["north", "south"]
+    assert index.nearby(0, 0, limit=0) == []
+
+
+def test_add_skips_missing_and_invalid_coordinates():
+    index = GeoIndex()
+    index.add_many([
+        {"id": "a", "coordinates": {"lat": 10, "lng": 10}},
+        {"id": "b"},
+        {"id": "c", "coordinates": {"lat": 91, "lng": 0}},
+        {"id": "a", "coordinates": {"lat": 20, "lng": 20}},
+    ])
+    assert len(index) == 1 and "a" in index
+    assert index.nearby(10, 10) == [("a", 0.0)]
+
+
+@pytest.mark.parametrize("value", [None, [1, 2], {"lat": "1", "lng": 2}, {"lat": True, "lng": 0}, {"lat": 0, "lng": 181}])
+def test_parse_coordinates_rejects(value):
+    with pytest.raises(ValueError):
+        parse_coordinates(value)
+
+
+def test_nearby_endpoint_orders_by_distance(client, signup, create_experience):
+    host = signup(is_host=True)
+    # Point d'origine tiré au hasard : les expériences des autres tests en sont loin
+    rng = random.Random()
+    lat, lng = rng.uniform(-50, 50), rng.uniform(-170, 170)
+    far = create_experience(host, coordinates={"lat": lat + 0.02, "lng": lng})
+    near = create_experience(host, coordinates={"lat": lat + 0.01, "lng": lng})
+    create_experience(host)
+    data = client.get("/api/experiences/nearby", params={"lat": lat, "lng": lng, "radius": 5}).json()["data"]
+    assert [exp["id"] for exp in data["experiences"]] == [near["id"], far["id"]]
+    assert data["count"] == 2
+    assert data["experiences"][0]["distanceKm"] == pytest.approx(1.112, abs=0.01)
+
+
+def test_nearby_endpoint_validation(client, signup):
+    assert client.get("/api/experiences/nearby", params={"lat": 91, "lng": 0}).status_code == 422
+    assert client.get("/api/experiences/nearby", params={"lat": 0, "lng": 0, "radius": 0}).status_code == 422
+    assert client.get("/api/experiences/nearby", params={"lat": "north", "lng": 0}).status_code == 422
+    host = signup(is_host=True)
+    body = {"title": "t", "description": "d", "category": "c", "location": "l", "price": 1, "duration": "1h",
+            "groupSize": 1, "highlights": [], "images": ["i"], "coordinates": {"lat": 100, "lng": 0}}
+    assert client.post("/api/experiences", json=body, headers=host["headers"]).status_code == 422
@@ -0,0 +1,93 @@
+import uuid
+
+from idempotency import IN_FLIGHT, MISMATCH, IdempotencyCache
+
+
+def test_first_request_runs_then_replays():
+    cache = IdempotencyCache()
+    assert cache.start("k", b"body") is None
+    assert cache.start("k", b"body") is IN_FLIGHT
+    cache.finish("k", b"body", 201, b'{"ok":true}')
+    assert cache.start("k", b"body") == (201, b'{"ok":true}')
+    assert cache.start("k", b"other") is MISMATCH
+
+
+def test_abandoned_request_can_be_retried():
+    cache = IdempotencyCache()
+    cache.start("k", b"body")
+    cache.abandon("k")
+    assert cache.start("k", b"body") is None
+
+
+def test_entries_expire(clock):
+    cache = IdempotencyCache(ttl_seconds=10, clock=clock)
+    cache.start("k", b"body")
+    cache.finish("k", b"body", 201, b"{}")
+    clock.now += 11
+    assert cache.start("k", b"body") is None
+
+
+def test_in_flight_claims_are_never_evicted(clock):
+    cache = IdempotencyCache(ttl_seconds=10, max_entries=1, clock=clock)
+    assert cache.start("a", b"body") is None
+    assert cache.start("b", b"body") is None
+    cache.start("c", b"")
+    cache.finish("c", b"", 201, b"{}")
+    assert cache.start("a", b"body") is IN_FLIGHT
+    assert cache.start("b", b"other") is MISMATCH
+    cache.finish("a", b"body", 201, b"{}")
+    assert cache.start("b", b"body") is IN_FLIGHT
+    assert cache.stats()["inFlight"] == 1 and cache.stats()["entries"] == 1
+    # Requête morte sans appeler abandon() : sa clé se libère au bout du TTL
+    clock.now += 11
+    assert cache.start("b", b"body") is None
+
+
+def test_stored_bytes_are_bounded():
+    cache = IdempotencyCache(max_bytes=10)
+    for key in ("a", "b", "c"):
+        cache.start(key, b"")
+        cache.finish(key, b"", 201, b"12345")
+    assert cache.stats()["bytes"] <= 10
+    assert cache.start("a", b"") is None
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_retried_booking_is_created_once(client, signup, create_experience):
+    host = signup(is_host=True)
+    guest = signup()
+    exp = create_experience(host, groupSize=10)
+    body = {"experienceId": exp["id"], "date": "2026-09-01"}
+    headers = {**guest["headers"], "Idempotency-Key": uuid.uuid4().hex}
+    first = client.post("/api/bookings", json=body, headers=headers)
+    again = client.post("/api/bookings", json=body, headers=headers)
+    assert first.status_code == again.status_code == 201
+    assert again.headers["idempotent-replayed"] == "true"
+    assert again.json() == first.json()
+    bookings = client.get("/api/bookings/my-bookings", headers=guest["headers"]).json()["data"]["bookings"]
+    assert len(bookings) == 1
+    different = client.post("/api/bookings", json={**body, "guests": 2}, headers=headers)
+    assert different.status_code == 422
+
+
+def test_failed_request_is_not_replayed(client, signup, create_experience):
+    host = signup(is_host=True)
+    guest = signup()
+    exp = create_experience(host, groupSize=1)
+    headers = {**guest["headers"], "Idempotency-Key": uuid.uuid4().hex}
+    body = {"experienceId": exp["id"], "date": "2026-09-02", "guests": 2}
+    assert client.post("/api/bookings", json=body, headers=headers).status_code == 400
+    retry = client.post("/api/bookings", json=body, headers=headers)
+    assert retry.status_code == 400
+    assert "idempotent-replayed" not in retry.headers
+
+
+def test_keys_are_scoped_to_the_user(client, signup, create_experience):
+    host = signup(is_host=True)
+    exp = create_experience(host, groupSize=10)
+    key = uuid.uuid4().hex
+    body = {"experienceId": exp["id"], "date": "2026-09-03"}
+    first, second = signup(), signup()
+    a = client.post("/api/bookings", json=body, headers={**first["headers"], "Idempotency-Key": key})
+    b = client.post("/api/bookings", json=body, headers={**second["headers"], "Idempotency-Key": key})
+    assert a.json()["data"]["booking"]["id"] != b.json()["data"]["booking"]["id"]
@@ -0,0 +1,93 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from locks import LOCK_STATS, RWLock, ShardedRWLock
+from user_store import DuplicateEmailError, UserStore
+
+
+def test_readers_share_the_lock():
+    lock = RWLock()
+    inside = threading.Barrier(3, timeout=5)
+
+    def read():
+        with lock.read():
+            inside.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    inside.wait()
+    for thread in threads:
+        thread.join()
+
+
+def test_writer_excludes_readers_and_writers():
+    lock = RWLock()
+    active = []
+    overlaps = []
+
+    def work(mode):
+        with getattr(lock, mode)():
+            active.append(mode)
+            if "write" in active and len(active) > 1:
+                overlaps.append(list(active))
+            time.sleep(0.001)
+            active.remove(mode)
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(work, ["read", "write"] * 50))
+    assert overlaps == []
+
+
+def test_waiting_writer_blocks_new_readers():
+    lock = RWLock()
+    order = []
+    lock.acquire_read()
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), order.append("write"), lock.release_write()))
+    writer.start()
+    while not lock._writers_waiting:
+        time.sleep(0.001)
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), order.append("read"), lock.release_read()))
+    reader.start()
+    time.sleep(0.02)
+    assert order == []
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert order == ["write", "read"]
+
+
+def test_named_locks_record_their_stats():
+    lock = RWLock("test_locks")
+    with lock.read():
+        pass
+    with lock.write():
+        pass
+    stats = LOCK_STATS["test_locks"]
+    assert (stats.reads, stats.writes) == (1, 1)
+    assert stats.write_hold >= 0
+
+
+def test_sharded_lock_picks_a_stable_shard():
+    locks = ShardedRWLock(shards=8)
+    assert len(locks) == 8
+    assert locks.for_key("user-1") is locks.for_key("user-1")
+    assert len({id(locks.for_key(f"user-{i}")) for i in range(100)}) > 1
+
+
+def test_concurrent_inserts_keep_emails_unique():
+    store = UserStore()
+    emails = [f"user{i % 50}@example.com" for i in range(400)]
+
+    def insert(i):
+        try:
+            store.insert({"id": f"u{i}", "email": emails[i]})
+            return True
+        except DuplicateEmailError:
+            return False
+
+    with ThreadPoolExecutor(16) as pool:
+        inserted = sum(pool.map(insert, range(400)))
+    assert inserted == len(store) == 50
+    assert all(store.get_by_email(email) is not None for email in set(emails))
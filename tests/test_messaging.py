@@ -0,0 +1,128 @@
+import json
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from message_hub import OVERFLOW, SESSION_ENDED, MessageHub
+from message_store import MessageStore, new_conversation
+
+# websocket_connect ignore base_url : l'URL absolue passe TrustedHost et HTTPSRedirect
+WS = "wss://rihlama.com/api/messages/ws"
+
+
+def drain(subscription):
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def by_type(socket, count):
+    frames = [socket.receive_json() for _ in range(count)]
+    return {frame["type"]: frame for frame in frames}
+
+
+def test_hub_fans_out_to_every_connection_of_the_recipients():
+    hub = MessageHub()
+    phone, laptop, other, outsider = hub.connect("u1"), hub.connect("u1"), hub.connect("u2"), hub.connect("u3")
+    assert hub.publish(["u1", "u2"], {"type": "message", "n": 1}, key="m1") == 3
+    assert hub.publish(["u1", "u2"], {"type": "message", "n": 1}, key="m1") == 0
+    assert hub.seen("m1")
+    assert [json.loads(e) for e in drain(phone)] == [{"type": "message", "n": 1}]
+    assert len(drain(laptop)) == len(drain(other)) == 1
+    assert drain(outsider) == []
+    hub.disconnect(laptop)
+    hub.disconnect(laptop)
+    assert len(hub) == 3 and hub.publish(["u1"], {"n": 2}) == 1
+
+
+def test_slow_connection_is_closed_without_blocking_others():
+    hub = MessageHub(queue_size=3)
+    slow, fast = hub.connect("u1"), hub.connect("u2")
+    for n in range(5):
+        hub.publish(["u1", "u2"], {"n": n})
+        drain(fast)
+    assert drain(slow) == [OVERFLOW]
+    assert hub.stats()["overflows"] == 1
+    assert hub.publish(["u1", "u2"], {"n": 5}) == 1
+
+
+def test_close_session_only_closes_its_connections():
+    hub = MessageHub()
+    mine, other = hub.connect("u1", session="s1"), hub.connect("u1", session="s2")
+    hub.publish(["u1"], {"n": 1})
+    hub.close_session("s1")
+    assert drain(mine) == [SESSION_ENDED]
+    assert len(drain(other)) == 1
+
+
+def test_message_store_pages_both_ways():
+    store = MessageStore()
+    conversation = store.open_conversation(new_conversation("c1", ["u1", "u2"], None, "2026-01-01"))
+    for n in range(1, 8):
+        store.append(conversation["id"], {"id": f"m{n}", "senderId": "u1" if n % 2 else "u2", "text": str(n)})
+    page, after = store.messages("c1", limit=3)
+    assert [m["seq"] for m in page] == [7, 6, 5] and after == (5,)
+    page, after = store.messages("c1", after=after, limit=3)
+    assert [m["seq"] for m in page] == [4, 3, 2]
+    assert [m["seq"] for m in store.messages("c1", after=after, limit=3)[0]] == [1]
+    page, after = store.messages("c1", after=(5,), limit=3, descending=False)
+    assert [m["seq"] for m in page] == [6, 7] and after is None
+    read = store.mark_read("c1", "u2", 5)
+    assert (read["readSeq"]["u2"], read["unread"]["u2"]) == (5, 1)
+    assert store.get_message("m3")["seq"] == 3
+
+
+def test_websocket_receives_messages_and_read_receipts(client, signup):
+    alice, bob = signup(), signup()
+    with client.websocket_connect(f"{WS}?token={bob['tokens']['accessToken']}") as bob_socket, \
+            client.websocket_connect(WS, headers=alice["headers"]) as alice_socket:
+        sent = client.post("/api/messages", json={"recipientId": bob["user"]["id"], "text": "Salam"},
+                           headers=alice["headers"])
+        assert sent.status_code == 201
+        message = sent.json()["data"]["message"]
+        for socket in (bob_socket, alice_socket):
+            event = socket.receive_json()
+            assert (event["type"], event["message"]["id"]) == ("message", message["id"])
+        bob_socket.send_json({"type": "read", "messageId": message["id"], "ref": 1})
+        # La réponse et les événements diffusés arrivent dans un ordre quelconque
+        frames = by_type(bob_socket, 2)
+        assert frames["ack"] == {"type": "ack", "ref": 1, "conversationId": message["conversationId"], "readSeq": 1}
+        for receipt in (frames["read"], alice_socket.receive_json()):
+            assert (receipt["type"], receipt["userId"], receipt["readSeq"]) == ("read", bob["user"]["id"], 1)
+        bob_socket.send_json({"type": "send", "conversationId": message["conversationId"], "text": "Salam!", "ref": 2})
+        frames = by_type(bob_socket, 2)
+        assert frames["sent"]["message"] == frames["message"]["message"] == alice_socket.receive_json()["message"]
+        bob_socket.send_text("not json")
+        assert bob_socket.receive_json() == {
+            "type": "error", "ref": None, "status": 422, "detail": "type must be 'send', 'read' or 'ping'",
+        }
+    conversations = client.get("/api/messages/conversations", headers=alice["headers"]).json()["data"]
+    assert conversations["conversations"][0]["unreadCount"] == 1
+
+
+def test_websocket_rejects_bad_tokens_and_closes_on_logout(client, signup):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect(f"{WS}?token=nope") as socket:
+            socket.receive_json()
+    assert closed.value.code == 1008
+    account = signup()
+    with client.websocket_connect(WS, headers=account["headers"]) as socket:
+        client.post("/api/auth/logout", headers=account["headers"])
+        with pytest.raises(WebSocketDisconnect) as closed:
+            socket.receive_json()
+    assert closed.value.code == SESSION_ENDED[0]
+
+
+def test_conversation_access_is_limited_to_participants(client, signup):
+    alice, bob, eve = signup(), signup(), signup()
+    message = client.post("/api/messages", json={"recipientId": bob["user"]["id"], "text": "Hi"},
+                          headers=alice["headers"]).json()["data"]["message"]
+    path = f"/api/messages/conversations/{message['conversationId']}"
+    assert client.get(path, headers=eve["headers"]).status_code == 403
+    assert client.put(f"/api/messages/{message['id']}/read", headers=eve["headers"]).status_code == 403
+    assert client.post("/api/messages", json={"recipientId": alice["user"]["id"], "text": "Hi"},
+                       headers=alice["headers"]).status_code == 422
+    assert client.post("/api/messages", json={"recipientId": bob["user"]["id"], "text": " "},
+                       headers=alice["headers"]).status_code == 422
+    assert client.get(path, params={"cursor": "garbage"}, headers=alice["headers"]).status_code == 400
@@ -0,0 +1,63 @@
+import re
+
+from metrics import Histogram, Metrics, labels
+
+
+def sample(text, series):
+    """Value of one series line of a Prometheus exposition, or None."""
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.M)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    lines = list(histogram.lines("h", 'route="/x"'))
+    assert lines == [
+        'h_bucket{route="/x",le="1"} 2',
+        'h_bucket{route="/x",le="10"} 3',
+        'h_bucket{route="/x",le="+Inf"} 4',
+        'h_sum{route="/x"} 56.5',
+        'h_count{route="/x"} 4',
+    ]
+
+
+def test_render_groups_by_route_and_status():
+    metrics = Metrics()
+    metrics.record("GET", "/api/users/{user_id}", 200, 0.002, 0, 100)
+    metrics.record("GET", "/api/users/{user_id}", 404, 0.001, 0, 20)
+    text = metrics.render([("rihla_test_gauge", "A gauge.", {labels(cache="x"): 3, "": 4})])
+    route = labels(method="GET", route="/api/users/{user_id}")
+    assert sample(text, f"rihla_http_requests_total{{{route},status=\"200\"}}") == 1
+    assert sample(text, f"rihla_http_requests_total{{{route},status=\"404\"}}") == 1
+    assert sample(text, f"rihla_http_response_size_bytes_sum{{{route}}}") == 120
+    assert sample(text, 'rihla_test_gauge{cache="x"}') == 3
+    assert sample(text, "rihla_test_gauge") == 4
+
+
+def test_labels_are_escaped():
+    assert labels(route='a"b\\c\nd') == 'route="a\\"b\\\\c\\nd"'
+
+
+def test_requests_are_counted_by_route_template(client, signup):
+    account = signup()
+    before = client.get("/metrics").text
+    series = 'rihla_http_requests_total{method="GET",route="/api/users/{user_id}",status="200"}'
+    for _ in range(3):
+        client.get(f"/api/users/{account['user']['id']}")
+    client.get("/api/no-such-route")
+    after = client.get("/metrics").text
+    assert sample(after, series) - (sample(before, series) or 0) == 3
+    assert sample(after, 'rihla_http_requests_total{method="GET",route="unmatched",status="404"}') >= 1
+    assert sample(after, 'rihla_collection_documents{collection="users"}') >= 1
+    assert "# TYPE rihla_lock_acquisitions_total counter" in after
+
+
+def test_metrics_token_is_required_when_set(client, server, monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
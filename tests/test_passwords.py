@@ -0,0 +1,65 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from passwords import PasswordHasher
+from tests.conftest import PASSWORD
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=1000)
+    stored = run(hasher.hash("s3cret"))
+    assert stored.startswith("$pbkdf2-sha256$1000$")
+    assert run(hasher.verify("s3cret", stored)) == (True, None)
+    assert run(hasher.verify("wrong", stored)) == (False, None)
+    assert run(hasher.verify("s3cret", None)) == (False, None)
+    hasher.close()
+
+
+def test_other_cost_is_rehashed():
+    old = PasswordHasher(rounds=1000)
+    stored = run(old.hash("s3cret"))
+    new = PasswordHasher(rounds=2000)
+    ok, new_hash = run(new.verify("s3cret", stored))
+    assert ok and new_hash.startswith("$pbkdf2-sha256$2000$")
+    assert run(new.verify("s3cret", new_hash)) == (True, None)
+    old.close()
+    new.close()
+
+
+def test_plaintext_password_is_upgraded():
+    hasher = PasswordHasher(rounds=1000)
+    ok, new_hash = run(hasher.verify("s3cret", "s3cret"))
+    assert ok and run(hasher.verify("s3cret", new_hash)) == (True, None)
+    assert run(hasher.verify("other", "s3cret")) == (False, None)
+    hasher.close()
+
+
+def test_passwords_are_stored_hashed(client, server, signup):
+    account = signup()
+    stored = client.portal.call(server.users_db.get, account["user"]["id"])
+    assert stored["password"] != PASSWORD
+    assert server.password_hasher.context.identify(stored["password"]) == "pbkdf2_sha256"
+
+
+def test_legacy_plaintext_account_is_upgraded_on_login(client, server):
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    user = {
+        "id": str(uuid.uuid4()), "firstName": "Omar", "lastName": "Alaoui", "email": email,
+        "password": PASSWORD, "isHost": False, "createdAt": datetime.now(timezone.utc).isoformat(),
+    }
+    client.portal.call(server.users_db.insert, user)
+    assert client.post("/api/auth/login", json={"email": email, "password": "nope"}).status_code == 401
+    assert client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).status_code == 200
+    stored = client.portal.call(server.users_db.get, user["id"])
+    assert stored["password"] != PASSWORD
+    assert client.post("/api/auth/login", json={"email": email, "password": PASSWORD}).status_code == 200
+
+
+def test_login_rejects_unknown_email_and_bad_types(client):
+    assert client.post("/api/auth/login", json={"email": "nobody@example.com", "password": PASSWORD}).status_code == 401
+    assert client.post("/api/auth/login", json={"email": "nobody@example.com", "password": 12}).status_code == 401
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+import profiler as profiler_module
+from profiler import TRUNCATED, Profiler, ProfilerMiddleware, _task_reader
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profiled_app(profiler, is_trusted=None):
+    # scope["route"] est renseigné par les routes FastAPI
+    app = FastAPI()
+
+    @app.get("/busy/{n}", response_class=PlainTextResponse)
+    async def busy(n: int):
+        busy_loop(0.1)
+        return "ok"
+
+    app.add_middleware(ProfilerMiddleware, profiler=profiler, is_trusted=is_trusted)
+    return app
+
+
+def test_sampled_requests_are_counted_by_route():
+    profiler = Profiler(sample_rate=1.0, interval=0.001)
+    with TestClient(profiled_app(profiler)) as client:
+        for n in range(2):
+            assert client.get(f"/busy/{n}").text == "ok"
+    assert profiler.summary()["/busy/{n}"]["requests"] == 2
+    assert profiler.summary()["/busy/{n}"]["samples"] > 0
+    stacks = profiler.collapsed("/busy/{n}")
+    assert "busy_loop (test_profiler.py" in stacks
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks.splitlines())
+    assert profiler.collapsed().startswith("/busy/{n};")
+    profiler.reset()
+    assert profiler.summary() == {} and profiler.collapsed() == ""
+
+
+def test_only_trusted_requests_are_profiled_without_sampling():
+    profiler = Profiler(sample_rate=0.0, interval=0.001)
+    app = profiled_app(profiler, is_trusted=lambda scope: (b"x-profile", b"1") in scope["headers"])
+    with TestClient(app) as client:
+        client.get("/busy/1")
+        assert profiler.summary() == {}
+        client.get("/busy/1", headers={"X-Profile": "1"})
+    assert profiler.summary()["/busy/{n}"]["requests"] == 1
+
+
+def read_running_task(reader_factory):
+    """``(task seen from another thread, the task actually running)`` while a coroutine runs."""
+
+    async def main():
+        reader = reader_factory(asyncio.get_running_loop())
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(reader()))
+        thread.start()
+        thread.join()
+        return seen[0], asyncio.current_task()
+
+    return asyncio.run(main())
+
+
+def test_task_reader_sees_the_loop_task_from_another_thread():
+    seen, running = read_running_task(_task_reader)
+    assert seen is running
+
+
+def test_task_reader_falls_back_when_current_task_refuses(monkeypatch):
+    def refuse(loop=None):
+        raise RuntimeError("no running event loop")
+
+    def factory(tasks):
+        def reader_factory(loop):
+            # Seul le module du profileur voit l'asyncio modifié : la boucle garde le vrai
+            stub = SimpleNamespace(current_task=refuse, tasks=tasks)
+            with monkeypatch.context() as patch:
+                patch.setattr(profiler_module, "asyncio", stub)
+                return _task_reader(loop)
+        return reader_factory
+
+    seen, running = read_running_task(factory(asyncio.tasks))
+    assert seen is running
+    seen, _ = read_running_task(factory(SimpleNamespace()))
+    assert seen is None
+
+
+def test_distinct_stacks_are_capped():
+    profiler = Profiler(max_stacks=2)
+    for stack in ("a;b", "a;c", "a;d", "a;e"):
+        profiler._add("/r", stack, 1)
+    assert profiler.collapsed("/r") == f"{TRUNCATED} 2\na;b 1\na;c 1\n"
+    assert profiler.samples["/r"] == 4
+
+
+def test_profile_endpoints_need_an_admin_and_an_enabled_profiler(client, server, signup, admin, monkeypatch):
+    user = signup()
+    assert client.get("/api/admin/profile", headers=user["headers"]).status_code == 403
+    assert client.get("/api/admin/profile", headers=admin["headers"]).status_code == 404
+    monkeypatch.setattr(server, "profiler", Profiler(sample_rate=0.25))
+    server.profiler._add("/api/x", "main;handler", 3)
+    server.profiler.requests["/api/x"] += 1
+    data = client.get("/api/admin/profile", headers=admin["headers"]).json()["data"]
+    assert data["sampleRate"] == 0.25
+    assert data["routes"] == {"/api/x": {"requests": 1, "samples": 3}}
+    stacks = client.get("/api/admin/profile/stacks", params={"route": "/api/x"}, headers=admin["headers"])
+    assert stacks.text == "main;handler 3\n"
+    assert "attachment" in stacks.headers["content-disposition"]
+    assert client.delete("/api/admin/profile", headers=admin["headers"]).status_code == 200
+    assert server.profiler.summary() == {}
+
+
+def test_profile_header_is_only_honoured_for_admins(server, signup, admin):
+    def scope(account, header=True):
+        headers = [(b"authorization", f"Bearer {account['tokens']['accessToken']}".encode())]
+        if header:
+            headers.append((server.PROFILE_HEADER, b"1"))
+        return {"headers": headers}
+
+    assert server.profile_requested(scope(admin))
+    assert not server.profile_requested(scope(admin, header=False))
+    assert not server.profile_requested(scope(signup()))
+    assert not server.profile_requested({"headers": [(server.PROFILE_HEADER, b"1")]})
@@ -0,0 +1,71 @@
+import pytest
+
+from booking_store import BookingStore
+from experience_store import ExperienceStore
+from records import ExperienceRecord, UserRecord
+from user_store import UserStore
+
+
+def experience(i, **fields):
+    return {"id": f"e{i}", "title": f"Tour {i}", "category": "Culture", "location": "Fès", "price": 100 + i,
+            "hostId": "h1", "createdAt": f"2026-01-01T00:00:{i:02d}", **fields}
+
+
+def test_record_round_trips_known_and_extra_fields():
+    doc = {"id": "u1", "email": "a@example.com", "isHost": False, "locale": "fr", "createdAt": "2026-01-01"}
+    record = UserRecord.from_dict(doc)
+    assert record.to_dict() == doc
+    assert record.extra == {"locale": "fr"}
+    assert (record["email"], record.get("locale")) == ("a@example.com", "fr")
+    assert (record.get("bio"), record.get("nope", 1)) == (None, 1)
+    with pytest.raises(KeyError):
+        record["bio"]
+    assert not hasattr(record, "__dict__")
+
+
+def test_repeated_strings_are_shared():
+    first = ExperienceRecord.from_dict(experience(1, category="".join(["Adven", "ture"])))
+    second = ExperienceRecord.from_dict(experience(2, category="".join(["Adv", "enture"])))
+    assert first.category is second.category
+    assert first.hostId is second.hostId
+
+
+def test_stores_hand_out_plain_copies():
+    users = UserStore()
+    users.insert({"id": "u1", "email": "a@example.com", "nickname": "Ami"})
+    user = users.get("u1")
+    assert user == {"id": "u1", "email": "a@example.com", "nickname": "Ami"}
+    user["email"] = "changed@example.com"
+    assert users.get("u1")["email"] == "a@example.com"
+    experiences = ExperienceStore()
+    experiences.insert_many([experience(1, coordinates={"lat": 34.0, "lng": -5.0}), experience(2)])
+    assert experiences.get("e1") == experience(1, coordinates={"lat": 34.0, "lng": -5.0})
+    assert [e["id"] for e in experiences.snapshot()] == ["e1", "e2"]
+
+
+def test_booking_discard_restores_the_indexes():
+    store = BookingStore()
+    kept = [{"id": f"b{i}", "userId": "u1", "experienceId": "e1", "date": f"2026-05-0{i + 1}", "guests": 1}
+            for i in range(3)]
+    store.insert_many(kept)
+    before = store.for_user("u1", limit=10)
+    extra = [{"id": "b8", "userId": "u1", "experienceId": "e1", "date": "2026-05-02"},
+             {"id": "b9", "userId": "u2", "experienceId": "e1", "date": "not a date"}]
+    store.insert_many(extra)
+    with pytest.raises(ValueError):
+        store.discard([kept[0]])
+    store.discard(extra)
+    assert len(store) == 3 and "b8" not in store
+    assert store.for_user("u1", limit=10) == before
+    assert store.for_user("u2", limit=10) == ([], None)
+    assert list(store.snapshot()) == kept
+    assert store.seats_by_day({"confirmed"}) == {
+        ("e1", "2026-05-01"): 1, ("e1", "2026-05-02"): 1, ("e1", "2026-05-03"): 1,
+    }
+
+
+def test_registration_keeps_only_profile_fields(client, server, signup):
+    account = signup(bio="Guide in Fès", role="admin", isAdmin=True)
+    stored = client.portal.call(server.users_db.get, account["user"]["id"])
+    assert stored["bio"] == "Guide in Fès"
+    assert "role" not in stored and "isAdmin" not in stored
@@ -0,0 +1,188 @@
+"""The same scenarios against every storage backend."""
+
+import asyncio
+
+import pytest
+
+from repository import DuplicateEmailError, DuplicateReviewError, create_repository
+
+
+@pytest.fixture(params=["memory", "sqlite", "mongo"])
+def repository(request, tmp_path, monkeypatch):
+    if request.param == "sqlite":
+        return create_repository("sqlite", path=str(tmp_path / "rihla.db"))
+    if request.param == "mongo":
+        mongomock_motor = pytest.importorskip("mongomock_motor")
+        import mongo_repository
+
+        monkeypatch.setattr(mongo_repository, "AsyncIOMotorClient", lambda url, **_: mongomock_motor.AsyncMongoMockClient())
+        return create_repository("mongo", url="mongodb://test")
+    return create_repository("memory")
+
+
+def run(repository, scenario):
+    async def main():
+        await repository.connect()
+        try:
+            await scenario(repository)
+        finally:
+            await repository.close()
+
+    asyncio.run(main())
+
+
+def user(i, **fields):
+    return {"id": f"u{i}", "email": f"user{i}@example.com", "firstName": "Amina", "lastName": "Tazi", **fields}
+
+
+def experience(i, **fields):
+    return {
+        "id": f"e{i}", "title": f"Tour {i}", "category": "Food" if i % 2 else "Culture",
+        "location": "Fes", "price": 100 + (i * 37) % 200, "groupSize": 4, "createdAt": f"2026-01-{i + 1:02d}", **fields,
+    }
+
+
+def booking(i, user_id="u1", experience_id="e1", day="2026-06-01"):
+    return {"id": f"b{i}", "userId": user_id, "experienceId": experience_id, "date": day, "guests": 1,
+            "status": "confirmed", "createdAt": f"2026-02-{i + 1:02d}"}
+
+
+def test_users(repository):
+    async def scenario(repo):
+        await repo.users.insert(user(1))
+        await repo.users.insert(user(2))
+        with pytest.raises(DuplicateEmailError):
+            await repo.users.insert(user(3, email="USER1@example.com"))
+        assert (await repo.users.get("u1"))["email"] == "user1@example.com"
+        assert (await repo.users.get_by_email("User2@Example.com"))["id"] == "u2"
+        updated = await repo.users.update("u1", {"email": "new@example.com", "bio": "Guide"})
+        assert updated["bio"] == "Guide"
+        assert await repo.users.get_by_email("user1@example.com") is None
+        assert (await repo.users.get_by_email("new@example.com"))["id"] == "u1"
+        with pytest.raises(DuplicateEmailError):
+            await repo.users.update("u1", {"email": "user2@example.com"})
+        assert await repo.users.update("missing", {"bio": "x"}) is None
+        assert await repo.users.get("missing") is None
+
+    run(repository, scenario)
+
+
+def test_experience_queries(repository):
+    async def scenario(repo):
+        experiences = [experience(i) for i in range(12)]
+        await repo.experiences.insert_many(experiences[:6])
+        for exp in experiences[6:]:
+            await repo.experiences.insert(exp)
+        seen, after = [], None
+        while True:
+            page, after = await repo.experiences.query(category="food", sort_by="price", descending=False,
+                                                       after=after, limit=4)
+            seen.extend(exp["id"] for exp in page)
+            if after is None:
+                break
+        food = sorted((exp for exp in experiences if exp["category"] == "Food"), key=lambda exp: (exp["price"], exp["id"]))
+        assert seen == [exp["id"] for exp in food]
+        newest, _ = await repo.experiences.query(limit=3)
+        assert [exp["id"] for exp in newest] == ["e11", "e10", "e9"]
+        many = await repo.experiences.get_many(["e3", "missing", "e1"])
+        assert sorted(exp["id"] for exp in many) == ["e1", "e3"]
+
+    run(repository, scenario)
+
+
+def test_booking_pages(repository):
+    async def scenario(repo):
+        days = ["2026-06-03", "2026-06-01", "2026-06-02", "2026-06-01"]
+        await repo.bookings.insert_many([booking(i, day=day) for i, day in enumerate(days[:2])])
+        for i, day in enumerate(days[2:], start=2):
+            await repo.bookings.insert(booking(i, day=day))
+        await repo.bookings.insert(booking(9, user_id="u2"))
+        seen, after = [], None
+        while True:
+            page, after = await repo.bookings.for_user("u1", after=after, limit=3)
+            seen.extend(b["id"] for b in page)
+            if after is None:
+                break
+        assert seen == ["b1", "b3", "b2", "b0"]
+        latest, _ = await repo.bookings.for_user("u1", limit=2, descending=True)
+        assert [b["id"] for b in latest] == ["b0", "b2"]
+        assert len((await repo.bookings.for_experience("e1", limit=10))[0]) == 5
+        assert (await repo.bookings.get("b2"))["date"] == "2026-06-02"
+
+    run(repository, scenario)
+
+
+def test_availability(repository):
+    async def scenario(repo):
+        assert await repo.availability.reserve("e1", "2026-06-01", 3, capacity=4)
+        assert not await repo.availability.reserve("e1", "2026-06-01", 2, capacity=4)
+        assert await repo.availability.reserve("e1", "2026-06-01", 1, capacity=4)
+        await repo.availability.release("e1", "2026-06-01", 2)
+        assert await repo.availability.reserve("e1", "2026-06-01", 2, capacity=4)
+        assert await repo.availability.reserve("e1", "2026-06-02", 4, capacity=4)
+        booked = await repo.availability.booked("e1", "2026-06-01", "2026-06-02")
+        assert booked == {"2026-06-01": 4, "2026-06-02": 4}
+
+    run(repository, scenario)
+
+
+def test_reviews(repository):
+    async def scenario(repo):
+        review = {"id": "r1", "userId": "u1", "experienceId": "e1", "rating": 4, "comment": ""}
+        await repo.reviews.insert(review)
+        with pytest.raises(DuplicateReviewError):
+            await repo.reviews.insert({**review, "id": "r2"})
+        await repo.reviews.insert({**review, "id": "r3", "userId": "u2", "rating": 2})
+        assert (await repo.reviews.update("r1", {"rating": 5}))["rating"] == 5
+        page, _ = await repo.reviews.for_experience("e1")
+        assert [r["id"] for r in page] == ["r3", "r1"]
+        assert (await repo.reviews.delete("r3"))["id"] == "r3"
+        assert await repo.reviews.delete("r3") is None
+        assert await repo.reviews.get("r3") is None
+
+    run(repository, scenario)
+
+
+def test_export_pages(repository):
+    async def scenario(repo):
+        await repo.experiences.insert_many([experience(i) for i in range(7)])
+        seen, after = [], None
+        while True:
+            page, after = await repo.experiences.export_page(after=after, limit=3)
+            seen.extend(exp["id"] for exp in page)
+            if after is None:
+                break
+        assert seen == [f"e{i}" for i in range(7)]
+        recent, _ = await repo.experiences.export_page(since="2026-01-05", limit=10)
+        assert [exp["id"] for exp in recent] == ["e4", "e5", "e6"]
+
+    run(repository, scenario)
+
+
+def test_tokens_on_shared_backends(repository):
+    if not repository.shared:
+        pytest.skip("process-local backend")
+
+    async def scenario(repo):
+        await repo.tokens.insert("key", "u1", 2_000_000_000.0)
+        assert tuple((await repo.tokens.get("key"))[:2]) == ("u1", 2_000_000_000.0)
+        await repo.tokens.delete("key")
+        assert await repo.tokens.get("key") is None
+
+    run(repository, scenario)
+
+
+def test_sqlite_change_log_stays_bounded(tmp_path):
+    import sqlite3
+
+    import sqlite_repository
+
+    path = tmp_path / "rihla.db"
+    run(create_repository("sqlite", path=str(path)), lambda repo: repo.users.insert(user(1)))
+    retained, every = sqlite_repository.CHANGES_RETAINED, sqlite_repository.CHANGES_PRUNE_EVERY
+    with sqlite3.connect(path) as conn:
+        conn.executemany("INSERT INTO changes (collection, key) VALUES ('users', ?)",
+                         ((str(i),) for i in range(retained + 3 * every)))
+        count, oldest, newest = conn.execute("SELECT COUNT(*), MIN(seq), MAX(seq) FROM changes").fetchone()
+    assert count <= retained + every
+    assert newest - oldest + 1 == count
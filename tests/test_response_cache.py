@@ -0,0 +1,57 @@
+import uuid
+
+from starlette.datastructures import QueryParams
+
+from response_cache import ResponseCache, etag_matches, make_etag
+
+
+def test_etag_matches():
+    etag = make_etag(b"body")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+
+def test_key_ignores_parameter_order():
+    first = ResponseCache.key("/api/experiences", QueryParams("a=1&b=2"))
+    assert first == ResponseCache.key("/api/experiences", QueryParams("b=2&a=1"))
+
+
+def test_put_after_invalidate_is_not_cached():
+    cache = ResponseCache()
+    version = cache.version
+    cache.invalidate()
+    body, etag = cache.put("key", b"stale", version)
+    assert (body, etag) == (b"stale", make_etag(b"stale"))
+    assert cache.get("key") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, key.encode(), cache.version)
+    cache.get("a")
+    cache.put("c", b"c", cache.version)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_experiences_revalidate_with_etag(client, signup, create_experience):
+    host = signup(is_host=True)
+    params = {"category": uuid.uuid4().hex}
+    first = client.get("/api/experiences", params=params)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+    again = client.get("/api/experiences", params=params, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    # Une nouvelle expérience invalide le cache : l'ancien ETag ne correspond plus
+    create_experience(host, category=params["category"])
+    changed = client.get("/api/experiences", params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()["data"]["experiences"]) == 1
@@ -0,0 +1,60 @@
+import json
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+import responses
+from responses import _large_list, _stream_envelope, dumps, json_response, loads
+
+
+@pytest.fixture(params=[True, False], ids=["fast", "stdlib"])
+def encoder(request, monkeypatch):
+    if request.param and responses.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(responses, "FAST_JSON", request.param)
+
+
+def test_dumps_round_trips(encoder):
+    content = {"success": True, "data": {"title": "Fès — médina", "price": 12.5, "tags": [1, None]}}
+    assert json.loads(dumps(content)) == content
+    assert loads(dumps(content)) == content
+
+
+def test_non_json_types_fall_back_to_jsonable_encoder(encoder):
+    when = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    key = uuid.UUID(int=1)
+    decoded = json.loads(dumps({"at": when, "id": key}))
+    assert decoded["id"] == str(key)
+    assert datetime.fromisoformat(decoded["at"].replace("Z", "+00:00")) == when
+
+
+def test_loads_rejects_malformed_json(encoder):
+    with pytest.raises(ValueError):
+        loads(b"{nope")
+
+
+@pytest.mark.parametrize("head", [{"success": True}, {}])
+def test_streamed_envelope_matches_dumps(monkeypatch, head):
+    monkeypatch.setattr(responses, "STREAM_THRESHOLD", 10)
+    monkeypatch.setattr(responses, "STREAM_CHUNK", 7)
+    content = {**head, "data": {"total": 25, "next": None, "items": [{"n": i} for i in range(25)]}}
+    key, items = _large_list(content)
+    assert key == "items"
+    assert b"".join(_stream_envelope(content, key, items)) == dumps(content)
+    # Ailleurs qu'en dernier, la liste est déplacée en fin de "data" : même JSON, autre ordre
+    moved = {**head, "data": {"items": items, "total": 25}}
+    assert loads(b"".join(_stream_envelope(moved, key, items))) == moved
+    assert _large_list({"data": {"items": [1, 2]}}) is None
+
+
+def test_json_response_keeps_the_status_code():
+    response = json_response({"success": True}, status_code=201)
+    assert response.status_code == 201
+    assert response.body == b'{"success":true}'
+
+
+def test_api_responses_are_json(client):
+    response = client.get("/api/health")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json()["status"] == "OK"
@@ -0,0 +1,118 @@
+import random
+import uuid
+
+import pytest
+
+from rating_aggregates import RatingAggregates
+from review_store import DuplicateReviewError, ReviewStore
+
+
+def review(i, experience_id="e1", rating=5, user_id=None):
+    return {"id": f"r{i}", "experienceId": experience_id, "hostId": "h1", "userId": user_id or f"u{i}",
+            "rating": rating, "comment": "", "createdAt": f"2026-01-01T00:00:{i:02d}"}
+
+
+def recomputed(reviews, experience_id):
+    ratings = [r["rating"] for r in reviews.values() if r["experienceId"] == experience_id]
+    return {"rating": round(sum(ratings) / len(ratings), 2) if ratings else 0.0, "review_count": len(ratings)}
+
+
+def test_incremental_aggregates_match_a_recount():
+    rng = random.Random(5)
+    aggregates = RatingAggregates()
+    reviews = {}
+    for _ in range(2000):
+        review_id = f"r{rng.randrange(200)}"
+        if review_id in reviews and rng.random() < 0.3:
+            del reviews[review_id]
+            aggregates.apply(review_id, None)
+        else:
+            reviews[review_id] = {"experienceId": f"e{rng.randrange(5)}", "hostId": "h1", "rating": rng.randint(1, 5)}
+            aggregates.apply(review_id, reviews[review_id])
+    for experience_id in (f"e{i}" for i in range(5)):
+        assert aggregates.experience(experience_id) == recomputed(reviews, experience_id)
+    assert aggregates.host("h1")["review_count"] == len(reviews) == len(aggregates)
+
+
+def test_apply_is_idempotent_and_keeps_a_histogram():
+    aggregates = RatingAggregates()
+    assert aggregates.apply("r1", review(1, rating=4))
+    assert not aggregates.apply("r1", review(1, rating=4))
+    aggregates.apply("r2", review(2, rating=2))
+    aggregates.apply("r1", review(1, rating=5))
+    summary = aggregates.experience("e1", histogram=True)
+    assert summary == {"rating": 3.5, "review_count": 2, "histogram": {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1}}
+    assert not aggregates.apply("missing", None)
+    assert aggregates.with_ratings([{"id": "e1"}, {"id": "e9"}]) == [
+        {"id": "e1", "rating": 3.5, "review_count": 2},
+        {"id": "e9", "rating": 0.0, "review_count": 0},
+    ]
+
+
+def test_store_rejects_a_second_review_per_user():
+    store = ReviewStore()
+    store.insert(review(1, user_id="u1"))
+    with pytest.raises(DuplicateReviewError):
+        store.insert(review(2, user_id="u1"))
+    store.delete("r1")
+    store.insert(review(3, user_id="u1"))
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_store_pages_by_experience(descending):
+    store = ReviewStore()
+    for i in range(25):
+        store.insert(review(i, experience_id="e1" if i % 2 else "e2"))
+    seen, after = [], None
+    while True:
+        page, after = store.for_experience("e1", after=after, limit=4, descending=descending)
+        seen += [r["id"] for r in page]
+        if after is None:
+            break
+    expected = [f"r{i}" for i in range(1, 25, 2)]
+    assert seen == (expected[::-1] if descending else expected)
+
+
+def test_review_endpoints_keep_ratings_current(client, signup, create_experience):
+    host = signup(is_host=True)
+    exp = create_experience(host, category=uuid.uuid4().hex)
+    guests = [signup() for _ in range(3)]
+    created = []
+    for guest, rating in zip(guests, (5, 4, 2)):
+        response = client.post("/api/reviews", json={"experienceId": exp["id"], "rating": rating, "comment": "Top"},
+                               headers=guest["headers"])
+        assert response.status_code == 201
+        created.append(response.json()["data"]["review"])
+    path = f"/api/reviews/experience/{exp['id']}"
+    assert client.get(path).json()["data"]["summary"]["rating"] == 3.67
+    client.put(f"/api/reviews/{created[2]['id']}", json={"rating": 3}, headers=guests[2]["headers"])
+    client.delete(f"/api/reviews/{created[0]['id']}", headers=guests[0]["headers"])
+    data = client.get(path).json()["data"]
+    assert data["summary"] == {"rating": 3.5, "review_count": 2,
+                               "histogram": {"1": 0, "2": 0, "3": 1, "4": 1, "5": 0}}
+    assert [r["id"] for r in data["reviews"]] == [created[2]["id"], created[1]["id"]]
+    profile = client.get(f"/api/users/{host['user']['id']}").json()["data"]["user"]
+    assert (profile["rating"], profile["reviews_count"]) == (3.5, 2)
+    listed, = client.get("/api/experiences", params={"category": exp["category"]}).json()["data"]["experiences"]
+    assert (listed["rating"], listed["review_count"]) == (3.5, 2)
+
+
+def test_review_rules(client, signup, admin, create_experience):
+    host = signup(is_host=True)
+    exp = create_experience(host)
+    author, other = signup(), signup()
+
+    def post(account, **fields):
+        return client.post("/api/reviews", json={"experienceId": exp["id"], "rating": 4, **fields},
+                           headers=account["headers"])
+
+    assert post(host).status_code == 403
+    assert post(author, rating=6).status_code == 422
+    assert post(author, rating=True).status_code == 422
+    assert post(author, experienceId="missing").status_code == 404
+    review_id = post(author).json()["data"]["review"]["id"]
+    assert post(author).status_code == 409
+    assert client.put(f"/api/reviews/{review_id}", json={"rating": 1}, headers=other["headers"]).status_code == 403
+    assert client.delete(f"/api/reviews/{review_id}", headers=other["headers"]).status_code == 403
+    assert client.delete(f"/api/reviews/{review_id}", headers=admin["headers"]).status_code == 200
+    assert client.delete(f"/api/reviews/{review_id}", headers=admin["headers"]).status_code == 404
@@ -0,0 +1,121 @@
+import math
+import random
+import uuid
+from collections import Counter
+
+import pytest
+
+from pagination import encode_cursor
+from search_index import FIELD_WEIGHTS, SearchIndex, fold, tokenize
+
+
+def test_fold_and_tokenize():
+    assert fold("Fès") == "fes"
+    assert fold("Straße") == "strasse"
+    assert tokenize("Tour of the Médina, Fès!") == ["tour", "medina", "fes"]
+
+
+def naive_bm25(experiences, terms, k1=1.2, b=0.75):
+    """BM25 of every experience containing all ``terms``, straight from the definition."""
+    docs = []
+    for exp in experiences:
+        tf = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = exp.get(field)
+            text = " ".join(value) if isinstance(value, list) else value or ""
+            for term in tokenize(text):
+                tf[term] += weight
+        docs.append((exp["id"], tf, sum(tf.values())))
+    avg_len = sum(length for _, _, length in docs) / len(docs)
+    scores = {}
+    for exp_id, tf, length in docs:
+        if not all(tf[t] for t in terms):
+            continue
+        score = 0.0
+        for term in terms:
+            df = sum(1 for _, other, _ in docs if other[term])
+            idf = math.log(1.0 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * tf[term] * (k1 + 1) / (tf[term] + k1 * (1 - b + b * length / avg_len))
+        scores[exp_id] = score
+    return sorted(scores, key=lambda exp_id: -scores[exp_id])
+
+
+EXPERIENCES = [
+    {"id": "a", "title": "Desert camel trek", "location": "Merzouga", "description": "Camel ride in the dunes"},
+    {"id": "b", "title": "Cooking class", "location": "Marrakech", "description": "Tagine and camel stew"},
+    {"id": "c", "title": "Camel", "location": "Essaouira", "description": "Beach camel ride"},
+    {"id": "d", "title": "Medina walk", "location": "Fès", "category": "Culture", "highlights": ["Tanneries"]},
+]
+
+
+def test_ranking_matches_bm25():
+    index = SearchIndex()
+    index.add_many(EXPERIENCES)
+    ids, total = index.search("camel", prefix=False)
+    assert total == 3
+    assert ids == naive_bm25(EXPERIENCES, ["camel"])
+    ids, _ = index.search("camel ride", prefix=False)
+    assert ids == naive_bm25(EXPERIENCES, ["camel", "ride"])
+
+
+def test_every_word_must_match_and_last_is_a_prefix():
+    index = SearchIndex()
+    for experience in EXPERIENCES:
+        index.add(experience)
+    assert index.search("camel marrakech")[0] == ["b"]
+    assert index.search("fes tann")[0] == ["d"]
+    assert index.search("fes tann", prefix=False) == ([], 0)
+    assert index.search("the") == ([], 0)
+
+
+def test_re_adding_an_id_is_a_no_op():
+    index = SearchIndex()
+    index.add(EXPERIENCES[0])
+    index.add_many([EXPERIENCES[0]])
+    assert len(index) == 1
+
+
+def test_threshold_algorithm_matches_exhaustive_scoring():
+    rng = random.Random(5)
+    words = ["riad", "souk", "atlas", "hammam", "oasis", "kasbah"]
+    index = SearchIndex()
+    index.add_many([
+        {"id": f"e{i}", "title": " ".join(rng.choices(words, k=3)), "description": " ".join(rng.choices(words, k=8))}
+        for i in range(3000)
+    ])
+    terms = ["riad", "souk"]
+    candidates = index._postings["riad"].keys() & index._postings["souk"].keys()
+    assert len(candidates) > 1000
+    for k in (1, 10, 100):
+        assert index._threshold_top_k(terms, candidates, k) == index._score_all(terms, candidates, k)
+
+
+def test_offset_pages_are_disjoint():
+    index = SearchIndex()
+    index.add_many([{"id": f"e{i}", "title": "camel " * (i % 4 + 1)} for i in range(25)])
+    everything, total = index.search("camel", limit=25)
+    paged = [exp_id for offset in range(0, 25, 10) for exp_id in index.search("camel", limit=10, offset=offset)[0]]
+    assert total == 25
+    assert paged == everything
+
+
+def test_search_endpoint_pages(client, signup, create_experience):
+    host = signup(is_host=True)
+    word = "q" + uuid.uuid4().hex[:10]
+    created = {create_experience(host, title=f"{word} tour {i}")["id"] for i in range(3)}
+    seen, cursor = [], None
+    while True:
+        params = {"q": word, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/experiences/search", params=params).json()["data"]
+        assert data["total"] == 3
+        seen.extend(exp["id"] for exp in data["experiences"])
+        cursor = data["nextCursor"]
+        if cursor is None:
+            break
+    assert set(seen) == created and len(seen) == 3
+
+
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor(("x",)), encode_cursor((-1,)), encode_cursor((1.5,))])
+def test_search_endpoint_rejects_bad_cursors(client, cursor):
+    response = client.get("/api/experiences/search", params={"q": "camel", "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import bench_startup
+
+# Deux processus sur la même base SQLite : le second ne connaît les données que par startup()
+CHILD = """
+import json, sys
+from fastapi.testclient import TestClient
+import server
+
+with TestClient(server.app, base_url="https://rihlama.com") as client:
+    if sys.argv[1] == "write":
+        def signup(email, is_host):
+            body = {"firstName": "A", "lastName": "B", "email": email, "password": "SecurePass123!", "isHost": is_host}
+            tokens = client.post("/api/auth/register", json=body).json()["data"]["tokens"]
+            return {"Authorization": f"Bearer {tokens['accessToken']}"}
+
+        host, guest = signup("host@example.com", True), signup("guest@example.com", False)
+        experience = client.post("/api/experiences", headers=host, json={
+            "title": "Kasbah photography walk", "description": "Old walls at golden hour", "category": "Culture",
+            "location": "Ouarzazate", "price": 200, "duration": "2 hours", "groupSize": 6, "highlights": ["Kasbah"],
+            "images": ["kasbah.jpg"], "coordinates": {"lat": 30.92, "lng": -6.89},
+        }).json()["data"]["experience"]
+        client.post("/api/reviews", headers=guest, json={"experienceId": experience["id"], "rating": 4})
+        print(json.dumps(experience["id"]))
+    else:
+        hits = client.get("/api/experiences/search", params={"q": "kasbah"}).json()["data"]["experiences"]
+        print(json.dumps({
+            "search": [hit["id"] for hit in hits],
+            "geo": len(server.geo_index),
+            "ratings": len(server.rating_aggregates),
+        }))
+"""
+
+
+def run_child(phase, env):
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, phase], cwd=bench_startup.BACKEND, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_startup_rebuilds_indexes_from_storage(tmp_path):
+    env = dict(os.environ, STORAGE_BACKEND="sqlite", SQLITE_PATH=str(tmp_path / "rihla.db"))
+    experience_id = run_child("write", env)
+    assert run_child("read", env) == {"search": [experience_id], "geo": 1, "ratings": 1}
+
+
+def test_lazy_modules_are_not_loaded_before_the_first_request():
+    measures = bench_startup.run_once(dict(os.environ, STORAGE_BACKEND="memory", PROFILE_ENABLED="0"))
+    assert measures["status"] == 200
+    assert measures["lazy_loaded"] == []
+
+
+def test_app_has_a_single_startup_hook(server):
+    assert server.app.router.on_startup == [server.startup]
+    assert server.app.router.on_shutdown == [server.shutdown]
+    paths = {route.path for route in server.app.routes}
+    assert {"/health", "/metrics", "/api/health", "/api/auth/login"} <= paths
+
+
+def test_profiler_is_only_installed_when_enabled(server, monkeypatch):
+    from profiler import Profiler, ProfilerMiddleware
+
+    def middleware(app):
+        return [entry.cls for entry in app.user_middleware]
+
+    assert ProfilerMiddleware not in middleware(server.create_app())
+    monkeypatch.setattr(server, "profiler", Profiler())
+    assert ProfilerMiddleware in middleware(server.create_app())
@@ -0,0 +1,70 @@
+from token_store import TokenStore, token_key
+
+
+def test_issue_and_resolve():
+    store = TokenStore()
+    token, _ = store.issue("u1")
+    assert store.resolve(token) == "u1"
+    assert store.resolve("not-a-token") is None
+
+
+def test_raw_token_is_not_kept():
+    store = TokenStore()
+    token, _ = store.issue("u1")
+    assert token not in store._tokens
+    assert token_key(token) in store._tokens
+
+
+def test_expired_token_is_dropped(clock):
+    store = TokenStore(ttl_seconds=60, clock=clock)
+    token, expires_at = store.issue("u1")
+    assert expires_at == clock.now + 60
+    clock.now += 61
+    assert store.resolve(token) is None
+    assert len(store) == 0
+
+
+def test_revoke_and_revoke_user():
+    store = TokenStore()
+    first, _ = store.issue("u1")
+    second, _ = store.issue("u1")
+    other, _ = store.issue("u2")
+    assert store.revoke(first)
+    assert not store.revoke(first)
+    assert store.resolve(first) is None
+    assert store.revoke_user("u1") == 1
+    assert store.resolve(second) is None
+    assert store.resolve(other) == "u2"
+
+
+def test_least_recently_used_token_is_evicted():
+    store = TokenStore(max_tokens=2)
+    oldest, _ = store.issue("u1")
+    middle, _ = store.issue("u2")
+    store.resolve(oldest)
+    store.issue("u3")
+    assert store.resolve(oldest) == "u1"
+    assert store.resolve(middle) is None
+    assert len(store) == 2
+
+
+def test_purge_expired(clock):
+    store = TokenStore(ttl_seconds=60, clock=clock)
+    store.issue("u1")
+    clock.now += 30
+    fresh, _ = store.issue("u2")
+    clock.now += 31
+    assert store.purge_expired() == 1
+    assert store.resolve(fresh) == "u2"
+
+
+def test_bearer_token_resolves_the_caller(client, signup):
+    account = signup()
+    response = client.get("/api/auth/me", headers=account["headers"])
+    assert response.status_code == 200
+    assert response.json()["data"]["user"]["id"] == account["user"]["id"]
+
+
+def test_missing_or_unknown_token_is_rejected(client):
+    assert client.get("/api/auth/me").status_code == 401
+    assert client.get("/api/auth/me", headers={"Authorization": "Bearer nope"}).status_code == 401
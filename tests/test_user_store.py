@@ -0,0 +1,88 @@
+import pytest
+
+from user_store import DuplicateEmailError, UserStore
+
+
+def user(user_id, email, **fields):
+    return {"id": user_id, "email": email, "firstName": "Amina", "lastName": "Tazi", **fields}
+
+
+def test_lookup_by_id_and_email():
+    store = UserStore()
+    store.insert(user("u1", "Amina@Example.com"))
+    assert store.get("u1")["email"] == "Amina@Example.com"
+    assert store.get_by_email("  amina@example.COM ")["id"] == "u1"
+    assert store.get("missing") is None
+    assert store.get_by_email("missing@example.com") is None
+
+
+def test_email_is_unique_case_insensitively():
+    store = UserStore()
+    store.insert(user("u1", "amina@example.com"))
+    with pytest.raises(DuplicateEmailError):
+        store.insert(user("u2", "AMINA@example.com"))
+    assert len(store) == 1
+
+
+def test_update_reindexes_the_email():
+    store = UserStore()
+    store.insert(user("u1", "old@example.com"))
+    store.insert(user("u2", "taken@example.com"))
+    updated = store.update("u1", {"email": "new@example.com", "bio": "Guide"})
+    assert updated["bio"] == "Guide"
+    assert store.get_by_email("old@example.com") is None
+    assert store.get_by_email("new@example.com")["id"] == "u1"
+    with pytest.raises(DuplicateEmailError):
+        store.update("u1", {"email": "taken@example.com"})
+    assert store.get_by_email("new@example.com")["id"] == "u1"
+    assert store.update("missing", {"bio": "x"}) is None
+
+
+def test_update_cannot_change_the_id():
+    store = UserStore()
+    store.insert(user("u1", "amina@example.com"))
+    assert store.update("u1", {"id": "u2"})["id"] == "u1"
+    assert "u2" not in store
+
+
+def test_in_order_pages_by_registration():
+    store = UserStore()
+    for i in range(5):
+        store.insert(user(f"u{i}", f"u{i}@example.com"))
+    first, key = store.in_order(limit=3)
+    rest, last_key = store.in_order(after=key, limit=3)
+    assert [u["id"] for u in first + rest] == [f"u{i}" for i in range(5)]
+    assert last_key is None
+
+
+def test_get_user_profile(client, signup):
+    account = signup(firstName="Youssef")
+    response = client.get(f"/api/users/{account['user']['id']}")
+    assert response.status_code == 200
+    assert response.json()["data"]["user"]["firstName"] == "Youssef"
+    assert client.get("/api/users/unknown").json()["data"]["user"] is None
+
+
+def test_update_profile(client, signup):
+    account = signup()
+    other = signup()
+    response = client.put("/api/users/profile", json={"lastName": "Alaoui"}, headers=account["headers"])
+    assert response.status_code == 200
+    assert response.json()["data"]["user"]["lastName"] == "Alaoui"
+    response = client.put("/api/users/profile", json={"email": other["user"]["email"]}, headers=account["headers"])
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize("body", [[1], "text", 3])
+def test_update_profile_rejects_non_objects(client, signup, body):
+    account = signup()
+    response = client.put("/api/users/profile", json=body, headers=account["headers"])
+    assert response.status_code == 422
+
+
+def test_duplicate_registration_is_rejected(client, signup):
+    account = signup()
+    response = client.post("/api/auth/register", json={
+        "firstName": "A", "lastName": "B", "email": account["user"]["email"].upper(), "password": "x1234567",
+    })
+    assert response.status_code == 409
@@ -0,0 +1,218 @@
+import asyncio
+import os
+
+import pytest
+
+import wal
+from durable_repository import DurableMemoryRepository
+from message_store import new_conversation
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def booking(i, user_id="u1", day=1):
+    return {"id": f"b{i}", "userId": user_id, "experienceId": "e1", "date": f"2026-05-{day:02d}",
+            "guests": 1, "status": "confirmed", "createdAt": f"2026-01-01T00:00:{i % 60:02d}"}
+
+
+async def state(repo):
+    """Everything a restart must give back, read through the repository."""
+    bookings, _ = await repo.bookings.for_user("u1", limit=1000)
+    reviews, _ = await repo.reviews.for_experience("e1", limit=1000)
+    messages, _ = await repo.messages.messages("c1", limit=1000)
+    return {
+        "users": {u["id"]: u for u in repo.users.store.values()},
+        "email": (await repo.users.get_by_email("a@example.com") or {}).get("id"),
+        "experiences": sorted(e["id"] for e in repo.experiences.store.values()),
+        "bookings": bookings,
+        "reviews": reviews,
+        "messages": messages,
+        "conversation": await repo.messages.get_conversation("c1"),
+        "sizes": await repo.sizes(),
+    }
+
+
+async def populate(repo, bookings=5):
+    await repo.users.insert({"id": "u1", "email": "a@example.com", "firstName": "A"})
+    await repo.experiences.insert({"id": "e1", "title": "Dunes", "price": 100, "category": "c", "location": "l"})
+    await repo.bookings.insert_many([booking(i, day=i % 3 + 1) for i in range(bookings)])
+    await repo.reviews.insert({"id": "r1", "userId": "u1", "experienceId": "e1", "hostId": "h1", "rating": 4,
+                               "createdAt": "2026-01-01"})
+    await repo.reviews.insert({"id": "r2", "userId": "u2", "experienceId": "e1", "hostId": "h1", "rating": 2,
+                               "createdAt": "2026-01-02"})
+    await repo.messages.open_conversation(new_conversation("c1", ["u1", "u2"], None, "2026-01-01"))
+    await repo.messages.append("c1", {"id": "m1", "senderId": "u1", "text": "Salam"})
+
+
+async def reopened(directory):
+    repo = DurableMemoryRepository(directory, snapshot_interval=0)
+    await repo.connect()
+    return repo
+
+
+def test_record_round_trip_and_corruption():
+    line = wal.encode_record(["users.insert", {"id": "u1", "name": "Fès"}])
+    assert wal.decode_record(line) == ["users.insert", {"id": "u1", "name": "Fès"}]
+    assert wal.decode_record(line[:-1]) is None
+    assert wal.decode_record(line.replace(b"u1", b"u2")) is None
+    assert wal.decode_record(b"garbage\n") is None
+
+
+def test_torn_tail_is_skipped_but_damage_is_not(tmp_path):
+    path = tmp_path / "wal-00000001.log"
+    good = [wal.encode_record(["op", i]) for i in range(3)]
+    path.write_bytes(b"".join(good) + good[0][:7])
+    assert list(wal.read_segment(path)) == [["op", 0], ["op", 1], ["op", 2]]
+    path.write_bytes(good[0] + b"00000000 []\n" + good[1])
+    with pytest.raises(ValueError):
+        list(wal.read_segment(path))
+
+
+def test_writes_survive_a_restart(tmp_path):
+    async def scenario():
+        repo = await reopened(tmp_path)
+        await populate(repo)
+        await repo.users.update("u1", {"email": "b@example.com"})
+        await repo.users.update("u1", {"email": "a@example.com", "bio": "Guide"})
+        await repo.reviews.update("r1", {"rating": 5})
+        await repo.reviews.delete("r2")
+        await repo.messages.mark_read("c1", "u2", 1)
+        before = await state(repo)
+        await repo.close()
+        again = await reopened(tmp_path)
+        after = await state(again)
+        # Les places réservées sont recalculées depuis les réservations
+        seats = await again.availability.booked("e1", "2026-05-01", "2026-05-03")
+        await again.close()
+        return before, after, seats
+
+    before, after, seats = run(scenario())
+    assert after == before
+    assert after["users"]["u1"]["bio"] == "Guide" and after["email"] == "u1"
+    assert seats == {"2026-05-01": 2, "2026-05-02": 2, "2026-05-03": 1}
+    assert [r["id"] for r in after["reviews"]] == ["r1"]
+
+
+def test_concurrent_appends_share_commits(tmp_path):
+    async def scenario():
+        repo = await reopened(tmp_path)
+        await populate(repo, bookings=0)
+        commits = repo.log.commits
+        await asyncio.gather(*(repo.bookings.insert(booking(i)) for i in range(200)))
+        stats = repo.log.stats()
+        await repo.close()
+        return stats, stats["commits"] - commits
+
+    stats, commits = run(scenario())
+    assert stats["pending"] == 0
+    assert commits < 200
+
+
+def test_snapshot_replaces_older_files(tmp_path):
+    async def scenario():
+        repo = await reopened(tmp_path)
+        await populate(repo)
+        first = await repo.snapshot()
+        await repo.bookings.insert(booking(100))
+        second = await repo.snapshot()
+        await repo.bookings.insert(booking(101, day=2))
+        before = await state(repo)
+        await repo.close()
+        again = await reopened(tmp_path)
+        after = await state(again)
+        await again.close()
+        return first, second, before, after
+
+    first, second, before, after = run(scenario())
+    assert first < second
+    assert wal.snapshots(tmp_path) == [second]
+    # Le redémarrage écrit dans un nouveau segment
+    assert wal.segments(tmp_path)[0] == second
+    assert after == before and len(after["bookings"]) == 7
+
+
+def test_recovery_ignores_a_torn_last_record(tmp_path):
+    async def write():
+        repo = await reopened(tmp_path)
+        await populate(repo)
+        before = await state(repo)
+        await repo.close()
+        return before
+
+    before = run(write())
+    last = wal.segment_path(tmp_path, wal.segments(tmp_path)[-1])
+    with open(last, "ab") as f:
+        f.write(wal.encode_record(["bookings.insert", [booking(99)]])[:-5])
+
+    async def read():
+        repo = await reopened(tmp_path)
+        await repo.bookings.insert(booking(98))
+        after = await state(repo)
+        await repo.close()
+        again = await reopened(tmp_path)
+        final = await state(again)
+        await again.close()
+        return after, final
+
+    after, final = run(read())
+    assert {b["id"] for b in after["bookings"]} == {b["id"] for b in before["bookings"]} | {"b98"}
+    assert final == after
+
+
+def test_failed_sync_rolls_back_memory(tmp_path, monkeypatch):
+    failures = [0]
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        if failures[0]:
+            failures[0] -= 1
+            raise OSError(5, "injected")
+        real_fsync(fd)
+
+    monkeypatch.setattr(wal.os, "fsync", fsync)
+
+    async def scenario():
+        repo = await reopened(tmp_path)
+        await populate(repo)
+        before = await state(repo)
+        failures[0] = 1
+        results = await asyncio.gather(
+            repo.users.insert({"id": "u9", "email": "z@example.com"}),
+            repo.users.update("u1", {"email": "b@example.com"}),
+            repo.bookings.insert(booking(7)),
+            repo.bookings.insert_many([booking(8, day=2), booking(9, "u2")]),
+            repo.experiences.insert_many([{"id": "e2", "price": 5}, {"id": "e3", "price": 6}]),
+            repo.reviews.update("r1", {"rating": 1}),
+            repo.reviews.delete("r2"),
+            repo.messages.append("c1", {"id": "m2", "senderId": "u2", "text": "Labas"}),
+            repo.messages.open_conversation(new_conversation("c2", ["u1", "u3"], None, "2026-01-02")),
+            return_exceptions=True,
+        )
+        rolled_back = await state(repo)
+        await repo.bookings.insert(booking(10))
+        after = await state(repo)
+        await repo.close()
+        again = await reopened(tmp_path)
+        recovered = await state(again)
+        await again.close()
+        return results, before, rolled_back, after, recovered
+
+    results, before, rolled_back, after, recovered = run(scenario())
+    assert all(isinstance(result, OSError) for result in results)
+    assert rolled_back == before
+    assert "b10" in {b["id"] for b in after["bookings"]}
+    assert recovered == after
+
+
+def test_directory_is_locked(tmp_path):
+    async def scenario():
+        repo = await reopened(tmp_path)
+        try:
+            with pytest.raises(RuntimeError):
+                await reopened(tmp_path)
+        finally:
+            await repo.close()
+
+    run(scenario())